@@ -0,0 +1,68 @@
+import datetime as dt
+import io
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+HISTORY_PARTITION_PATTERN = re.compile(r"history/(\d{4})/(\d{2})\.parquet$")
+
+
+def load_history(
+    s3_client,
+    bucket: str,
+    root_key: str = "esquilaplu",
+    start: dt.datetime | None = None,
+    end: dt.datetime | None = None,
+    station_ids: list[int] | None = None,
+    max_workers: int = 16,
+) -> pd.DataFrame:
+    """Load the consolidated SYNOP history written by the batch `consolidate-history` command.
+
+    Only the monthly partitions overlapping [start, end] are downloaded, concurrently, and the stations are filtered
+    while reading the parquet files.
+
+    Args:
+        s3_client: boto3 S3 client
+        bucket (str): S3 bucket
+        root_key (str, optional): root key of the application data. Defaults to "esquilaplu".
+        start (dt.datetime | None, optional): first observation date to keep. Defaults to the whole history.
+        end (dt.datetime | None, optional): last observation date to keep. Defaults to the whole history.
+        station_ids (list[int] | None, optional): stations to keep. Defaults to every station.
+        max_workers (int, optional): number of concurrent downloads. Defaults to 16.
+
+    Returns:
+        pd.DataFrame: one row per station and observation date, sorted by date
+    """
+    first_month = pd.Period(start, freq="M") if start is not None else None
+    last_month = pd.Period(end, freq="M") if end is not None else None
+
+    keys = []
+    for page in s3_client.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=f"{root_key}/history/"):
+        for content in page.get("Contents", []):
+            match = HISTORY_PARTITION_PATTERN.search(content["Key"])
+            if not match:
+                continue
+            month = pd.Period(year=int(match.group(1)), month=int(match.group(2)), freq="M")
+            if (first_month is None or month >= first_month) and (last_month is None or month <= last_month):
+                keys.append(content["Key"])
+
+    filters = [("numer_sta", "in", station_ids)] if station_ids else None
+
+    def read_partition(key: str) -> pd.DataFrame:
+        body = s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()
+        return pd.read_parquet(io.BytesIO(body), filters=filters)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        partitions = list(executor.map(read_partition, keys))
+
+    if not partitions:
+        return pd.DataFrame(columns=["date", "numer_sta"])
+
+    history = pd.concat(partitions, ignore_index=True)
+    if start is not None:
+        history = history.loc[history["date"] >= start]
+    if end is not None:
+        history = history.loc[history["date"] <= end]
+
+    return history.sort_values(["date", "numer_sta"]).reset_index(drop=True)
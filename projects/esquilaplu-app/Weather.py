@@ -1,180 +1,248 @@
+import calendar
 import datetime as dt
 import os
 
-import boto3
 import pandas as pd
 import streamlit as st
 from dotenv import load_dotenv
 
+from src.metrics import METRICS
+from src.stations import StationIndex
 from src.utils import render_hide_st_burger_menu
+from src.weather import (
+    STATION_ID,
+    DatasetCatalog,
+    DatasetPrefetcher,
+    RainfallNormals,
+    WeatherRecord,
+    WeatherRecordFactory,
+    WeatherRepository,
+    WeatherRollupFactory,
+)
 
 load_dotenv()
 
 st.set_page_config(page_title="Esquilaplu", page_icon="🌞")
 render_hide_st_burger_menu()
 
-STATION_ID = 7510
 
+@st.cache_resource
+def get_repository() -> WeatherRepository:
+    return WeatherRepository()
 
-class WeatherRepository:
-    def __init__(self) -> None:
-        self._aws_s3_bucket = os.getenv("S3_BUCKET")
-        self._aws_access_key_id = os.getenv("ACCESS_KEY_ID")
-        self._aws_secret_access_key = os.getenv("SECRET_ACCESS_KEY")
 
-        self._root_key = "esquilaplu"
+@st.cache_resource
+def get_catalog() -> DatasetCatalog:
+    return DatasetCatalog(get_repository())
 
-        self._s3_client = boto3.client(
-            "s3",
-            aws_access_key_id=self._aws_access_key_id,
-            aws_secret_access_key=self._aws_secret_access_key,
-        )
 
-    def load_dataset(self, dataset_id: str) -> pd.DataFrame:
-        data_key = f"{self._root_key}/raw/meteofrance/{dataset_id}.csv"
-        data_object = self._s3_client.get_object(Bucket=self._aws_s3_bucket, Key=data_key)
-        data = pd.read_csv(data_object["Body"], sep=";", header=0, parse_dates=["date"])
+@st.cache_resource
+def get_prefetcher() -> DatasetPrefetcher:
+    return DatasetPrefetcher(get_repository(), get_catalog())
 
-        return data
 
-    def list_datasets(self) -> list[str]:
-        response = self._s3_client.list_objects_v2(Bucket=self._aws_s3_bucket, Prefix=f"{self._root_key}/raw/meteofrance")
-        return [content["Key"].lstrip(f"{self._root_key}/raw/meteofrance/") for content in response["Contents"] if content["Key"] != f"{self._root_key}/raw/meteofrance"]
+@st.cache_resource(ttl=dt.timedelta(days=1))
+def get_station_index() -> StationIndex | None:
+    stations = get_repository().load_stations()
+    return StationIndex.from_dataframe(stations) if stations is not None else None
 
 
+def render_station_selector() -> int:
+    index = get_station_index()
+    if index is None:
+        return STATION_ID
 
+    query = st.sidebar.text_input("Lieu", placeholder="Mérignac, ou 44.84, -0.58")
+    if not query:
+        st.sidebar.caption("Station : BORDEAUX-MERIGNAC")
+        return STATION_ID
 
-class WeatherRecord:
-    def __init__(self, dataset: pd.DataFrame, datetime: dt.datetime) -> None:
-        data = dataset.copy()[dataset["numer_sta"] == STATION_ID]
+    resolved = index.resolve(query)
+    if resolved is None:
+        st.sidebar.warning("Aucune station trouvée pour ce lieu...")
+        return STATION_ID
 
-        self._dataset = data
-        self._datetime = datetime
+    # a distance only makes sense from coordinates, a place name is matched on the station name
+    station, distance_km = resolved
+    distance = f" (à {distance_km:.0f} km)" if distance_km is not None else ""
+    st.sidebar.caption(f"Station : {station.name}{distance}")
+    return station.id
 
-    @property
-    def end_datetime(self) -> dt.datetime:
-        return self._datetime + dt.timedelta(hours=3)
 
-    @property
-    def start_datetime(self) -> dt.datetime:
-        return self._datetime #- dt.timedelta(hours=3)
+def render_export_link(station_id: int, first_date: dt.date, last_date: dt.date) -> None:
+    """Link to the API export, streamed month by month so that any range can be downloaded."""
+    api_url = os.getenv("API_PUBLIC_URL")
+    if not api_url:
+        return
 
-    @property
-    def rain_mm_last_1h(self) -> float:
-        return self._get_float_value("rr1")
+    with st.sidebar.expander("Exporter les relevés"):
+        start = st.date_input("Du", last_date.replace(day=1), min_value=first_date, max_value=last_date)
+        end = st.date_input("Au", last_date, min_value=first_date, max_value=last_date)
+        export_format = st.radio("Format", ["csv", "parquet"], horizontal=True)
+        if end < start:
+            st.warning("La date de fin précède la date de début...")
+            return
+        st.markdown(
+            f"[Télécharger]({api_url.rstrip('/')}/api/stations/{station_id}/export.{export_format}"
+            f"?start={start.isoformat()}&end={end.isoformat()})"
+        )
 
-    @property
-    def rain_mm_last_3h(self) -> float:
-        return self._get_float_value("rr3")
 
-    @property
-    def rain_mm_last_6h(self) -> float:
-        return self._get_float_value("rr6")
+def render_normal_comparison(rainfall_mm: float, normal: pd.Series | None, period: str, partial: bool = False) -> None:
+    if normal is None:
+        return
 
-    @property
-    def rain_mm_last_12h(self) -> float:
-        return self._get_float_value("rr12")
+    comparison = RainfallNormals.describe(rainfall_mm, normal)
+    st.caption(
+        f"Pluviométrie {comparison}{' pour l’instant' if partial else ''}. "
+        f"Normale {period} : {normal['mean_mm']:.1f} mm en moyenne, moins de {normal['p90_mm']:.1f} mm 9 fois sur 10, "
+        f"de la pluie (1 mm ou plus) {normal['rainy_frequency']:.0%} des jours"
+    )
 
-    @property
-    def rain_mm_last_24h(self) -> float:
-        return self._get_float_value("rr24")
 
-    def _get_float_value(self, column_name: str) -> float:
-        value = float(self._dataset[column_name].values[0])
-        return value if value > 0 else 0
-    
-    @staticmethod
-    def get_icon(rainfall_mm: float) -> str:
-        if rainfall_mm <= 0:
-            return "🌞"
-        elif rainfall_mm < 5:
-            return "🌦"
-        else:
-            return "🌧"
-
-
-class WeatherRecordFactory:
-    def __init__(self) -> None:
-        self._repository = WeatherRepository()
-
-    def get_record_by_date_and_time(self, datetime: dt.datetime) -> WeatherRecord:
-        data = self._repository.load_dataset(f"{datetime.date().isoformat()}-{datetime.strftime('%H')}")
-        return WeatherRecord(data, datetime)
-
-    def get_records_by_date(self, date: dt.date) -> list[WeatherRecord]:
-        all_saved_data_files = self._repository.list_datasets()
-        all_saved_data_files = [file for file in all_saved_data_files if file and (self._parse_datetime_from_filename(file)).date() == date]
-        
-        all_saved_data_files.sort()
+def render_rollup_view(view: str, selected_date: dt.date, station_id: int = STATION_ID) -> None:
+    factory = WeatherRollupFactory(get_repository(), station_id)
+
+    match view:
+        case "Semaine":
+            start = selected_date - dt.timedelta(days=selected_date.weekday())
+            end = start + dt.timedelta(days=6)
+            rainfall = factory.get_daily_rainfall(start, end)
+            title = f"Semaine du {start.strftime('%d %B %Y')}"
+            label_format = "%A %d/%m"
+        case "Mois":
+            start = selected_date.replace(day=1)
+            end = selected_date.replace(day=calendar.monthrange(selected_date.year, selected_date.month)[1])
+            rainfall = factory.get_daily_rainfall(start, end)
+            title = selected_date.strftime("%B %Y")
+            label_format = "%d/%m/%Y"
+        case _:
+            start = selected_date.replace(month=1, day=1)
+            end = selected_date.replace(month=12, day=31)
+            rainfall = factory.get_monthly_rainfall(start, end)
+            title = selected_date.strftime("%Y")
+            label_format = "%B"
+
+    if rainfall.empty:
+        st.warning("Aucune donnée disponible pour cette période...")
+        return
 
-        records = []
-        for file in all_saved_data_files:
-            records.append(self.get_record_by_date_and_time(self._parse_datetime_from_filename(file)))
+    window_rainfall = factory.get_window_rainfall(start, end)
+    total_rainfall = window_rainfall[0] if window_rainfall is not None else rainfall.sum()
 
-        return records
+    cols = st.columns(2)
+    with cols[0]:
+        st.subheader(title)
+    with cols[1]:
+        st.metric("Pluviométrie de la période", f"{WeatherRecord.get_icon(total_rainfall)} {total_rainfall:.2f} mm")
+        if window_rainfall is not None:
+            st.caption(f"Données disponibles pour {window_rainfall[1]:.0%} de la période")
+        normals = factory.get_normals() if view == "Mois" else None
+        if normals is not None:
+            render_normal_comparison(
+                total_rainfall,
+                normals.get_month_normal(selected_date.month),
+                "du mois",
+                partial=end >= dt.date.today(),
+            )
 
-    def list_saved_dataset_datetimes(self) -> list[dt.datetime]:
-        all_saved_data_files = self._repository.list_datasets()
-        all_saved_dt = [
-            self._parse_datetime_from_filename(file) for file in all_saved_data_files if file.endswith(".csv")
-        ]
-        all_saved_dt.sort()
+    df = pd.DataFrame(
+        {
+            "Période": [period.strftime(label_format) for period in rainfall.index],
+            "Pluviométrie": [f"{WeatherRecord.get_icon(value)} {value:.2f} mm" for value in rainfall.values],
+        },
+        columns=["Période", "Pluviométrie"],
+    )
+    st.table(df)
 
-        return all_saved_dt
 
-    @staticmethod
-    def _parse_datetime_from_filename(filename: str) -> dt.datetime:
-        return dt.datetime.strptime(filename, "%Y-%m-%d-%H.csv") - dt.timedelta(hours=3)
+def render_diagnostics() -> None:
+    """Hidden page, reached with ?diagnostics, showing the latencies and cache hit rates of the process."""
+    metrics = METRICS.to_dict()
+    st.header("Diagnostic")
+    st.caption(f"Depuis {dt.timedelta(seconds=metrics['uptime_sec'])}, sur les {METRICS.MAX_SAMPLES} dernières mesures")
 
+    st.subheader("Latences par étape (ms)")
+    st.dataframe(pd.DataFrame(metrics["latencies"], columns=["step", "count", "p50_ms", "p90_ms", "p99_ms", "max_ms"]))
 
-class WeatherCalculator:
-    @staticmethod
-    def compute_rainfall(records: list[WeatherRecord]) -> float:
-        return sum([rec.rain_mm_last_3h for rec in records])
+    st.subheader("Caches")
+    st.dataframe(pd.DataFrame(metrics["caches"], columns=["cache", "hits", "misses", "hit_rate"]))
+
+    if st.button("Réinitialiser"):
+        METRICS.reset()
+        st.experimental_rerun()
 
 
 def application():
     st.header("Esquilaplu")
     st.write("Bienvenue sur Esquilaplu, l'application qui permet de savoir quand et combien il a plu !")
 
-    factory = WeatherRecordFactory()
-    available_records = factory.list_saved_dataset_datetimes()
+    with METRICS.span("render.station_selector"):
+        station_id = render_station_selector()
+    catalog = get_catalog()
+    with METRICS.span("catalog.refresh"):
+        catalog.refresh()
+    factory = WeatherRecordFactory(get_repository(), catalog, station_id)
+    first_date, last_date = catalog.first_datetime.date(), catalog.last_datetime.date()
+    render_export_link(station_id, first_date, last_date)
     
-    st.session_state.selected_date = st.session_state.selected_date if "selected_date" in st.session_state else available_records[-1].date()
+    st.session_state.selected_date = st.session_state.selected_date if "selected_date" in st.session_state else last_date
     
     cols = st.columns(4)
     with cols[0]:
-        if st.button("Jour précédent", disabled=st.session_state.selected_date == available_records[0].date()):
+        if st.button("Jour précédent", disabled=st.session_state.selected_date == first_date):
             st.session_state.selected_date -= dt.timedelta(days=1)
         
     with cols[1]:
-        if st.button("Jour suivant", disabled=st.session_state.selected_date == available_records[-1].date()):
+        if st.button("Jour suivant", disabled=st.session_state.selected_date == last_date):
             st.session_state.selected_date += dt.timedelta(days=1)
             
     with cols[2]:
-        if st.button("Le plus récent", disabled=st.session_state.selected_date == available_records[-1].date()):
-            st.session_state.selected_date = available_records[-1].date()
+        if st.button("Le plus récent", disabled=st.session_state.selected_date == last_date):
+            st.session_state.selected_date = last_date
 
-    if st.session_state.selected_date > available_records[-1].date():
-        st.session_state.selected_date = available_records[-1].date()
-    elif st.session_state.selected_date < available_records[0].date():
-        st.session_state.selected_date = available_records[0].date()
+    if st.session_state.selected_date > last_date:
+        st.session_state.selected_date = last_date
+    elif st.session_state.selected_date < first_date:
+        st.session_state.selected_date = first_date
 
     with cols[3]:
         st.session_state.selected_date: dt.date = st.date_input(
             "Choisi une date",
             st.session_state.selected_date,
-            min_value=available_records[0],
-            max_value=available_records[-1],
+            min_value=first_date,
+            max_value=last_date,
         )
     
-    filtered_records = factory.get_records_by_date(st.session_state.selected_date)
+    view = st.radio("Vue", ["Jour", "Semaine", "Mois", "Année"], horizontal=True)
+    if view != "Jour":
+        with METRICS.span("render.rollup_view"):
+            render_rollup_view(view, st.session_state.selected_date, station_id)
+        return
+
+    # the station series answers with a slice, the raw datasets are only read when it lags behind the catalog
+    datetimes = catalog.get_datetimes_by_date(st.session_state.selected_date)
+    with METRICS.span("day.series"):
+        laps_rainfall = (
+            WeatherRollupFactory(get_repository(), station_id).get_laps_rainfall(
+                st.session_state.selected_date, datetimes[-1]
+            )
+            if datetimes
+            else None
+        )
+    if laps_rainfall is not None:
+        laps = [(start.to_pydatetime(), float(value)) for start, value in laps_rainfall.dropna().items()]
+    else:
+        with METRICS.span("day.records"):
+            filtered_records = factory.get_records_by_date(st.session_state.selected_date)
+        laps = [(rec.start_datetime, rec.rain_mm_last_3h) for rec in filtered_records]
+        get_prefetcher().prefetch_around(st.session_state.selected_date)
     
-    if not filtered_records:
+    if not laps:
         st.warning("Aucune donnée disponible pour cette date... Essaye la veille !")
         return
 
-    day_rainfall = WeatherCalculator.compute_rainfall(filtered_records)
+    day_rainfall = sum(rainfall_mm for _, rainfall_mm in laps)
     selected_date_formatted = st.session_state.selected_date.strftime("%A %d %B %Y")
     
     cols = st.columns(2)
@@ -182,17 +250,30 @@ def application():
         st.subheader(f"{selected_date_formatted}")
     with cols[1]:
         st.metric("Pluviométrie du jour", f"{WeatherRecord.get_icon(day_rainfall)} {day_rainfall:.2f} mm")
+        normals = WeatherRollupFactory(get_repository(), station_id).get_normals()
+        if normals is not None:
+            render_normal_comparison(
+                day_rainfall,
+                normals.get_day_normal(st.session_state.selected_date),
+                "du jour",
+                partial=len(laps) < 8,
+            )
 
     df = pd.DataFrame(
         {
-            "Date": [rec.start_datetime.strftime("%d/%m/%Y") for rec in filtered_records],
-            "Heure": [f"de {rec.start_datetime.hour}h à {rec.end_datetime.hour}h" for rec in filtered_records],
-            "Pluviométrie": [f"{rec.get_icon(rec.rain_mm_last_3h)} {rec.rain_mm_last_3h:.2f} mm" for rec in filtered_records],
+            "Date": [start.strftime("%d/%m/%Y") for start, _ in laps],
+            "Heure": [f"de {start.hour}h à {(start + dt.timedelta(hours=3)).hour}h" for start, _ in laps],
+            "Pluviométrie": [f"{WeatherRecord.get_icon(value)} {value:.2f} mm" for _, value in laps],
         },
         columns=["Date", "Heure", "Pluviométrie"],
     )
-    st.table(df)
+    with METRICS.span("render.table"):
+        st.table(df)
 
 
 if __name__ == "__main__":
-    application()
+    if "diagnostics" in st.experimental_get_query_params():
+        render_diagnostics()
+    else:
+        with METRICS.span("rerun"):
+            application()
@@ -0,0 +1,262 @@
+import datetime as dt
+import hashlib
+import json
+import logging
+import os
+import re
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterator
+from urllib.parse import parse_qs, urlsplit
+
+from botocore.exceptions import ClientError
+from dotenv import load_dotenv
+
+from src.export import CONTENT_TYPES, RainfallExport
+from src.metrics import METRICS
+from src.weather import (
+    DatasetCatalog,
+    WeatherCalculator,
+    WeatherRecord,
+    WeatherRecordFactory,
+    WeatherRepository,
+    WeatherRollupFactory,
+)
+
+load_dotenv()
+
+LATEST_PATTERN = re.compile(r"^/api/stations/(\d+)/latest$")
+DAY_PATTERN = re.compile(r"^/api/stations/(\d+)/days/(\d{4}-\d{2}-\d{2})$")
+RANGE_PATTERN = re.compile(r"^/api/stations/(\d+)/range$")
+EXPORT_PATTERN = re.compile(r"^/api/stations/(\d+)/export\.(csv|parquet)$")
+METRICS_PATH = "/api/metrics"
+
+logger = logging.getLogger(__name__)
+
+
+class ApiError(Exception):
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class CachedResponse:
+    """A response whose validators are known before its body is built, so that revalidations stay cheap."""
+
+    def __init__(self, resource: str, version: str, max_age: int, build: Callable[[], dict]) -> None:
+        self.etag = f'"{hashlib.sha1(f"{resource}|{version}".encode()).hexdigest()[:20]}"'
+        self.cache_control = f"public, max-age={max_age}"
+        self.build = build
+
+
+class StreamedResponse(CachedResponse):
+    """A cached response whose body is a file sent chunk by chunk, as it is produced."""
+
+    def __init__(
+        self,
+        resource: str,
+        version: str,
+        max_age: int,
+        build: Callable[[], Iterator[bytes]],
+        content_type: str,
+        filename: str,
+    ) -> None:
+        super().__init__(resource, version, max_age, build)
+        self.content_type = content_type
+        self.filename = filename
+
+
+class RainfallApi:
+    """JSON views of the rainfall, read through the same repository and catalog caches as the Streamlit app."""
+
+    # a day is complete once a later day has been published, its datasets do not change anymore
+    COMPLETE_MAX_AGE = int(dt.timedelta(days=1).total_seconds())
+    LIVE_MAX_AGE = int(DatasetCatalog.REFRESH_INTERVAL.total_seconds())
+
+    def __init__(self, repository: WeatherRepository, catalog: DatasetCatalog) -> None:
+        self._repository = repository
+        self._catalog = catalog
+
+    def route(self, url: str) -> CachedResponse:
+        split_url = urlsplit(url)
+        self._catalog.refresh()
+
+        if match := LATEST_PATTERN.match(split_url.path):
+            return self.get_latest(int(match.group(1)))
+        if match := DAY_PATTERN.match(split_url.path):
+            return self.get_day(int(match.group(1)), self._parse_date(match.group(2)))
+        if match := RANGE_PATTERN.match(split_url.path):
+            return self.get_range(int(match.group(1)), *self._parse_range(split_url.query))
+        if match := EXPORT_PATTERN.match(split_url.path):
+            return self.get_export(int(match.group(1)), match.group(2), *self._parse_range(split_url.query))
+
+        raise ApiError(HTTPStatus.NOT_FOUND, f"Unknown resource {split_url.path}")
+
+    def get_latest(self, station_id: int) -> CachedResponse:
+        last_date = self._catalog.last_datetime.date()
+
+        def build() -> dict:
+            records = WeatherRecordFactory(self._repository, self._catalog, station_id).get_records_by_date(last_date)
+            if not records:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"No data for station {station_id} on {last_date}")
+            return {"station_id": station_id, **self._record_to_dict(records[-1])}
+
+        return CachedResponse(
+            f"latest/{station_id}", self._catalog.get_version(last_date, last_date), self.LIVE_MAX_AGE, build
+        )
+
+    def get_day(self, station_id: int, date: dt.date) -> CachedResponse:
+        def build() -> dict:
+            records = WeatherRecordFactory(self._repository, self._catalog, station_id).get_records_by_date(date)
+            if not records:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"No data for station {station_id} on {date}")
+            return {
+                "station_id": station_id,
+                "date": date.isoformat(),
+                "rainfall_mm": WeatherCalculator.compute_rainfall(records),
+                "laps": [self._record_to_dict(record) for record in records],
+            }
+
+        return CachedResponse(
+            f"day/{station_id}/{date}", self._catalog.get_version(date, date), self._get_max_age(date), build
+        )
+
+    def get_range(self, station_id: int, start: dt.date, end: dt.date) -> CachedResponse:
+        factory = WeatherRollupFactory(self._repository, station_id)
+
+        def build() -> dict:
+            daily_rainfall = factory.get_daily_rainfall(start, end)
+            window_rainfall = factory.get_window_rainfall(start, end)
+            return {
+                "station_id": station_id,
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "rainfall_mm": window_rainfall[0] if window_rainfall is not None else float(daily_rainfall.sum()),
+                "coverage": window_rainfall[1] if window_rainfall is not None else None,
+                "days": [
+                    {"date": period.date().isoformat(), "rainfall_mm": float(rainfall_mm)}
+                    for period, rainfall_mm in daily_rainfall.items()
+                ],
+            }
+
+        # the body is read from the series or the rollups, which the batch rewrites after the raw datasets are listed
+        version = f"{self._catalog.get_version(start, end)}|{factory.get_version()}"
+        return CachedResponse(f"range/{station_id}/{start}/{end}", version, self._get_max_age(end), build)
+
+    def get_export(self, station_id: int, format: str, start: dt.date, end: dt.date) -> StreamedResponse:
+        export = RainfallExport(self._repository, station_id, start, end)
+        return StreamedResponse(
+            f"export/{station_id}/{start}/{end}.{format}",
+            self._catalog.get_version(start, end),
+            self._get_max_age(end),
+            lambda: export.iter_content(format),
+            content_type=CONTENT_TYPES[format],
+            filename=f"{export.filename}.{format}",
+        )
+
+    def _get_max_age(self, last_date: dt.date) -> int:
+        return self.COMPLETE_MAX_AGE if last_date < self._catalog.last_datetime.date() else self.LIVE_MAX_AGE
+
+    @staticmethod
+    def _record_to_dict(record: WeatherRecord) -> dict:
+        return {
+            "start": record.start_datetime.isoformat(),
+            "end": record.end_datetime.isoformat(),
+            "rainfall_mm": record.rain_mm_last_3h,
+            "rainfall_mm_last_24h": record.rain_mm_last_24h,
+        }
+
+    def _parse_range(self, query_string: str) -> tuple[dt.date, dt.date]:
+        query = parse_qs(query_string)
+        start = self._parse_date(query.get("start", [""])[0])
+        end = self._parse_date(query.get("end", [""])[0])
+        if end < start:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "end must not be before start")
+        return start, end
+
+    @staticmethod
+    def _parse_date(value: str) -> dt.date:
+        try:
+            return dt.date.fromisoformat(value)
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Invalid date {value!r}, expected YYYY-MM-DD")
+
+
+class RainfallApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    api: RainfallApi
+
+    def do_GET(self) -> None:
+        if urlsplit(self.path).path == METRICS_PATH:
+            self._send(HTTPStatus.OK, body=METRICS.to_dict())
+            return
+
+        with METRICS.span("api.request"):
+            try:
+                response = self.api.route(self.path)
+                if self.headers.get("If-None-Match") == response.etag:
+                    self._send(HTTPStatus.NOT_MODIFIED, response)
+                    return
+                if isinstance(response, StreamedResponse):
+                    self._stream(response)
+                    return
+                self._send(HTTPStatus.OK, response, response.build())
+            except ApiError as e:
+                self._send(e.status, body={"error": str(e)})
+            except ClientError as e:
+                # a dataset or a partition listed by the catalog may have been removed since
+                if e.response.get("Error", {}).get("Code") != "NoSuchKey":
+                    self._send_internal_error()
+                    return
+                self._send(HTTPStatus.NOT_FOUND, body={"error": f"No data found for {urlsplit(self.path).path}"})
+            except Exception:
+                self._send_internal_error()
+
+    def _stream(self, response: StreamedResponse) -> None:
+        self.send_response(HTTPStatus.OK)
+        self.send_header("ETag", response.etag)
+        self.send_header("Cache-Control", response.cache_control)
+        self.send_header("Content-Type", response.content_type)
+        self.send_header("Content-Disposition", f'attachment; filename="{response.filename}"')
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        try:
+            for chunk in response.build():
+                if chunk:
+                    self.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+        except Exception:
+            # the status is already sent, closing without the last chunk tells the client the file is incomplete
+            logger.exception(f"Error while streaming {self.path}")
+            self.close_connection = True
+            return
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _send_internal_error(self) -> None:
+        logger.exception(f"Error while serving {self.path}")
+        self._send(HTTPStatus.INTERNAL_SERVER_ERROR, body={"error": "Internal server error"})
+
+    def _send(self, status: HTTPStatus, response: CachedResponse | None = None, body: dict | None = None) -> None:
+        content = json.dumps(body).encode() if body is not None else b""
+
+        self.send_response(status)
+        if response is not None:
+            self.send_header("ETag", response.etag)
+            self.send_header("Cache-Control", response.cache_control)
+        else:
+            self.send_header("Cache-Control", "no-store")
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+def serve(port: int) -> None:
+    RainfallApiHandler.api = RainfallApi(repository := WeatherRepository(), DatasetCatalog(repository))
+    with ThreadingHTTPServer(("", port), RainfallApiHandler) as server:
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    serve(int(os.getenv("API_PORT", "8502")))
@@ -0,0 +1,109 @@
+import datetime as dt
+from typing import Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.weather import WeatherRepository
+
+LAPS_DURATION = dt.timedelta(hours=3)
+RAINFALL_COLUMNS = ["rr1", "rr3", "rr6", "rr12", "rr24"]
+SCHEMA = pa.schema(
+    [("numer_sta", pa.int64()), ("start", pa.timestamp("ns")), ("end", pa.timestamp("ns"))]
+    + [(column, pa.float64()) for column in RAINFALL_COLUMNS]
+)
+CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "parquet": "application/vnd.apache.parquet"}
+
+
+class ChunkSink:
+    """Write-only file whose content is taken out after each write, so that a file is streamed while it is written."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self.closed = False
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        content, self._chunks = b"".join(self._chunks), []
+        return content
+
+
+class RainfallExport:
+    """Rainfall records of a station over a range of days, read month by month from the station partitions.
+
+    A single month is held in memory at a time, whatever the length of the range.
+    """
+
+    def __init__(self, repository: WeatherRepository, station_id: int, start: dt.date, end: dt.date) -> None:
+        self._repository = repository
+        self._station_id = station_id
+        self._start = start
+        self._end = end
+
+    @property
+    def filename(self) -> str:
+        return f"esquilaplu-{self._station_id}-{self._start.isoformat()}-{self._end.isoformat()}"
+
+    def iter_frames(self) -> Iterator[pd.DataFrame]:
+        # a day is made of the laps starting that day, whose observations end up to 3 hours later
+        first_observation = dt.datetime.combine(self._start, dt.time()) + LAPS_DURATION
+        last_observation = dt.datetime.combine(self._end, dt.time(21)) + LAPS_DURATION
+
+        for month in pd.period_range(first_observation, last_observation, freq="M"):
+            partition = self._repository.load_station_partition(
+                self._station_id, month.year, month.month, columns=["date", *RAINFALL_COLUMNS]
+            )
+            if partition is None:
+                continue
+
+            partition = partition.loc[partition["date"].between(first_observation, last_observation)]
+            if partition.empty:
+                continue
+            yield self._to_records(partition.sort_values("date"))
+
+    def iter_csv(self) -> Iterator[bytes]:
+        yield (",".join(SCHEMA.names) + "\n").encode()
+        for frame in self.iter_frames():
+            yield frame.to_csv(index=False, header=False, date_format="%Y-%m-%dT%H:%M:%S").encode()
+
+    def iter_parquet(self) -> Iterator[bytes]:
+        sink = ChunkSink()
+        # one row group per month
+        with pq.ParquetWriter(sink, SCHEMA) as writer:
+            for frame in self.iter_frames():
+                writer.write_table(pa.Table.from_pandas(frame, schema=SCHEMA, preserve_index=False))
+                yield sink.take()
+        yield sink.take()
+
+    def iter_content(self, format: str) -> Iterator[bytes]:
+        match format:
+            case "csv":
+                return self.iter_csv()
+            case "parquet":
+                return self.iter_parquet()
+            case _:
+                raise ValueError(f"Invalid export format: {format}")
+
+    def _to_records(self, partition: pd.DataFrame) -> pd.DataFrame:
+        records = pd.DataFrame(
+            {
+                "numer_sta": self._station_id,
+                "start": partition["date"] - LAPS_DURATION,
+                "end": partition["date"],
+            }
+        )
+        # traces of rain are reported as negative values
+        for column in RAINFALL_COLUMNS:
+            records[column] = partition[column].clip(lower=0) if column in partition else float("nan")
+
+        return records.astype({"numer_sta": "int64", **{column: "float64" for column in RAINFALL_COLUMNS}})
@@ -0,0 +1,79 @@
+import contextlib
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Iterator
+
+import numpy as np
+
+
+class Metrics:
+    """In-process latencies and cache hit rates, shared by every session of the process."""
+
+    # the percentiles are computed over the latest samples of each step
+    MAX_SAMPLES = 1000
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._durations: defaultdict[str, deque[float]] = defaultdict(lambda: deque(maxlen=self.MAX_SAMPLES))
+        self._counts: defaultdict[str, int] = defaultdict(int)
+        self._cache_lookups: defaultdict[str, list[int]] = defaultdict(lambda: [0, 0])
+        self._started_at = time.time()
+
+    @contextlib.contextmanager
+    def span(self, step: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration_ms = (time.perf_counter() - started_at) * 1000
+            with self._lock:
+                self._durations[step].append(duration_ms)
+                self._counts[step] += 1
+
+    def record_cache(self, cache: str, hit: bool) -> None:
+        with self._lock:
+            self._cache_lookups[cache][0 if hit else 1] += 1
+
+    def get_latencies(self) -> list[dict]:
+        with self._lock:
+            durations = {step: np.array(samples) for step, samples in self._durations.items()}
+            counts = dict(self._counts)
+
+        return [
+            {
+                "step": step,
+                "count": counts[step],
+                "p50_ms": float(np.percentile(samples, 50)),
+                "p90_ms": float(np.percentile(samples, 90)),
+                "p99_ms": float(np.percentile(samples, 99)),
+                "max_ms": float(samples.max()),
+            }
+            for step, samples in sorted(durations.items())
+        ]
+
+    def get_cache_hit_rates(self) -> list[dict]:
+        with self._lock:
+            lookups = {cache: tuple(hits_misses) for cache, hits_misses in self._cache_lookups.items()}
+
+        return [
+            {"cache": cache, "hits": hits, "misses": misses, "hit_rate": hits / (hits + misses)}
+            for cache, (hits, misses) in sorted(lookups.items())
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "uptime_sec": round(time.time() - self._started_at),
+            "latencies": self.get_latencies(),
+            "caches": self.get_cache_hit_rates(),
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._durations.clear()
+            self._counts.clear()
+            self._cache_lookups.clear()
+            self._started_at = time.time()
+
+
+METRICS = Metrics()
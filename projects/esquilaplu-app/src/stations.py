@@ -0,0 +1,71 @@
+import re
+import unicodedata
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+COORDINATES_PATTERN = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*[,; ]\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+@dataclass(frozen=True)
+class Station:
+    id: int
+    name: str
+    latitude: float
+    longitude: float
+
+
+class StationIndex:
+    """Positions of the SYNOP stations, a few dozen: the nearest one is found by computing every distance at once."""
+
+    EARTH_RADIUS_KM = 6371.0
+
+    def __init__(self, stations: list[Station]) -> None:
+        self._stations = list(stations)
+        self._latitudes = np.radians([station.latitude for station in self._stations])
+        self._longitudes = np.radians([station.longitude for station in self._stations])
+
+    @classmethod
+    def from_dataframe(cls, stations: pd.DataFrame) -> "StationIndex":
+        return cls(
+            [
+                Station(id=int(row["ID"]), name=row["Nom"], latitude=row["Latitude"], longitude=row["Longitude"])
+                for row in stations.to_dict(orient="records")
+            ]
+        )
+
+    def resolve(self, query: str) -> tuple[Station, float | None] | None:
+        """Resolve "lat, lon" coordinates or a place name to a station, with its distance in km to the coordinates."""
+        match = COORDINATES_PATTERN.match(query)
+        if match:
+            return self.nearest(float(match.group(1)), float(match.group(2)))
+
+        stations = self.search(query)
+        return (stations[0], None) if stations else None
+
+    def nearest(self, latitude: float, longitude: float) -> tuple[Station, float] | None:
+        if not self._stations:
+            return None
+
+        distances_km = self._get_distances_km(latitude, longitude)
+        position = int(np.argmin(distances_km))
+        return self._stations[position], float(distances_km[position])
+
+    def search(self, name: str) -> list[Station]:
+        normalized_name = self._normalize(name)
+        return [station for station in self._stations if normalized_name in self._normalize(station.name)]
+
+    def _get_distances_km(self, latitude: float, longitude: float) -> np.ndarray:
+        # haversine formula, from the location to every station
+        latitude, longitude = np.radians(latitude), np.radians(longitude)
+        haversine = (
+            np.sin((self._latitudes - latitude) / 2) ** 2
+            + np.cos(latitude) * np.cos(self._latitudes) * np.sin((self._longitudes - longitude) / 2) ** 2
+        )
+        return 2 * self.EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(haversine, 0, 1)))
+
+    @staticmethod
+    def _normalize(name: str) -> str:
+        name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+        return name.upper().replace("-", " ").strip()
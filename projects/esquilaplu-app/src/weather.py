@@ -0,0 +1,564 @@
+import bisect
+import datetime as dt
+import io
+import math
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from botocore.exceptions import ClientError
+
+from src.metrics import METRICS
+
+STATION_ID = 7510
+
+
+class WeatherRepository:
+    DATASETS_CACHE_SIZE = 128
+    DERIVED_CACHE_TTL = dt.timedelta(minutes=5)
+    SERIES_DIRECTORY = os.path.join(tempfile.gettempdir(), "esquilaplu", "series")
+
+    def __init__(self) -> None:
+        self._aws_s3_bucket = os.getenv("S3_BUCKET")
+        self._aws_access_key_id = os.getenv("ACCESS_KEY_ID")
+        self._aws_secret_access_key = os.getenv("SECRET_ACCESS_KEY")
+
+        self._root_key = "esquilaplu"
+
+        self._s3_client = boto3.client(
+            "s3",
+            aws_access_key_id=self._aws_access_key_id,
+            aws_secret_access_key=self._aws_secret_access_key,
+        )
+
+        # raw datasets never change once published, so they are kept in a LRU cache shared by all sessions
+        self._datasets_cache: OrderedDict[str, pd.DataFrame] = OrderedDict()
+        self._datasets_cache_lock = threading.Lock()
+        # rollups and series are rewritten by each collect, so they are only trusted for a few minutes
+        self._derived_cache: dict[str, tuple[dt.datetime, pd.DataFrame | None]] = {}
+        self._rollup_etags: dict[str, str | None] = {}
+        self._derived_cache_lock = threading.Lock()
+        self._series_cache: dict[int, tuple[dt.datetime, str | None, RainfallIndex | None]] = {}
+        self._series_cache_lock = threading.Lock()
+
+    def load_dataset(self, dataset_id: str) -> pd.DataFrame:
+        with self._datasets_cache_lock:
+            METRICS.record_cache("datasets", hit=dataset_id in self._datasets_cache)
+            if dataset_id in self._datasets_cache:
+                self._datasets_cache.move_to_end(dataset_id)
+                return self._datasets_cache[dataset_id]
+
+        data_key = f"{self._root_key}/raw/meteofrance/{dataset_id}.csv"
+        with METRICS.span("dataset.get_object"):
+            content = self._s3_client.get_object(Bucket=self._aws_s3_bucket, Key=data_key)["Body"].read()
+        with METRICS.span("dataset.read_csv"):
+            data = pd.read_csv(io.BytesIO(content), sep=";", header=0, parse_dates=["date"])
+
+        with self._datasets_cache_lock:
+            self._datasets_cache[dataset_id] = data
+            while len(self._datasets_cache) > self.DATASETS_CACHE_SIZE:
+                self._datasets_cache.popitem(last=False)
+
+        return data
+
+    def is_dataset_cached(self, dataset_id: str) -> bool:
+        with self._datasets_cache_lock:
+            return dataset_id in self._datasets_cache
+
+    def list_datasets(self, start_after: str = "") -> list[str]:
+        prefix = f"{self._root_key}/raw/meteofrance/"
+        paginate_kwargs = {"Bucket": self._aws_s3_bucket, "Prefix": prefix}
+        if start_after:
+            # keys are zero padded datetimes, only the datasets of laps later than the given one are listed
+            paginate_kwargs["StartAfter"] = f"{prefix}{start_after}"
+
+        with METRICS.span("catalog.list_objects"):
+            pages = self._s3_client.get_paginator("list_objects_v2").paginate(**paginate_kwargs)
+            return [content["Key"].removeprefix(prefix) for page in pages for content in page.get("Contents", [])]
+
+    def load_rollup(self, name: str) -> pd.DataFrame:
+        key = f"{self._root_key}/rollups/{name}.parquet"
+        now = dt.datetime.now()
+        with self._derived_cache_lock:
+            is_fresh = key in self._derived_cache and now - self._derived_cache[key][0] < self.DERIVED_CACHE_TTL
+            METRICS.record_cache("rollups", hit=is_fresh)
+            if is_fresh:
+                return self._derived_cache[key][1]
+
+        try:
+            with METRICS.span("rollup.get_object"):
+                rollup_object = self._s3_client.get_object(Bucket=self._aws_s3_bucket, Key=key)
+                content = rollup_object["Body"].read()
+        except self._s3_client.exceptions.NoSuchKey:
+            # not published yet by the batch, the views show that no data is available
+            etag = None
+            rollup = pd.DataFrame(
+                {
+                    "numer_sta": pd.Series(dtype="int64"),
+                    "period": pd.Series(dtype="datetime64[ns]"),
+                    "rainfall_mm": pd.Series(dtype="float64"),
+                }
+            )
+        else:
+            etag = rollup_object["ETag"]
+            with METRICS.span("rollup.read_parquet"):
+                rollup = pd.read_parquet(io.BytesIO(content))
+
+        with self._derived_cache_lock:
+            self._derived_cache[key] = (now, rollup)
+            self._rollup_etags[name] = etag
+
+        return rollup
+
+    def get_rollup_etag(self, name: str) -> str | None:
+        """ETag of the rollup as last loaded, which changes whenever the batch rewrites it."""
+        self.load_rollup(name)
+        with self._derived_cache_lock:
+            return self._rollup_etags.get(name)
+
+    def load_rainfall_series(self, station_id: int) -> "RainfallIndex | None":
+        """Memory-map the rainfall series of a station, downloaded again only when the batch has rewritten it."""
+        now = dt.datetime.now()
+        with self._series_cache_lock:
+            checked_at, etag, series = self._series_cache.get(station_id, (None, None, None))
+            if checked_at is not None and now - checked_at < self.DERIVED_CACHE_TTL:
+                METRICS.record_cache("series", hit=True)
+                return series
+
+            series_key = f"{self._root_key}/index/rainfall/{station_id}.arrow"
+            try:
+                conditions = {"IfNoneMatch": etag} if etag else {}
+                with METRICS.span("series.get_object"):
+                    series_object = self._s3_client.get_object(
+                        Bucket=self._aws_s3_bucket, Key=series_key, **conditions
+                    )
+            except self._s3_client.exceptions.NoSuchKey:
+                etag, series = None, None  # not published yet by the batch
+                METRICS.record_cache("series", hit=False)
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") != "304":
+                    raise
+                METRICS.record_cache("series", hit=True)  # revalidated, the mapped file is still current
+            else:
+                METRICS.record_cache("series", hit=False)
+                # a new file replaces the old one, sessions still reading the old mapping keep it until released
+                os.makedirs(self.SERIES_DIRECTORY, exist_ok=True)
+                path = os.path.join(self.SERIES_DIRECTORY, f"{station_id}.arrow")
+                with tempfile.NamedTemporaryFile(dir=self.SERIES_DIRECTORY, delete=False) as file:
+                    shutil.copyfileobj(series_object["Body"], file)
+                os.replace(file.name, path)
+                etag, series = series_object["ETag"], RainfallIndex.from_arrow(path)
+
+            self._series_cache[station_id] = (now, etag, series)
+
+        return series
+
+    def get_rainfall_series_etag(self, station_id: int) -> str | None:
+        """ETag of the rainfall series of a station as last loaded, None when it is not published yet."""
+        self.load_rainfall_series(station_id)
+        with self._series_cache_lock:
+            return self._series_cache[station_id][1]
+
+    def load_climatology(self, station_id: int) -> pd.DataFrame | None:
+        key = f"{self._root_key}/climatology/{station_id}.parquet"
+        now = dt.datetime.now()
+        with self._derived_cache_lock:
+            is_fresh = key in self._derived_cache and now - self._derived_cache[key][0] < self.DERIVED_CACHE_TTL
+            METRICS.record_cache("climatology", hit=is_fresh)
+            if is_fresh:
+                return self._derived_cache[key][1]
+
+        try:
+            with METRICS.span("climatology.get_object"):
+                content = self._s3_client.get_object(Bucket=self._aws_s3_bucket, Key=key)["Body"].read()
+            climatology = pd.read_parquet(io.BytesIO(content))
+        except self._s3_client.exceptions.NoSuchKey:
+            climatology = None  # not published yet by the batch
+
+        with self._derived_cache_lock:
+            self._derived_cache[key] = (now, climatology)
+
+        return climatology
+
+    def load_station_partition(
+        self, station_id: int, year: int, month: int, columns: list[str] | None = None
+    ) -> pd.DataFrame | None:
+        """Read a month of observations of a station, as written by the batch, without caching it."""
+        key = f"{self._root_key}/stations/{station_id}/{year:04d}/{month:02d}.parquet"
+        try:
+            with METRICS.span("partition.get_object"):
+                content = self._s3_client.get_object(Bucket=self._aws_s3_bucket, Key=key)["Body"].read()
+        except self._s3_client.exceptions.NoSuchKey:
+            return None
+
+        partition = pq.ParquetFile(io.BytesIO(content))
+        # the columns of the raw files changed over the years
+        if columns is not None:
+            columns = [column for column in columns if column in partition.schema_arrow.names]
+        return partition.read(columns=columns).to_pandas()
+
+    def load_stations(self) -> pd.DataFrame | None:
+        stations_key = f"{self._root_key}/metadata/stations.csv"
+        try:
+            with METRICS.span("stations.get_object"):
+                stations_object = self._s3_client.get_object(Bucket=self._aws_s3_bucket, Key=stations_key)
+        except self._s3_client.exceptions.NoSuchKey:
+            return None  # not published yet by the batch
+        return pd.read_csv(stations_object["Body"], sep=";", header=0)
+
+
+class DatasetCatalog:
+    REFRESH_INTERVAL = dt.timedelta(minutes=5)
+    # gap fills, backfills, syncs and reprocessings publish past laps, which only a full listing finds
+    FULL_REFRESH_INTERVAL = dt.timedelta(hours=1)
+
+    def __init__(self, repository: WeatherRepository) -> None:
+        self._repository = repository
+        self._lock = threading.Lock()
+        self._datetimes_by_date: dict[dt.date, list[dt.datetime]] = {}
+        self._last_filename = ""
+        self._refreshed_at: dt.datetime | None = None
+        self._fully_refreshed_at: dt.datetime | None = None
+
+    def refresh(self, force: bool = False) -> None:
+        with self._lock:
+            now = dt.datetime.now()
+            if not force and self._refreshed_at is not None and now - self._refreshed_at < self.REFRESH_INTERVAL:
+                METRICS.record_cache("catalog", hit=True)
+                return
+
+            METRICS.record_cache("catalog", hit=False)
+            # new laps are listed after the last known one, the whole prefix is listed again from time to time
+            is_full = self._fully_refreshed_at is None or now - self._fully_refreshed_at >= self.FULL_REFRESH_INTERVAL
+            filenames = [
+                file
+                for file in self._repository.list_datasets(start_after="" if is_full else self._last_filename)
+                if file.endswith(".csv")
+            ]
+
+            # a full listing is indexed aside, sessions keep reading the previous one until it is replaced
+            datetimes_by_date = {} if is_full else self._datetimes_by_date
+            for filename in filenames:
+                datetime = self._parse_datetime_from_filename(filename)
+                bisect.insort(datetimes_by_date.setdefault(datetime.date(), []), datetime)
+
+            self._datetimes_by_date = datetimes_by_date
+            self._last_filename = max(["" if is_full else self._last_filename, *filenames])
+            if is_full:
+                self._fully_refreshed_at = now
+            self._refreshed_at = now
+
+    def get_datetimes_by_date(self, date: dt.date) -> list[dt.datetime]:
+        return list(self._datetimes_by_date.get(date, []))
+
+    def get_version(self, start: dt.date, end: dt.date) -> str:
+        """Fingerprint of the datasets published between two dates, which changes whenever one of them is added."""
+        datetimes = [datetimes for date, datetimes in self._datetimes_by_date.items() if start <= date <= end]
+        last_datetime = max((dates[-1] for dates in datetimes), default=None)
+        return f"{sum(len(dates) for dates in datetimes)}:{last_datetime}"
+
+    @property
+    def first_datetime(self) -> dt.datetime:
+        return self._datetimes_by_date[min(self._datetimes_by_date)][0]
+
+    @property
+    def last_datetime(self) -> dt.datetime:
+        return self._datetimes_by_date[max(self._datetimes_by_date)][-1]
+
+    @staticmethod
+    def _parse_datetime_from_filename(filename: str) -> dt.datetime:
+        # raw datasets are named after the start of their laps
+        return dt.datetime.strptime(filename, "%Y-%m-%d-%H.csv")
+
+
+class WeatherRecord:
+    def __init__(self, dataset: pd.DataFrame, datetime: dt.datetime, station_id: int = STATION_ID) -> None:
+        with METRICS.span("record.filter"):
+            data = dataset.copy()[dataset["numer_sta"] == station_id]
+
+        self._dataset = data
+        self._datetime = datetime
+
+    @property
+    def has_data(self) -> bool:
+        return not self._dataset.empty
+
+    @property
+    def end_datetime(self) -> dt.datetime:
+        return self._datetime + dt.timedelta(hours=3)
+
+    @property
+    def start_datetime(self) -> dt.datetime:
+        return self._datetime #- dt.timedelta(hours=3)
+
+    @property
+    def rain_mm_last_1h(self) -> float:
+        return self._get_float_value("rr1")
+
+    @property
+    def rain_mm_last_3h(self) -> float:
+        return self._get_float_value("rr3")
+
+    @property
+    def rain_mm_last_6h(self) -> float:
+        return self._get_float_value("rr6")
+
+    @property
+    def rain_mm_last_12h(self) -> float:
+        return self._get_float_value("rr12")
+
+    @property
+    def rain_mm_last_24h(self) -> float:
+        return self._get_float_value("rr24")
+
+    def _get_float_value(self, column_name: str) -> float:
+        value = float(self._dataset[column_name].values[0])
+        return value if value > 0 else 0
+    
+    @staticmethod
+    def get_icon(rainfall_mm: float) -> str:
+        if rainfall_mm <= 0:
+            return "🌞"
+        elif rainfall_mm < 5:
+            return "🌦"
+        else:
+            return "🌧"
+
+
+class WeatherRecordFactory:
+    MAX_WORKERS = 8
+
+    def __init__(self, repository: WeatherRepository, catalog: DatasetCatalog, station_id: int = STATION_ID) -> None:
+        self._repository = repository
+        self._catalog = catalog
+        self._station_id = station_id
+
+    def get_record_by_date_and_time(self, datetime: dt.datetime) -> WeatherRecord:
+        data = self._repository.load_dataset(self.get_dataset_id(datetime))
+        return WeatherRecord(data, datetime, self._station_id)
+
+    def get_records_by_date(self, date: dt.date) -> list[WeatherRecord]:
+        # executor.map keeps the catalog order
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            records = list(executor.map(self.get_record_by_date_and_time, self._catalog.get_datetimes_by_date(date)))
+
+        # not every station reports every laps
+        return [record for record in records if record.has_data]
+
+    @staticmethod
+    def get_dataset_id(datetime: dt.datetime) -> str:
+        return f"{datetime.date().isoformat()}-{datetime.strftime('%H')}"
+
+
+class DatasetPrefetcher:
+    MAX_DEPTH_DAYS = 2
+    MAX_WORKERS = 2
+    MAX_PENDING = 4 * 8
+
+    def __init__(self, repository: WeatherRepository, catalog: DatasetCatalog) -> None:
+        self._repository = repository
+        self._catalog = catalog
+        self._executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS, thread_name_prefix="prefetch")
+        self._pending: set[str] = set()
+        self._lock = threading.Lock()
+
+    def prefetch_around(self, date: dt.date) -> None:
+        # nearest days first, the previous day before the next one as the latest day is displayed by default
+        for offset in range(1, self.MAX_DEPTH_DAYS + 1):
+            for neighbour in (date - dt.timedelta(days=offset), date + dt.timedelta(days=offset)):
+                for datetime in self._catalog.get_datetimes_by_date(neighbour):
+                    self._submit(WeatherRecordFactory.get_dataset_id(datetime))
+
+    def _submit(self, dataset_id: str) -> None:
+        with self._lock:
+            if dataset_id in self._pending or len(self._pending) >= self.MAX_PENDING:
+                return
+            if self._repository.is_dataset_cached(dataset_id):
+                return
+            self._pending.add(dataset_id)
+
+        self._executor.submit(self._prefetch, dataset_id)
+
+    def _prefetch(self, dataset_id: str) -> None:
+        try:
+            self._repository.load_dataset(dataset_id)
+        except Exception:
+            pass  # prefetching is best effort, the dataset will be loaded again on demand
+        finally:
+            with self._lock:
+                self._pending.discard(dataset_id)
+
+
+class WeatherRollupFactory:
+    def __init__(self, repository: WeatherRepository, station_id: int = STATION_ID) -> None:
+        self._repository = repository
+        self._station_id = station_id
+
+    def get_version(self) -> str:
+        """Fingerprint of the series, or of the daily rollup without it, which the daily rainfall is read from."""
+        series_etag = self._repository.get_rainfall_series_etag(self._station_id)
+        if series_etag is not None:
+            return f"series:{series_etag}"
+        return f"rollup:{self._repository.get_rollup_etag('daily')}"
+
+    def get_daily_rainfall(self, start: dt.date, end: dt.date) -> pd.Series:
+        series = self._repository.load_rainfall_series(self._station_id)
+        if series is not None:
+            return series.get_period_rainfall(start, end, "D")
+        return self._get_rainfall("daily", start, end)
+
+    def get_monthly_rainfall(self, start: dt.date, end: dt.date) -> pd.Series:
+        series = self._repository.load_rainfall_series(self._station_id)
+        if series is not None:
+            return series.get_period_rainfall(start, end, "MS")
+        return self._get_rainfall("monthly", start, end)
+
+    def get_window_rainfall(self, start: dt.date, end: dt.date) -> tuple[float, float] | None:
+        series = self._repository.load_rainfall_series(self._station_id)
+        if series is None:
+            return None
+
+        # a day is made of the laps starting that day
+        return series.get_window_rainfall(dt.datetime.combine(start, dt.time()), dt.datetime.combine(end, dt.time(21)))
+
+    def get_laps_rainfall(self, date: dt.date, last_datetime: dt.datetime) -> pd.Series | None:
+        """Rainfall of the laps of a day, or None when the series does not reach its last published laps yet."""
+        series = self._repository.load_rainfall_series(self._station_id)
+        if series is None or series.last_slot < last_datetime:
+            return None
+
+        return series.get_laps_rainfall(dt.datetime.combine(date, dt.time()), dt.datetime.combine(date, dt.time(21)))
+
+    def get_normals(self) -> "RainfallNormals | None":
+        climatology = self._repository.load_climatology(self._station_id)
+        return RainfallNormals(climatology) if climatology is not None and not climatology.empty else None
+
+    def _get_rainfall(self, name: str, start: dt.date, end: dt.date) -> pd.Series:
+        rollup = self._repository.load_rollup(name)
+        rollup = rollup.loc[rollup["numer_sta"] == self._station_id].set_index("period").sort_index()
+        return rollup.loc[pd.Timestamp(start):pd.Timestamp(end), "rainfall_mm"]
+
+
+class RainfallIndex:
+    """Dense 3-hourly rainfall of a station with running sums, published by the batch.
+
+    Lookups are slices of the arrays, which stay in the memory-mapped file shared by every session.
+    """
+
+    LAPS_DURATION = dt.timedelta(hours=3)
+
+    def __init__(
+        self,
+        slots: np.ndarray,
+        rainfall_mm: np.ndarray,
+        valid: np.ndarray,
+        cumulative_mm: np.ndarray,
+        valid_count: np.ndarray,
+    ) -> None:
+        self._slots = slots
+        self._rainfall_mm = rainfall_mm
+        self._valid = valid
+        self._cumulative_mm = cumulative_mm
+        self._valid_count = valid_count
+        self._origin = pd.Timestamp(slots[0]).to_pydatetime()
+
+    @classmethod
+    def from_arrow(cls, path: str) -> "RainfallIndex":
+        # the batch writes a single record batch without nulls, so every column maps to numpy without a copy
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        columns = {name: table.column(name).chunk(0).to_numpy(zero_copy_only=True) for name in table.column_names}
+
+        return cls(
+            slots=columns["slot"],
+            rainfall_mm=columns["rainfall_mm"],
+            valid=columns["valid"].view(bool),
+            cumulative_mm=columns["cumulative_mm"],
+            valid_count=columns["valid_count"],
+        )
+
+    @property
+    def last_slot(self) -> dt.datetime:
+        return pd.Timestamp(self._slots[-1]).to_pydatetime()
+
+    def get_window_rainfall(self, start: dt.datetime, end: dt.datetime) -> tuple[float, float]:
+        """Rainfall and share of observed laps of the laps starting between two datetimes, in constant time."""
+        first, last = self._get_positions(start, end)
+        nb_laps = last - first + 1
+
+        first, last = max(first, 0), min(last, len(self._cumulative_mm) - 1)
+        if nb_laps <= 0 or first > last:
+            return 0.0, 0.0
+
+        rainfall_mm = self._cumulative_mm[last] - (self._cumulative_mm[first - 1] if first > 0 else 0.0)
+        nb_valid_laps = self._valid_count[last] - (self._valid_count[first - 1] if first > 0 else 0)
+
+        return float(rainfall_mm), nb_valid_laps / nb_laps
+
+    def get_laps_rainfall(self, start: dt.datetime, end: dt.datetime) -> pd.Series:
+        """Rainfall of each laps starting between two datetimes, NaN when it was not observed."""
+        first, last = self._get_positions(start, end)
+        window = slice(max(first, 0), max(last + 1, 0))
+
+        return pd.Series(
+            np.where(self._valid[window], self._rainfall_mm[window], np.nan),
+            index=pd.DatetimeIndex(self._slots[window], name="slot"),
+            name="rainfall_mm",
+        )
+
+    def get_period_rainfall(self, start: dt.date, end: dt.date, frequency: str) -> pd.Series:
+        """Rainfall of each period between two dates, in the layout of the batch rollups."""
+        laps_rainfall = self.get_laps_rainfall(
+            dt.datetime.combine(start, dt.time()), dt.datetime.combine(end, dt.time(21))
+        )
+        return laps_rainfall.resample(frequency).sum(min_count=1).dropna().rename_axis("period")
+
+    def _get_positions(self, start: dt.datetime, end: dt.datetime) -> tuple[int, int]:
+        return (
+            math.ceil((start - self._origin) / self.LAPS_DURATION),
+            math.floor((end - self._origin) / self.LAPS_DURATION),
+        )
+
+
+class RainfallNormals:
+    """Rainfall normals of a station, by day of the year and by month, computed by the batch over its history."""
+
+    def __init__(self, climatology: pd.DataFrame) -> None:
+        self._climatology = climatology.set_index(["scope", "key"]).sort_index()
+
+    def get_day_normal(self, date: dt.date) -> pd.Series | None:
+        # days of the year are counted on a leap year calendar, so that a date keeps the same key every year
+        return self._get_normal("day", date.replace(year=2000).timetuple().tm_yday)
+
+    def get_month_normal(self, month: int) -> pd.Series | None:
+        return self._get_normal("month", month)
+
+    @staticmethod
+    def describe(rainfall_mm: float, normal: pd.Series) -> str:
+        if rainfall_mm > normal["p90_mm"]:
+            return "bien au-dessus de la normale"
+        if rainfall_mm > normal["p50_mm"]:
+            return "au-dessus de la normale"
+        if rainfall_mm < normal["p10_mm"]:
+            return "bien en dessous de la normale"
+        if rainfall_mm < normal["p50_mm"]:
+            return "en dessous de la normale"
+        return "dans la normale"
+
+    def _get_normal(self, scope: str, key: int) -> pd.Series | None:
+        if (scope, key) not in self._climatology.index:
+            return None
+        return self._climatology.loc[(scope, key)]
+
+
+class WeatherCalculator:
+    @staticmethod
+    def compute_rainfall(records: list[WeatherRecord]) -> float:
+        return sum([rec.rain_mm_last_3h for rec in records])
@@ -0,0 +1,142 @@
+"""End-to-end load harness of the batch collect, against local Météo-France and S3 stand-ins.
+
+Run from the batch project root, for instance:
+
+    python -m benchmarks.load_harness --window-hr 168 --latency-ms 80 --not-found-rate 0.05 --burst-every 40
+"""
+import argparse
+import contextlib
+import datetime as dt
+import json
+import logging
+import resource
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.stand_ins import StandIns, SynopConfig
+
+from src.domain.services.laps import LapsServiceImpl
+from src.domain.services.record import RecordServiceImpl
+from src.infrastructure.factories.mf_record import MeteoFranceRecordFactory
+from src.infrastructure.profiling import RunProfiler
+from src.infrastructure.repositories.app_s3 import AppS3Repository
+from src.infrastructure.repositories.meteo_france import MeteoFranceRepository
+
+BUCKET = "esquilaplu-harness"
+
+
+def run(
+    config: SynopConfig,
+    now: dt.datetime,
+    window_hr: int,
+    collect_budget: dt.timedelta | None = None,
+    trace_memory: bool = False,
+    profiler: RunProfiler | None = None,
+) -> dict:
+    with StandIns(config) as stand_ins:
+        app_repository = AppS3Repository(
+            bucket=BUCKET,
+            root_key="esquilaplu",
+            secret_key="harness",
+            access_key="harness",
+            endpoint_url=stand_ins.s3_url,
+        )
+        record_service = RecordServiceImpl(
+            weather_repository=MeteoFranceRepository(
+                app_repository=app_repository, base_url=stand_ins.synop_url, request_delay_sec=(0, 0)
+            ),
+            app_repository=app_repository,
+            station_id=MeteoFranceRecordFactory.MERIGNAC_STATION_ID,
+            now=now,
+            laps_service=LapsServiceImpl(
+                app_repository=app_repository, station_id=MeteoFranceRecordFactory.MERIGNAC_STATION_ID
+            ),
+            max_collect_history_hr=window_hr,
+            min_collect_history_hr=5,
+            collect_budget=collect_budget,
+            laps_scope=profiler.laps if profiler is not None else contextlib.nullcontext,
+        )
+
+        if trace_memory:
+            tracemalloc.start()
+        started_at = time.perf_counter()
+        with profiler.run() if profiler is not None else contextlib.nullcontext():
+            _, deferred_laps = record_service.update_records()
+        elapsed_sec = time.perf_counter() - started_at
+        peak_traced_bytes = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        tracemalloc.stop()
+
+        collected_laps = app_repository.get_available_laps_since(since=now - dt.timedelta(hours=window_hr + 24))
+        stats = stand_ins.get_stats()
+
+    return {
+        "window_hr": window_hr,
+        "elapsed_sec": round(elapsed_sec, 3),
+        "collected_laps": len(collected_laps),
+        "deferred_laps": len(deferred_laps),
+        "laps_per_sec": round(len(collected_laps) / elapsed_sec, 2) if elapsed_sec else None,
+        "synop_requests": stats["synop"].get("requests", 0),
+        "synop_not_found": stats["synop"].get("not_found", 0),
+        "synop_too_many_requests": stats["synop"].get("too_many_requests", 0),
+        "synop_bytes": stats["synop"].get("bytes_out", 0),
+        "s3_requests": stats["s3"].get("requests", 0),
+        "s3_bytes_in": stats["s3"].get("bytes_in", 0),
+        "s3_bytes_out": stats["s3"].get("bytes_out", 0),
+        "peak_traced_mb": round(peak_traced_bytes / 2**20, 1) if peak_traced_bytes is not None else None,
+        # ru_maxrss is in kilobytes on Linux
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10, 1),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Esquilaplu batch load harness")
+    parser.add_argument("--window-hr", type=int, default=7 * 24, help="collect history, as update does with 14 days")
+    parser.add_argument("--now", type=dt.datetime.fromisoformat, default=dt.datetime(2023, 6, 1, 12))
+    parser.add_argument("--budget-min", type=float)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--latency-jitter-ms", type=float, default=20)
+    parser.add_argument("--stations", type=int, default=62, help="rows per SYNOP file")
+    parser.add_argument("--extra-columns", type=int, default=50, help="columns per SYNOP file besides the rainfall")
+    parser.add_argument("--not-found-rate", type=float, default=0.02)
+    parser.add_argument("--burst-every", type=int, default=0, help="requests between two bursts of 429")
+    parser.add_argument("--burst-length", type=int, default=3, help="429 answers per burst")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-memory", action="store_true", help="also report the tracemalloc peak, much slower")
+    parser.add_argument("--profile", type=Path, metavar="DIR", help="profile the collect as main.py --profile does")
+    parser.add_argument("--json", action="store_true", help="print the report as json")
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    report = run(
+        config=SynopConfig(
+            latency_ms=args.latency_ms,
+            latency_jitter_ms=args.latency_jitter_ms,
+            nb_stations=args.stations,
+            nb_extra_columns=args.extra_columns,
+            not_found_rate=args.not_found_rate,
+            burst_every=args.burst_every,
+            burst_length=args.burst_length if args.burst_every else 0,
+            seed=args.seed,
+        ),
+        now=args.now,
+        window_hr=args.window_hr,
+        collect_budget=dt.timedelta(minutes=args.budget_min) if args.budget_min is not None else None,
+        trace_memory=args.trace_memory,
+        profiler=RunProfiler(output_dir=args.profile) if args.profile is not None else None,
+    )
+
+    if args.json:
+        print(json.dumps(report))
+        return
+    for name, value in report.items():
+        print(f"{name:<24}{value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+import datetime as dt
+import hashlib
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import formatdate
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape, unescape
+
+import requests
+
+SYNOP_FILE_PATTERN = re.compile(r"^/donnees_libres/Txt/Synop/synop\.(\d{10})\.csv$")
+STATIONS_PATH = "/donnees_libres/Txt/Synop/postesSynop.csv"
+STATS_PATH = "/__stats"
+RAINFALL_COLUMNS = ["rr1", "rr3", "rr6", "rr12", "rr24"]
+
+
+@dataclass
+class SynopConfig:
+    """Behaviour of the Météo-France stand-in."""
+
+    latency_ms: float = 50
+    latency_jitter_ms: float = 20
+    nb_stations: int = 62
+    nb_extra_columns: int = 50
+    not_found_rate: float = 0.02
+    # every burst_every requests, the next burst_length ones are answered 429, never when 0
+    burst_every: int = 0
+    burst_length: int = 0
+    seed: int = 0
+
+
+class Counters:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.values: dict[str, int] = {}
+
+    def add(self, **increments: int) -> int:
+        with self._lock:
+            for name, increment in increments.items():
+                self.values[name] = self.values.get(name, 0) + increment
+            return self.values.get("requests", 0)
+
+
+class SynopHandler(BaseHTTPRequestHandler):
+    """Serves generated SYNOP files under the donneespubliques paths."""
+
+    protocol_version = "HTTP/1.1"
+    config: SynopConfig
+    counters: Counters
+    s3_counters: Counters
+
+    def do_GET(self) -> None:
+        path = urlsplit(self.path).path
+        if path == STATS_PATH:
+            self._send(HTTPStatus.OK, json.dumps({"synop": self.counters.values, "s3": self.s3_counters.values}))
+            return
+
+        request_number = self.counters.add(requests=1)
+        time.sleep(max(random.gauss(self.config.latency_ms, self.config.latency_jitter_ms), 0) / 1000)
+
+        if self.config.burst_every and (request_number - 1) % self.config.burst_every < self.config.burst_length:
+            self.counters.add(too_many_requests=1)
+            self._send(HTTPStatus.TOO_MANY_REQUESTS, "")
+            return
+
+        if path == STATIONS_PATH:
+            self._send(HTTPStatus.OK, self._build_stations())
+            return
+
+        match = SYNOP_FILE_PATTERN.match(path)
+        # a missing file stays missing, whatever the number of attempts
+        if match is None or random.Random(f"{self.config.seed}-{path}").random() < self.config.not_found_rate:
+            self.counters.add(not_found=1)
+            self._send(HTTPStatus.NOT_FOUND, "")
+            return
+
+        self._send(HTTPStatus.OK, self._build_synop_file(match.group(1)))
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _build_synop_file(self, time_id: str) -> str:
+        rng = random.Random(f"{self.config.seed}-{time_id}")
+        extra_columns = [f"col{i}" for i in range(self.config.nb_extra_columns)]
+        lines = [";".join(["numer_sta", "date", *RAINFALL_COLUMNS, *extra_columns])]
+        for station_id in self._get_station_ids():
+            rainfall = ["mq" if rng.random() < 0.05 else f"{max(rng.gauss(0, 2), 0):.1f}" for _ in RAINFALL_COLUMNS]
+            extra = [f"{rng.uniform(-50, 1050):.1f}" for _ in extra_columns]
+            lines.append(";".join([str(station_id), f"{time_id}0000", *rainfall, *extra]))
+
+        return "\n".join(lines) + "\n"
+
+    def _build_stations(self) -> str:
+        rng = random.Random(self.config.seed)
+        lines = ["ID;Nom;Latitude;Longitude;Altitude"]
+        for station_id in self._get_station_ids():
+            lines.append(f"{station_id:05d};STATION {station_id};{rng.uniform(42, 51):.6f};{rng.uniform(-5, 8):.6f};0")
+
+        return "\n".join(lines) + "\n"
+
+    def _get_station_ids(self) -> list[int]:
+        # Bordeaux-Mérignac, the default station of the batch, is always part of the files
+        return [7510] + [7000 + 10 * i for i in range(self.config.nb_stations - 1) if 7000 + 10 * i != 7510]
+
+    def _send(self, status: HTTPStatus, body: str) -> None:
+        content = body.encode()
+        self.counters.add(bytes_out=len(content))
+        self.send_response(status)
+        self.send_header("Content-Type", "text/csv" if status == HTTPStatus.OK else "text/plain")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class S3Handler(BaseHTTPRequestHandler):
+    """Path-style subset of the S3 API used by the batch: objects, copies, conditional gets, ListObjectsV2 and
+    DeleteObjects."""
+
+    protocol_version = "HTTP/1.1"
+    MAX_KEYS = 1000
+    objects: dict[str, tuple[bytes, str, float]]
+    counters: Counters
+
+    def do_PUT(self) -> None:
+        content = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        copy_source = self.headers.get("x-amz-copy-source")
+        if copy_source is not None:
+            self._copy_object(unquote(copy_source).lstrip("/"))
+            return
+
+        etag = f'"{hashlib.md5(content).hexdigest()}"'
+        self.objects[self._get_key()] = (content, etag, time.time())
+        self.counters.add(requests=1, puts=1, bytes_in=len(content))
+        self._send(HTTPStatus.OK, headers={"ETag": etag})
+
+    def do_POST(self) -> None:
+        content = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.counters.add(requests=1, bytes_in=len(content))
+        if "delete" not in parse_qs(urlsplit(self.path).query, keep_blank_values=True):
+            self._send_error(HTTPStatus.NOT_IMPLEMENTED, "NotImplemented")
+            return
+
+        bucket = urlsplit(self.path).path.strip("/")
+        keys = [unescape(key) for key in re.findall(r"<Key>(.*?)</Key>", content.decode())]
+        for key in keys:
+            self.objects.pop(f"{bucket}/{key}", None)
+        self.counters.add(deletes=len(keys))
+        body = '<?xml version="1.0" encoding="UTF-8"?><DeleteResult></DeleteResult>'
+        self._send(HTTPStatus.OK, body.encode(), headers={"Content-Type": "application/xml"})
+
+    def do_GET(self) -> None:
+        self.counters.add(requests=1)
+        split_url = urlsplit(self.path)
+        if "/" not in split_url.path.lstrip("/"):
+            self._list_objects(parse_qs(split_url.query))
+            return
+
+        self.counters.add(gets=1)
+        stored = self.objects.get(self._get_key())
+        if stored is None:
+            self._send_error(HTTPStatus.NOT_FOUND, "NoSuchKey")
+            return
+
+        content, etag, modified_at = stored
+        headers = {"ETag": etag, "Last-Modified": formatdate(modified_at, usegmt=True)}
+        if self.headers.get("If-None-Match") == etag:
+            self._send(HTTPStatus.NOT_MODIFIED, headers=headers)
+            return
+
+        self.counters.add(bytes_out=len(content))
+        self._send(HTTPStatus.OK, content, headers=headers)
+
+    def do_HEAD(self) -> None:
+        self.counters.add(requests=1)
+        stored = self.objects.get(self._get_key())
+        if stored is None:
+            self._send(HTTPStatus.NOT_FOUND)
+            return
+        self._send(HTTPStatus.OK, headers={"ETag": stored[1], "Content-Length": str(len(stored[0]))})
+
+    def do_DELETE(self) -> None:
+        self.counters.add(requests=1)
+        self.objects.pop(self._get_key(), None)
+        self._send(HTTPStatus.NO_CONTENT)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _copy_object(self, source_key: str) -> None:
+        self.counters.add(requests=1, copies=1)
+        stored = self.objects.get(source_key)
+        if stored is None:
+            self._send_error(HTTPStatus.NOT_FOUND, "NoSuchKey")
+            return
+
+        content, etag, _ = stored
+        self.objects[self._get_key()] = (content, etag, time.time())
+        body = f'<?xml version="1.0" encoding="UTF-8"?><CopyObjectResult><ETag>{escape(etag)}</ETag></CopyObjectResult>'
+        self._send(HTTPStatus.OK, body.encode(), headers={"Content-Type": "application/xml"})
+
+    def _list_objects(self, query: dict[str, list[str]]) -> None:
+        bucket = urlsplit(self.path).path.strip("/")
+        prefix = query.get("prefix", [""])[0]
+        delimiter = query.get("delimiter", [""])[0]
+        start_after = query.get("continuation-token", query.get("start-after", [""]))[0]
+
+        keys = sorted(key.split("/", 1)[1] for key in self.objects if key.startswith(f"{bucket}/"))
+        keys = [key for key in keys if key.startswith(prefix) and key > start_after]
+
+        contents, prefixes, truncated = [], [], False
+        for position, key in enumerate(keys):
+            if len(contents) + len(prefixes) == self.MAX_KEYS:
+                # the next page starts after the last key examined, common prefixes included
+                truncated, last_key = True, keys[position - 1]
+                break
+            common_prefix = self._get_common_prefix(key, prefix, delimiter)
+            if common_prefix is None:
+                contents.append(key)
+            elif common_prefix not in prefixes:
+                prefixes.append(common_prefix)
+
+        body = "".join(
+            [
+                '<?xml version="1.0" encoding="UTF-8"?><ListBucketResult>',
+                f"<Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix>",
+                f"<KeyCount>{len(contents) + len(prefixes)}</KeyCount><MaxKeys>{self.MAX_KEYS}</MaxKeys>",
+                f"<IsTruncated>{str(truncated).lower()}</IsTruncated>",
+                f"<NextContinuationToken>{escape(last_key)}</NextContinuationToken>" if truncated else "",
+                *[self._format_content(bucket, key) for key in contents],
+                *[f"<CommonPrefixes><Prefix>{escape(prefix_)}</Prefix></CommonPrefixes>" for prefix_ in prefixes],
+                "</ListBucketResult>",
+            ]
+        )
+        self._send(HTTPStatus.OK, body.encode(), headers={"Content-Type": "application/xml"})
+
+    def _format_content(self, bucket: str, key: str) -> str:
+        content, etag, modified_at = self.objects[f"{bucket}/{key}"]
+        last_modified = dt.datetime.fromtimestamp(modified_at, dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        return (
+            f"<Contents><Key>{escape(key)}</Key><LastModified>{last_modified}</LastModified>"
+            f"<ETag>{escape(etag)}</ETag><Size>{len(content)}</Size><StorageClass>STANDARD</StorageClass></Contents>"
+        )
+
+    @staticmethod
+    def _get_common_prefix(key: str, prefix: str, delimiter: str) -> str | None:
+        position = key.find(delimiter, len(prefix)) if delimiter else -1
+        return key[: position + len(delimiter)] if position >= 0 else None
+
+    def _get_key(self) -> str:
+        return unquote(urlsplit(self.path).path.lstrip("/"))
+
+    def _send_error(self, status: HTTPStatus, code: str) -> None:
+        body = f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code><Message>{code}</Message></Error>'
+        self._send(status, body.encode(), headers={"Content-Type": "application/xml"})
+
+    def _send(self, status: HTTPStatus, content: bytes = b"", headers: dict[str, str] | None = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if "Content-Length" not in (headers or {}):
+            self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(content)
+
+
+def _serve(config: SynopConfig, ports: multiprocessing.Queue) -> None:
+    s3_counters = Counters()
+    S3Handler.objects, S3Handler.counters = {}, s3_counters
+    SynopHandler.config, SynopHandler.counters, SynopHandler.s3_counters = config, Counters(), s3_counters
+
+    servers = [ThreadingHTTPServer(("127.0.0.1", 0), handler) for handler in (SynopHandler, S3Handler)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    ports.put([server.server_port for server in servers])
+    threading.Event().wait()
+
+
+class StandIns:
+    """Météo-France and S3 stand-ins, served from a child process so that they do not share the batch interpreter."""
+
+    def __init__(self, config: SynopConfig) -> None:
+        self._config = config
+        self._process: multiprocessing.Process | None = None
+        self.synop_url = ""
+        self.s3_url = ""
+
+    def __enter__(self) -> "StandIns":
+        ports = multiprocessing.Queue()
+        self._process = multiprocessing.Process(target=_serve, args=(self._config, ports), daemon=True)
+        self._process.start()
+
+        synop_port, s3_port = ports.get(timeout=30)
+        self.synop_url = f"http://127.0.0.1:{synop_port}"
+        self.s3_url = f"http://127.0.0.1:{s3_port}"
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._process.terminate()
+        self._process.join()
+
+    def get_stats(self) -> dict[str, dict[str, int]]:
+        return requests.get(f"{self.synop_url}{STATS_PATH}").json()
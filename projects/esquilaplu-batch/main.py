@@ -1,38 +1,382 @@
+import argparse
+import contextlib
 import datetime as dt
+import functools
+import logging
 import os
+import signal
+import socket
+from pathlib import Path
 
 from dotenv import load_dotenv
 
+from src.domain.ports.outer import AppRepository
+from src.domain.services.history import HistoryServiceImpl
 from src.domain.services.laps import LapsServiceImpl
+from src.domain.services.lease import LeaseServiceImpl
+from src.domain.services.maintenance import OPERATIONS, MaintenanceServiceImpl
 from src.domain.services.record import RecordServiceImpl
+from src.domain.services.replica import ReplicaServiceImpl
+from src.domain.services.reprocess import ReprocessServiceImpl
+from src.domain.services.scheduler import SchedulerServiceImpl
+from src.domain.services.station import StationServiceImpl
+from src.domain.station_index import StationIndex
+from src.infrastructure.factories.mf_record import MeteoFranceRecordFactory
+from src.infrastructure.profiling import RunProfiler
 from src.infrastructure.repositories.app_s3 import AppS3Repository
+from src.infrastructure.repositories.app_sqlite import AppSQLiteRepository
+from src.infrastructure.repositories.lease_s3 import S3LeaseRepository
 from src.infrastructure.repositories.meteo_france import MeteoFranceRepository
+from src.infrastructure.repositories.object_store_s3 import S3ObjectStoreRepository
 
 load_dotenv("secrets/.env")
 
+logger = logging.getLogger(__name__)
 
-def main():
-    app_repository = AppS3Repository(
+
+def build_s3_repository(parse_workers: int = 0) -> AppS3Repository:
+    return AppS3Repository(
         bucket=os.getenv("S3_BUCKET"),
         root_key=os.getenv("ROOT_KEY", "esquilaplu"),
         secret_key=os.getenv("SECRET_ACCESS_KEY"),
         access_key=os.getenv("ACCESS_KEY_ID"),
+        parse_workers=parse_workers,
+        endpoint_url=os.getenv("S3_ENDPOINT_URL"),
+    )
+
+
+def build_lease_service(namespace: str) -> LeaseServiceImpl:
+    return LeaseServiceImpl(
+        lease_repository=S3LeaseRepository(
+            bucket=os.getenv("S3_BUCKET"),
+            root_key=os.getenv("ROOT_KEY", "esquilaplu"),
+            secret_key=os.getenv("SECRET_ACCESS_KEY"),
+            access_key=os.getenv("ACCESS_KEY_ID"),
+            endpoint_url=os.getenv("S3_ENDPOINT_URL"),
+        ),
+        owner=f"{socket.gethostname()}-{os.getpid()}",
+        namespace=namespace,
     )
-    mf_repository = MeteoFranceRepository(app_repository=app_repository)
 
-    laps_service = LapsServiceImpl(app_repository=app_repository)
+
+def build_sqlite_repository() -> AppSQLiteRepository:
+    return AppSQLiteRepository(path=os.getenv("SQLITE_PATH", "esquilaplu.db"))
+
+
+def build_app_repository(parse_workers: int = 0) -> AppRepository:
+    match os.getenv("APP_REPOSITORY", "s3"):
+        case "s3":
+            return build_s3_repository(parse_workers=parse_workers)
+        case "sqlite":
+            return build_sqlite_repository()
+        case backend:
+            raise ValueError(f"Invalid app repository: {backend}")
+
+
+@functools.cache
+def get_station_index(refresh: bool = False) -> StationIndex:
+    app_repository = build_app_repository()
+
+    stations = [] if refresh else app_repository.load_stations()
+    if not stations:
+        stations = MeteoFranceRepository(app_repository=app_repository).collect_stations()
+        app_repository.save_stations(stations)
+
+    return StationIndex(stations)
+
+
+def resolve_station_id(args: argparse.Namespace) -> int:
+    if args.near is not None:
+        return get_station_index().nearest(*args.near)[0].id
+
+    if args.place is not None:
+        stations = get_station_index().search(args.place)
+        if not stations:
+            raise ValueError(f"No station matches the place: {args.place}")
+        return stations[0].id
+
+    return args.station
+
+
+def build_record_service(
+    station_id: int = MeteoFranceRecordFactory.MERIGNAC_STATION_ID,
+    collect_budget: dt.timedelta | None = None,
+    profiler: RunProfiler | None = None,
+) -> RecordServiceImpl:
+    app_repository = build_app_repository()
+    mf_repository = MeteoFranceRepository(app_repository=app_repository, station_id=station_id)
+
+    laps_service = LapsServiceImpl(app_repository=app_repository, station_id=station_id)
 
     record_service = RecordServiceImpl(
         app_repository=app_repository,
         weather_repository=mf_repository,
+        station_id=station_id,
         laps_service=laps_service,
         max_collect_history_hr=14 * 24,
         min_collect_history_hr=5,
         now=dt.datetime.now(),
         # max_collect_iterations=5,
+        collect_budget=collect_budget,
+        laps_scope=profiler.laps if profiler is not None else contextlib.nullcontext,
+    )
+
+    return record_service
+
+
+def update(args: argparse.Namespace) -> None:
+    record_service = build_record_service(
+        station_id=resolve_station_id(args),
+        collect_budget=dt.timedelta(minutes=args.budget_min) if args.budget_min is not None else None,
+        profiler=args.profiler,
+    )
+    _, deferred_laps = record_service.update_records()
+    if deferred_laps:
+        logger.info(f"{len(deferred_laps)} laps deferred to the next run")
+
+
+def daemon(args: argparse.Namespace) -> None:
+    scheduler_service = SchedulerServiceImpl(
+        record_service=build_record_service(station_id=resolve_station_id(args), profiler=args.profiler),
+        publication_delay=dt.timedelta(minutes=args.publication_delay_min),
+        full_scan_interval=dt.timedelta(hours=args.full_scan_interval_hr),
+    )
+    scheduler_service.run()
+
+
+def locate_station(args: argparse.Namespace) -> None:
+    station_index = get_station_index(refresh=args.refresh)
+    latitude, longitude = args.location
+
+    for station in station_index.nearest(latitude, longitude, k=args.count):
+        distance_km = station_index.get_distance_km(station, latitude, longitude)
+        print(f"{station.id}\t{station.name}\t{distance_km:.1f} km")
+
+
+def reconcile_state(args: argparse.Namespace) -> None:
+    laps_service = LapsServiceImpl(app_repository=build_app_repository(), station_id=resolve_station_id(args))
+    state = laps_service.reconcile(since=args.since)
+    logger.info(f"Collected up to {state.watermark}, {len(state.holes)} missing laps since {state.since}")
+
+
+def backfill_stations(args: argparse.Namespace) -> None:
+    station_service = StationServiceImpl(
+        app_repository=build_app_repository(parse_workers=args.parse_workers),
+        lease_service=build_lease_service(namespace=f"backfill-stations/{args.coordinate}")
+        if args.coordinate
+        else None,
+    )
+    station_service.backfill_stations(start_time=args.since, end_time=args.until)
+
+
+def reprocess(args: argparse.Namespace) -> None:
+    app_repository = build_app_repository(parse_workers=args.parse_workers)
+    station_id = resolve_station_id(args)
+    reprocess_service = ReprocessServiceImpl(
+        app_repository=app_repository,
+        weather_repository=MeteoFranceRepository(app_repository=app_repository, station_id=station_id),
+        station_id=station_id,
+        lease_service=build_lease_service(namespace=f"reprocess/{args.run}"),
+        max_laps_per_second=args.max_laps_per_second,
+    )
+    reprocess_service.reprocess(start_time=args.since, end_time=args.until)
+
+
+def sync_replica(args: argparse.Namespace) -> None:
+    replica_service = ReplicaServiceImpl(
+        source_repository=build_s3_repository(), replica_repository=build_sqlite_repository()
+    )
+    replica_service.sync(since=args.since)
+
+
+def consolidate_history(args: argparse.Namespace) -> None:
+    history_service = HistoryServiceImpl(app_repository=build_app_repository(parse_workers=args.parse_workers))
+    history_service.consolidate()
+
+
+def maintain_keys(args: argparse.Namespace) -> None:
+    maintenance_service = MaintenanceServiceImpl(
+        object_store_repository=S3ObjectStoreRepository(
+            bucket=os.getenv("S3_BUCKET"),
+            root_key=os.getenv("ROOT_KEY", "esquilaplu"),
+            secret_key=os.getenv("SECRET_ACCESS_KEY"),
+            access_key=os.getenv("ACCESS_KEY_ID"),
+            endpoint_url=os.getenv("S3_ENDPOINT_URL"),
+            copy_workers=args.copy_workers,
+        )
+    )
+    report = maintenance_service.maintain_keys(
+        operation=args.operation,
+        prefix=args.prefix,
+        pattern=args.pattern,
+        replacement=args.replacement,
+        run=args.run,
+        dry_run=args.dry_run,
+        overwrite=args.overwrite,
+    )
+    print(
+        f"{'[dry run] ' if args.dry_run else ''}{report.listed} keys listed, {report.matched} matched, "
+        f"{report.copied} copied, {report.deleted} deleted, {len(report.failed)} failed, "
+        f"{len(report.skipped)} skipped"
+    )
+    for key in report.failed:
+        print(f"failed: {key}")
+    for key in report.skipped:
+        print(f"skipped: {key}")
+
+
+def parse_coordinates(value: str) -> tuple[float, float]:
+    latitude, longitude = value.split(",")
+    return float(latitude), float(longitude)
+
+
+def build_station_parser() -> argparse.ArgumentParser:
+    # records are collected for a single station, given by id or resolved to the nearest one; the options have no
+    # default so that a subcommand keeps a value given before it
+    station_parser = argparse.ArgumentParser(add_help=False, argument_default=argparse.SUPPRESS)
+    station_group = station_parser.add_mutually_exclusive_group()
+    station_group.add_argument("--station", type=int, help="station id, Bordeaux-Mérignac by default")
+    station_group.add_argument("--near", type=parse_coordinates, metavar="LAT,LON")
+    station_group.add_argument("--place", help="place name, matched against the station names")
+
+    return station_parser
+
+
+def parse_args() -> argparse.Namespace:
+    # parents share their actions, the top level parser gets its own so that its defaults stay out of the subcommands
+    parser = argparse.ArgumentParser(description="Esquilaplu batch", parents=[build_station_parser()])
+    parser.set_defaults(
+        func=update,
+        budget_min=None,
+        station=MeteoFranceRecordFactory.MERIGNAC_STATION_ID,
+        near=None,
+        place=None,
+    )
+
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        metavar="DIR",
+        help="write the CPU profile (pstats) and sampled stacks (collapsed) of the run and of each laps to DIR",
+    )
+    parser.add_argument(
+        "--profile-memory", action="store_true", help="also trace the allocations with tracemalloc, slows the run"
+    )
+    subparsers = parser.add_subparsers()
+    station_parser = build_station_parser()
+
+    update_parser = subparsers.add_parser(
+        "update", parents=[station_parser], help="collect missing weather data (default)"
+    )
+    update_parser.add_argument(
+        "--budget-min",
+        type=float,
+        help="wall clock budget, the most recent laps are then collected first and the rest deferred",
+    )
+    update_parser.set_defaults(func=update)
+
+    daemon_parser = subparsers.add_parser(
+        "daemon",
+        parents=[station_parser],
+        help="keep running and collect each laps shortly after its SYNOP publication",
+    )
+    daemon_parser.add_argument("--publication-delay-min", type=int, default=120)
+    daemon_parser.add_argument("--full-scan-interval-hr", type=int, default=24)
+    daemon_parser.set_defaults(func=daemon)
+
+    locate_parser = subparsers.add_parser("locate-station", help="list the stations nearest to a location")
+    locate_parser.add_argument("location", type=parse_coordinates, metavar="LAT,LON")
+    locate_parser.add_argument("--count", type=int, default=5)
+    locate_parser.add_argument("--refresh", action="store_true", help="download the stations list again")
+    locate_parser.set_defaults(func=locate_station)
+
+    reconcile_parser = subparsers.add_parser(
+        "reconcile-state",
+        parents=[station_parser],
+        help="rebuild the laps collection state of the station from its saved records",
+    )
+    reconcile_parser.add_argument(
+        "--since",
+        type=dt.datetime.fromisoformat,
+        default=dt.datetime.combine(dt.date.today() - dt.timedelta(days=14), dt.time()),
+    )
+    reconcile_parser.set_defaults(func=reconcile_state)
+
+    backfill_parser = subparsers.add_parser(
+        "backfill-stations", help="rebuild the per station layout and rollups from the saved raw datasets"
+    )
+    backfill_parser.add_argument("--since", type=dt.datetime.fromisoformat, default=dt.datetime(2000, 1, 1))
+    backfill_parser.add_argument("--until", type=dt.datetime.fromisoformat, default=dt.datetime.now())
+    backfill_parser.add_argument("--parse-workers", type=int, default=os.cpu_count())
+    backfill_parser.add_argument(
+        "--coordinate", metavar="RUN", help="share the months with every worker started with the same RUN name"
+    )
+    backfill_parser.set_defaults(func=backfill_stations)
+
+    reprocess_parser = subparsers.add_parser(
+        "reprocess", parents=[station_parser], help="rebuild the records of the station from the saved raw datasets"
+    )
+    reprocess_parser.add_argument(
+        "--run", required=True, help="run name, running again the same name resumes it or shares it between workers"
+    )
+    reprocess_parser.add_argument("--since", type=dt.datetime.fromisoformat, default=dt.datetime(2000, 1, 1))
+    reprocess_parser.add_argument("--until", type=dt.datetime.fromisoformat, default=dt.datetime.now())
+    reprocess_parser.add_argument("--parse-workers", type=int, default=os.cpu_count())
+    reprocess_parser.add_argument(
+        "--max-laps-per-second", type=float, default=0, help="raw datasets read per second, unlimited when 0"
+    )
+    reprocess_parser.set_defaults(func=reprocess)
+
+    sync_parser = subparsers.add_parser("sync-replica", help="copy the S3 raw datasets into the local SQLite store")
+    sync_parser.add_argument("--since", type=dt.datetime.fromisoformat, default=dt.datetime(2000, 1, 1))
+    sync_parser.set_defaults(func=sync_replica)
+
+    history_parser = subparsers.add_parser(
+        "consolidate-history", help="merge the new raw datasets into the consolidated history dataset"
+    )
+    history_parser.add_argument("--parse-workers", type=int, default=os.cpu_count())
+    history_parser.set_defaults(func=consolidate_history)
+
+    maintenance_parser = subparsers.add_parser(
+        "maintain-keys", help="copy, rename or delete the S3 keys under a prefix which match a pattern"
+    )
+    maintenance_parser.add_argument("operation", choices=OPERATIONS)
+    maintenance_parser.add_argument("--prefix", required=True, help="prefix under ROOT_KEY, e.g. raw/meteofrance/")
+    maintenance_parser.add_argument(
+        "--pattern", help="regular expression the whole key must match, every key under the prefix by default"
+    )
+    maintenance_parser.add_argument(
+        "--replacement", help="destination of the copied or renamed keys, e.g. \\1-0\\2.csv"
+    )
+    maintenance_parser.add_argument(
+        "--run", help="run name, the progress is saved so that running again the same name resumes it"
     )
+    maintenance_parser.add_argument("--dry-run", action="store_true", help="only report what would be done")
+    maintenance_parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="copy over existing destinations, keys whose destination exists are skipped otherwise",
+    )
+    maintenance_parser.add_argument("--copy-workers", type=int, default=16)
+    maintenance_parser.set_defaults(func=maintain_keys)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO)
+    args.profiler = None
+    if args.profile is None:
+        args.func(args)
+        return
 
-    record_service.update_records()
+    args.profiler = RunProfiler(output_dir=args.profile, trace_memory=args.profile_memory)
+    # the daemon only stops on a signal: SIGTERM (docker stop) unwinds the run like Ctrl-C, and the profile is written
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    with contextlib.suppress(KeyboardInterrupt), args.profiler.run():
+        args.func(args)
+    print(f"Profile written to {args.profile}")
 
 
 if __name__ == "__main__":
@@ -1,4 +1,6 @@
-from dataclasses import asdict, dataclass
+import datetime as dt
+from dataclasses import asdict, dataclass, field
+from typing import Iterator
 
 from .value_objects import Laps
 
@@ -16,3 +18,180 @@ class Record:
 
     def __hash__(self) -> int:
         return hash(self.laps)
+
+
+@dataclass
+class CollectFailure:
+    start_time: dt.datetime
+    failure_class: str
+    attempts: int
+    next_attempt_time: dt.datetime
+
+
+@dataclass
+class CollectState:
+    """Every laps starting from `since` up to `watermark` is collected, except the `holes`."""
+
+    since: dt.datetime
+    watermark: dt.datetime | None = None
+    holes: list[dt.datetime] = field(default_factory=list)
+    laps_duration_hr: int = 3
+    failures: list[CollectFailure] = field(default_factory=list)
+
+    @classmethod
+    def from_available_laps(
+        cls, since: dt.datetime, available_laps: list[Laps], laps_duration_hr: int = 3
+    ) -> "CollectState":
+        state = cls(since=since, laps_duration_hr=laps_duration_hr)
+
+        available_times = {laps.start_time for laps in available_laps if laps.start_time >= since}
+        if available_times:
+            state.watermark = max(available_times)
+            state.holes = [slot for slot in state._iter_slots(since, state.watermark) if slot not in available_times]
+
+        return state
+
+    @classmethod
+    def from_dict(cls, content: dict) -> "CollectState":
+        return cls(
+            since=dt.datetime.fromisoformat(content["since"]),
+            watermark=dt.datetime.fromisoformat(content["watermark"]) if content["watermark"] else None,
+            holes=[dt.datetime.fromisoformat(hole) for hole in content["holes"]],
+            laps_duration_hr=content["laps_duration_hr"],
+            failures=[
+                CollectFailure(
+                    start_time=dt.datetime.fromisoformat(failure["start_time"]),
+                    failure_class=failure["failure_class"],
+                    attempts=failure["attempts"],
+                    next_attempt_time=dt.datetime.fromisoformat(failure["next_attempt_time"]),
+                )
+                for failure in content.get("failures", [])
+            ],
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def get_missing_laps(self, start_time: dt.datetime, end_time: dt.datetime) -> list[Laps]:
+        missing_times = [hole for hole in self.holes if start_time <= hole <= end_time]
+        missing_times += list(self._iter_slots(max(self._get_first_untracked_slot(), start_time), end_time))
+
+        return [Laps(start_time=missing_time, duration_hours=self.laps_duration_hr) for missing_time in missing_times]
+
+    def mark_collected(self, laps: list[Laps]) -> None:
+        collected_times = {laps_.start_time for laps_ in laps}
+        if not collected_times:
+            return
+
+        self.holes = [hole for hole in self.holes if hole not in collected_times]
+        self.failures = [failure for failure in self.failures if failure.start_time not in collected_times]
+
+        newest_time = max(collected_times)
+        if self.watermark is None or newest_time > self.watermark:
+            skipped_slots = self._iter_slots(self._get_first_untracked_slot(), newest_time)
+            self.holes += [slot for slot in skipped_slots if slot not in collected_times]
+            self.watermark = newest_time
+
+    def mark_failed(
+        self, laps: Laps, failure_class: str, now: dt.datetime, retry_base_delay: dt.timedelta
+    ) -> CollectFailure:
+        """Count a new failed attempt and delay the next one exponentially."""
+        failure = next((failure for failure in self.failures if failure.start_time == laps.start_time), None)
+        if failure is None:
+            failure = CollectFailure(
+                start_time=laps.start_time, failure_class=failure_class, attempts=0, next_attempt_time=now
+            )
+            self.failures.append(failure)
+
+        failure.failure_class = failure_class
+        failure.attempts += 1
+        failure.next_attempt_time = now + retry_base_delay * 2 ** (failure.attempts - 1)
+
+        return failure
+
+    def is_missing(self, start_time: dt.datetime) -> bool:
+        return start_time >= self.since and (
+            self.watermark is None or start_time > self.watermark or start_time in self.holes
+        )
+
+    def forget_before(self, start_time: dt.datetime) -> None:
+        if start_time <= self.since:
+            return
+
+        self.since = start_time
+        self.holes = [hole for hole in self.holes if hole >= start_time]
+        self.failures = [failure for failure in self.failures if failure.start_time >= start_time]
+
+    def _get_first_untracked_slot(self) -> dt.datetime:
+        if self.watermark is None:
+            return self.since
+        return self.watermark + dt.timedelta(hours=self.laps_duration_hr)
+
+    def _iter_slots(self, start_time: dt.datetime, end_time: dt.datetime) -> Iterator[dt.datetime]:
+        current_time = start_time
+        while current_time <= end_time:
+            yield current_time
+            current_time += dt.timedelta(hours=self.laps_duration_hr)
+
+
+@dataclass
+class Lease:
+    """Claim of `owner` on a shared piece of work, valid until `expires_at` or for good once `done`."""
+
+    name: str
+    owner: str
+    expires_at: dt.datetime
+    done: bool = False
+
+    @classmethod
+    def from_dict(cls, content: dict) -> "Lease":
+        return cls(
+            name=content["name"],
+            owner=content["owner"],
+            expires_at=dt.datetime.fromisoformat(content["expires_at"]),
+            done=content["done"],
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def is_expired(self, now: dt.datetime) -> bool:
+        return not self.done and self.expires_at <= now
+
+
+@dataclass
+class MaintenanceReport:
+    """Outcome of a key maintenance run, planned actions only when it is a dry run."""
+
+    listed: int = 0
+    matched: int = 0
+    copied: int = 0
+    deleted: int = 0
+    failed: list[str] = field(default_factory=list)
+    # failed keys which were copied, only their deletion is left to do
+    failed_deletes: list[str] = field(default_factory=list)
+    # sources left in place since their destination already exists or is the destination of another source
+    skipped: list[str] = field(default_factory=list)
+
+
+@dataclass
+class MaintenanceCheckpoint:
+    """Progress of a key maintenance run: every key up to `last_key` is processed, but the `pending_keys`.
+
+    The `pending_deletes` are sources already copied to their destination, which are only left to delete.
+    """
+
+    last_key: str = ""
+    pending_keys: list[str] = field(default_factory=list)
+    pending_deletes: list[str] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, content: dict) -> "MaintenanceCheckpoint":
+        return cls(
+            last_key=content["last_key"],
+            pending_keys=content.get("pending_keys", []),
+            pending_deletes=content.get("pending_deletes", []),
+        )
+
+    def to_dict(self) -> dict:
+        return asdict(self)
@@ -8,3 +8,7 @@ class WeatherCollectionError(BaseWeatherException):
 
 class WeatherRecordError(WeatherCollectionError):
     pass
+
+
+class WeatherDataNotFoundError(WeatherCollectionError):
+    pass
@@ -1,12 +1,17 @@
 import datetime as dt
 from abc import ABC, abstractmethod
 
+from ..entities import CollectState, Lease, MaintenanceReport
 from ..value_objects import Laps
 
 
 class RecordService(ABC):
     @abstractmethod
-    def update_records(self) -> None:
+    def update_records(self, now: dt.datetime | None = None) -> tuple[list[Laps], list[Laps]]:
+        pass
+
+    @abstractmethod
+    def collect_laps(self, laps: list[Laps]) -> list[Laps]:
         pass
 
 
@@ -14,3 +19,78 @@ class LapService(ABC):
     @abstractmethod
     def get_missing_laps(self, start_time: dt.datetime, end_time: dt.datetime) -> list[Laps]:
         pass
+
+    @abstractmethod
+    def mark_collected(self, laps: list[Laps]) -> None:
+        pass
+
+    @abstractmethod
+    def mark_failed(self, failures: dict[Laps, str]) -> None:
+        pass
+
+    @abstractmethod
+    def reconcile(self, since: dt.datetime) -> CollectState:
+        pass
+
+
+class StationService(ABC):
+    @abstractmethod
+    def backfill_stations(self, start_time: dt.datetime, end_time: dt.datetime) -> None:
+        pass
+
+
+class ReprocessService(ABC):
+    @abstractmethod
+    def reprocess(self, start_time: dt.datetime, end_time: dt.datetime) -> None:
+        pass
+
+
+class ReplicaService(ABC):
+    @abstractmethod
+    def sync(self, since: dt.datetime) -> None:
+        pass
+
+
+class HistoryService(ABC):
+    @abstractmethod
+    def consolidate(self) -> None:
+        pass
+
+
+class SchedulerService(ABC):
+    @abstractmethod
+    def run(self, max_cycles: int = -1) -> None:
+        pass
+
+
+class LeaseService(ABC):
+    @abstractmethod
+    def acquire(self, name: str) -> Lease | None:
+        pass
+
+    @abstractmethod
+    def renew(self, lease: Lease) -> Lease | None:
+        pass
+
+    @abstractmethod
+    def complete(self, lease: Lease) -> None:
+        pass
+
+    @abstractmethod
+    def is_done(self, name: str) -> bool:
+        pass
+
+
+class MaintenanceService(ABC):
+    @abstractmethod
+    def maintain_keys(
+        self,
+        operation: str,
+        prefix: str,
+        pattern: str | None = None,
+        replacement: str | None = None,
+        run: str | None = None,
+        dry_run: bool = False,
+        overwrite: bool = False,
+    ) -> MaintenanceReport:
+        pass
@@ -1,9 +1,9 @@
 import datetime as dt
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Iterator
 
-from ..entities import Record
-from ..value_objects import Laps
+from ..entities import CollectState, Lease, MaintenanceCheckpoint, Record
+from ..value_objects import Laps, Station, WindowRainfall
 
 
 class AppRepository(ABC):
@@ -19,11 +19,24 @@ class AppRepository(ABC):
         """
 
     @abstractmethod
-    def save_many_records(self, records: list[Record]) -> None:
+    def get_recorded_laps_since(self, station_id: int, since: dt.datetime) -> list[Laps]:
+        """get the laps whose record of a station is saved, since a given datetime
+
+        Args:
+            station_id (int): weather station id
+            since (dt.datetime): datetime to start searching from
+
+        Returns:
+            list[Laps]: recorded laps
+        """
+
+    @abstractmethod
+    def save_many_records(self, records: list[Record], station_id: int) -> None:
         """save many records
 
         Args:
             records (list[Record]): list of records to save
+            station_id (int): weather station id of the records
         """
 
     @abstractmethod
@@ -35,6 +48,136 @@ class AppRepository(ABC):
             laps (Laps): laps
         """
 
+    @abstractmethod
+    def load_raw_dataset(self, laps: Laps) -> Any:
+        """load a previously saved raw weather dataset
+
+        Args:
+            laps (Laps): laps
+
+        Returns:
+            Any: raw dataset
+        """
+
+    @abstractmethod
+    def load_raw_datasets(self, laps: list[Laps]) -> list[Any]:
+        """load many previously saved raw weather datasets at once
+
+        Args:
+            laps (list[Laps]): laps
+
+        Returns:
+            list[Any]: raw datasets, in the laps order
+        """
+
+    @abstractmethod
+    def save_station_datasets(self, datasets: list[Any]) -> None:
+        """merge raw weather datasets into the per station, time partitioned layout
+
+        Args:
+            datasets (list[Any]): raw datasets to merge
+        """
+
+    @abstractmethod
+    def get_consolidated_laps(self) -> list[Laps]:
+        """get the laps already merged into the consolidated history dataset
+
+        Returns:
+            list[Laps]: consolidated laps
+        """
+
+    @abstractmethod
+    def save_consolidated_datasets(self, datasets: list[Any], laps: list[Laps]) -> None:
+        """merge raw weather datasets into the consolidated history dataset
+
+        Args:
+            datasets (list[Any]): raw datasets to merge
+            laps (list[Laps]): laps of the merged datasets
+        """
+
+    @abstractmethod
+    def update_rollups(self, laps: list[Laps]) -> None:
+        """update the daily, monthly and yearly rainfall rollups of the periods containing the given laps
+
+        Args:
+            laps (list[Laps]): laps collected since the last update
+        """
+
+    @abstractmethod
+    def get_station_records(self, station_id: int, start_time: dt.datetime, end_time: dt.datetime) -> list[Record]:
+        """get the records of a station whose laps start between two datetimes, bounds included
+
+        Args:
+            station_id (int): weather station id
+            start_time (dt.datetime): first laps start time
+            end_time (dt.datetime): last laps start time
+
+        Returns:
+            list[Record]: records sorted by laps start time
+        """
+
+    @abstractmethod
+    def get_daily_rainfall(self, station_id: int, start_date: dt.date, end_date: dt.date) -> dict[dt.date, float]:
+        """get the daily rainfall totals of a station between two dates, bounds included
+
+        Args:
+            station_id (int): weather station id
+            start_date (dt.date): first day
+            end_date (dt.date): last day
+
+        Returns:
+            dict[dt.date, float]: rainfall in mm by day, days without data are missing
+        """
+
+    @abstractmethod
+    def get_window_rainfall(self, station_id: int, start_time: dt.datetime, end_time: dt.datetime) -> WindowRainfall:
+        """get the rainfall of a station over the laps starting between two datetimes, bounds included
+
+        Args:
+            station_id (int): weather station id
+            start_time (dt.datetime): first laps start time
+            end_time (dt.datetime): last laps start time
+
+        Returns:
+            WindowRainfall: rainfall total and number of observed laps of the window
+        """
+
+    @abstractmethod
+    def load_stations(self) -> list[Station]:
+        """load the weather stations metadata
+
+        Returns:
+            list[Station]: stations, empty when never saved
+        """
+
+    @abstractmethod
+    def save_stations(self, stations: list[Station]) -> None:
+        """save the weather stations metadata
+
+        Args:
+            stations (list[Station]): stations
+        """
+
+    @abstractmethod
+    def load_collect_state(self, station_id: int) -> CollectState | None:
+        """load the persisted laps collection state of a station
+
+        Args:
+            station_id (int): weather station id
+
+        Returns:
+            CollectState | None: collection state, None when it was never saved
+        """
+
+    @abstractmethod
+    def save_collect_state(self, state: CollectState, station_id: int) -> None:
+        """persist the laps collection state of a station
+
+        Args:
+            state (CollectState): collection state
+            station_id (int): weather station id
+        """
+
 
 class WeatherDataRepository(ABC):
     @abstractmethod
@@ -47,3 +190,111 @@ class WeatherDataRepository(ABC):
         Returns:
             Record: collected record
         """
+
+    @abstractmethod
+    def extract_record(self, dataset: Any, laps: Laps) -> Record:
+        """Extract the record of a laps from its raw weather dataset, as collect_record does.
+
+        Args:
+            dataset (Any): raw dataset, collected or loaded back from the app repository
+            laps (Laps): laps
+
+        Returns:
+            Record: extracted record
+        """
+
+    @abstractmethod
+    def collect_stations(self) -> list[Station]:
+        """Collect the metadata of the weather stations.
+
+        Returns:
+            list[Station]: stations
+        """
+
+
+class LeaseRepository(ABC):
+    @abstractmethod
+    def get_lease(self, name: str) -> Lease | None:
+        """get the current lease of a piece of work
+
+        Args:
+            name (str): lease name
+
+        Returns:
+            Lease | None: lease, None when the work was never claimed
+        """
+
+    @abstractmethod
+    def put_lease(self, lease: Lease) -> None:
+        """write a lease, replacing the current one
+
+        Args:
+            lease (Lease): lease to write
+        """
+
+
+class ObjectStoreRepository(ABC):
+    @abstractmethod
+    def list_keys(self, prefix: str, start_after: str = "") -> Iterator[list[str]]:
+        """list the keys under a prefix, page by page and in key order
+
+        Args:
+            prefix (str): prefix, relative to the root key
+            start_after (str, optional): list the keys after this one only. Defaults to "".
+
+        Returns:
+            Iterator[list[str]]: pages of keys, relative to the root key
+        """
+
+    @abstractmethod
+    def copy_objects(self, moves: list[tuple[str, str]]) -> list[str]:
+        """copy objects server side, in parallel
+
+        Args:
+            moves (list[tuple[str, str]]): source and destination keys
+
+        Returns:
+            list[str]: source keys which could not be copied
+        """
+
+    @abstractmethod
+    def find_existing_keys(self, keys: list[str]) -> list[str]:
+        """find which of the given keys exist, in parallel
+
+        Args:
+            keys (list[str]): keys to look for
+
+        Returns:
+            list[str]: existing keys, in the given order
+        """
+
+    @abstractmethod
+    def delete_objects(self, keys: list[str]) -> list[str]:
+        """delete objects, in batches
+
+        Args:
+            keys (list[str]): keys to delete
+
+        Returns:
+            list[str]: keys which could not be deleted
+        """
+
+    @abstractmethod
+    def get_checkpoint(self, name: str) -> MaintenanceCheckpoint | None:
+        """get the progress of a maintenance run
+
+        Args:
+            name (str): run name
+
+        Returns:
+            MaintenanceCheckpoint | None: progress, None when the run never started
+        """
+
+    @abstractmethod
+    def put_checkpoint(self, name: str, checkpoint: MaintenanceCheckpoint) -> None:
+        """write the progress of a maintenance run
+
+        Args:
+            name (str): run name
+            checkpoint (MaintenanceCheckpoint): progress
+        """
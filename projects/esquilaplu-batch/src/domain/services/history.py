@@ -0,0 +1,31 @@
+import datetime as dt
+import itertools
+import logging
+
+from tqdm import tqdm
+
+from ..ports.inner import HistoryService
+from ..ports.outer import AppRepository
+
+
+class HistoryServiceImpl(HistoryService):
+    def __init__(self, app_repository: AppRepository) -> None:
+        self._logger = logging.getLogger(__name__)
+        self._app_repository = app_repository
+
+    def consolidate(self) -> None:
+        consolidated_laps = set(self._app_repository.get_consolidated_laps())
+        pending_laps = sorted(
+            laps
+            for laps in self._app_repository.get_available_laps_since(since=dt.datetime.min)
+            if laps not in consolidated_laps
+        )
+
+        # each month is persisted with its laps, so an interrupted consolidation resumes where it stopped
+        for month, month_laps in tqdm(
+            itertools.groupby(pending_laps, key=lambda laps: (laps.start_time.year, laps.start_time.month))
+        ):
+            month_laps = list(month_laps)
+            datasets = self._app_repository.load_raw_datasets(laps=month_laps)
+            self._app_repository.save_consolidated_datasets(datasets=datasets, laps=month_laps)
+            self._logger.info(f"{len(datasets)} raw datasets consolidated for {month}")
@@ -1,32 +1,118 @@
 import datetime as dt
+import logging
+from typing import Callable
 
 from src.domain.ports.inner import LapService
 from src.domain.ports.outer import AppRepository
 
+from ..entities import CollectFailure, CollectState
+from ..exceptions import WeatherDataNotFoundError
 from ..value_objects import Laps
 
 
 class LapsServiceImpl(LapService):
     MF_LAPS_DURATION = 3
+    # only files that do not exist can be given up, other failures are retried until they leave the window
+    PERMANENT_FAILURE_CLASSES = {WeatherDataNotFoundError.__name__}
 
-    def __init__(self, app_repository: AppRepository) -> None:
+    def __init__(
+        self,
+        app_repository: AppRepository,
+        station_id: int,
+        max_attempts: int = 5,
+        retry_base_delay: dt.timedelta = dt.timedelta(hours=3),
+        publication_window: dt.timedelta = dt.timedelta(hours=12),
+        clock: Callable[[], dt.datetime] = dt.datetime.now,
+    ) -> None:
+        self._logger = logging.getLogger(__name__)
         self._app_repository = app_repository
+        # the state is kept per station, as are the records it plans
+        self._station_id = station_id
+        self._max_attempts = max_attempts
+        self._retry_base_delay = retry_base_delay
+        # files may be published late, until then a missing file is not a failure
+        self._publication_window = publication_window
+        self._clock = clock
+        self._state: CollectState | None = None
 
     def get_missing_laps(self, start_time: dt.datetime, end_time: dt.datetime) -> list[Laps]:
-        laps = self._app_repository.get_available_laps_since(since=start_time)
+        first_slot = dt.datetime(start_time.year, start_time.month, start_time.day, 0)
 
-        HOURS = [0, 3, 6, 9, 12, 15, 18, 21]
+        state = self._get_state()
+        if state is None or first_slot < state.since:
+            state = self.reconcile(since=first_slot)
 
-        missing_dts = []
-        current_dt = dt.datetime(start_time.year, start_time.month, start_time.day, 0)
+        now = self._clock()
+        failures = {failure.start_time: failure for failure in state.failures}
+        missing_laps = [
+            laps
+            for laps in state.get_missing_laps(start_time=first_slot, end_time=end_time)
+            if self._should_attempt(failures.get(laps.start_time), now)
+        ]
 
-        while current_dt <= end_time:
-            if current_dt.hour not in HOURS:
-                current_dt += dt.timedelta(hours=1)
+        # holes older than the planning window will not be collected anymore
+        state.forget_before(first_slot)
+        self._app_repository.save_collect_state(state=state, station_id=self._station_id)
+
+        return missing_laps
+
+    def mark_collected(self, laps: list[Laps]) -> None:
+        state = self._get_state()
+        if state is None or not laps:
+            # nothing tracked yet, the next planning rebuilds the state from the storage
+            return
+
+        state.mark_collected(laps)
+        self._app_repository.save_collect_state(state=state, station_id=self._station_id)
+
+    def mark_failed(self, failures: dict[Laps, str]) -> None:
+        state = self._get_state()
+        if state is None or not failures:
+            return
+
+        now = self._clock()
+        for laps, failure_class in failures.items():
+            if failure_class in self.PERMANENT_FAILURE_CLASSES and not self._is_past_publication(laps, now):
+                # the daemon retries recent laps within minutes, they would otherwise be given up within an hour
+                self._logger.info(f"{laps} is not published yet, not counted as a failed attempt.")
                 continue
 
-            if current_dt not in laps:
-                missing_dts.append(Laps(start_time=current_dt, duration_hours=3))
-            current_dt += dt.timedelta(hours=3)
+            failure = state.mark_failed(
+                laps=laps, failure_class=failure_class, now=now, retry_base_delay=self._retry_base_delay
+            )
+            if self._is_permanent(failure):
+                self._logger.warning(f"{laps} is permanently missing after {failure.attempts} attempts.")
+
+        self._app_repository.save_collect_state(state=state, station_id=self._station_id)
+
+    def reconcile(self, since: dt.datetime) -> CollectState:
+        previous_state = self._get_state()
+
+        # raw datasets hold every station, only the records tell whether the laps of this one were collected
+        recorded_laps = self._app_repository.get_recorded_laps_since(station_id=self._station_id, since=since)
+        self._state = CollectState.from_available_laps(
+            since=since, available_laps=recorded_laps, laps_duration_hr=self.MF_LAPS_DURATION
+        )
+        if previous_state is not None:
+            self._state.failures = [
+                failure for failure in previous_state.failures if self._state.is_missing(failure.start_time)
+            ]
+        self._app_repository.save_collect_state(state=self._state, station_id=self._station_id)
+
+        return self._state
+
+    def _should_attempt(self, failure: CollectFailure | None, now: dt.datetime) -> bool:
+        if failure is None:
+            return True
+        return not self._is_permanent(failure) and failure.next_attempt_time <= now
+
+    def _is_past_publication(self, laps: Laps, now: dt.datetime) -> bool:
+        return laps.start_time + dt.timedelta(hours=laps.duration_hours) + self._publication_window <= now
+
+    def _is_permanent(self, failure: CollectFailure) -> bool:
+        return failure.failure_class in self.PERMANENT_FAILURE_CLASSES and failure.attempts >= self._max_attempts
 
-        return missing_dts
+    def _get_state(self) -> CollectState | None:
+        if self._state is None:
+            self._state = self._app_repository.load_collect_state(station_id=self._station_id)
+        return self._state
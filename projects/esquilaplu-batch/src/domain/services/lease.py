@@ -0,0 +1,71 @@
+import datetime as dt
+import logging
+import time
+from typing import Callable
+
+from ..entities import Lease
+from ..ports.inner import LeaseService
+from ..ports.outer import LeaseRepository
+
+
+class LeaseServiceImpl(LeaseService):
+    def __init__(
+        self,
+        lease_repository: LeaseRepository,
+        owner: str,
+        namespace: str,
+        ttl: dt.timedelta = dt.timedelta(minutes=15),
+        settle_delay: dt.timedelta = dt.timedelta(seconds=2),
+        clock: Callable[[], dt.datetime] = dt.datetime.now,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._logger = logging.getLogger(__name__)
+        self._lease_repository = lease_repository
+        self._owner = owner
+        self._namespace = namespace
+        self._ttl = ttl
+        self._settle_delay = settle_delay
+        self._clock = clock
+        self._sleep = sleep
+
+    def acquire(self, name: str) -> Lease | None:
+        name = f"{self._namespace}/{name}"
+
+        current_lease = self._lease_repository.get_lease(name=name)
+        if current_lease is not None and (
+            current_lease.done or (current_lease.owner != self._owner and not current_lease.is_expired(self._clock()))
+        ):
+            return None
+
+        if current_lease is not None and current_lease.owner != self._owner:
+            self._logger.info(f"Taking over the expired lease {name} of {current_lease.owner}")
+
+        lease = Lease(name=name, owner=self._owner, expires_at=self._clock() + self._ttl)
+        self._lease_repository.put_lease(lease=lease)
+
+        # the storage has no conditional write: when workers race for a lease, the last write wins,
+        # so the claim only holds if it is still there once the concurrent writes have landed
+        self._sleep(self._settle_delay.total_seconds())
+        if self._lease_repository.get_lease(name=name) != lease:
+            return None
+
+        return lease
+
+    def renew(self, lease: Lease) -> Lease | None:
+        if self._lease_repository.get_lease(name=lease.name) != lease:
+            self._logger.warning(f"Lease {lease.name} was lost")
+            return None
+
+        renewed_lease = Lease(name=lease.name, owner=self._owner, expires_at=self._clock() + self._ttl)
+        self._lease_repository.put_lease(lease=renewed_lease)
+
+        return renewed_lease
+
+    def complete(self, lease: Lease) -> None:
+        self._lease_repository.put_lease(
+            lease=Lease(name=lease.name, owner=self._owner, expires_at=lease.expires_at, done=True)
+        )
+
+    def is_done(self, name: str) -> bool:
+        lease = self._lease_repository.get_lease(name=f"{self._namespace}/{name}")
+        return lease is not None and lease.done
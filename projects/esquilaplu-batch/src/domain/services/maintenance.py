@@ -0,0 +1,161 @@
+import itertools
+import logging
+import re
+
+from tqdm import tqdm
+
+from ..entities import MaintenanceCheckpoint, MaintenanceReport
+from ..ports.inner import MaintenanceService
+from ..ports.outer import ObjectStoreRepository
+
+OPERATIONS = ("copy", "rename", "delete")
+
+
+class MaintenanceServiceImpl(MaintenanceService):
+    # planned actions logged by a dry run
+    DRY_RUN_SAMPLE_SIZE = 10
+
+    def __init__(self, object_store_repository: ObjectStoreRepository) -> None:
+        self._logger = logging.getLogger(__name__)
+        self._object_store_repository = object_store_repository
+
+    def maintain_keys(
+        self,
+        operation: str,
+        prefix: str,
+        pattern: str | None = None,
+        replacement: str | None = None,
+        run: str | None = None,
+        dry_run: bool = False,
+        overwrite: bool = False,
+    ) -> MaintenanceReport:
+        """Copy, rename or delete the keys under a prefix which fully match a pattern, page by page.
+
+        Destination keys are the matched keys with the pattern substituted by the replacement. Unless overwriting,
+        sources whose destination already exists, or is the destination of an earlier source, are skipped. When a run
+        name is given, the progress is saved after each page and running the same name again resumes after the last
+        processed key, trying the failed and skipped keys again first. Sources whose copy succeeded but whose deletion
+        failed are only deleted then, since their destination now exists.
+        """
+        if operation not in OPERATIONS:
+            raise ValueError(f"Invalid operation: {operation}, expected one of {OPERATIONS}")
+        if operation != "delete" and replacement is None:
+            raise ValueError(f"A replacement is required to {operation} keys")
+        compiled_pattern = re.compile(pattern if pattern is not None else f"{re.escape(prefix)}.*")
+
+        checkpoint = (
+            self._object_store_repository.get_checkpoint(name=run) if run else None
+        ) or MaintenanceCheckpoint()
+        if checkpoint.last_key:
+            self._logger.info(
+                f"Resuming {run} after {checkpoint.last_key}, {len(checkpoint.pending_keys)} pending keys "
+                f"and {len(checkpoint.pending_deletes)} pending deletes first"
+            )
+        pages = self._object_store_repository.list_keys(prefix=prefix, start_after=checkpoint.last_key)
+        if checkpoint.pending_keys:
+            pages = itertools.chain([checkpoint.pending_keys], pages)
+
+        report, destinations = MaintenanceReport(), set()
+        if checkpoint.pending_deletes:
+            checkpoint = self._delete_pending(checkpoint, report, run, dry_run)
+
+        with tqdm(unit="keys") as progress:
+            for keys in pages:
+                moves = self._plan(keys, compiled_pattern, replacement if operation != "delete" else None)
+                if operation != "delete" and not overwrite:
+                    moves = self._skip_conflicts(moves, destinations, report)
+                report.listed += len(keys)
+                report.matched += len(moves)
+
+                if dry_run:
+                    self._log_plan(operation, moves, already_logged=report.matched - len(moves))
+                    report.copied += len(moves) if operation != "delete" else 0
+                    report.deleted += len(moves) if operation != "copy" else 0
+                else:
+                    self._apply(operation, moves, report)
+                    if run:
+                        # pending keys sort before the last key, the run goes on from the furthest listed one
+                        checkpoint = self._save_checkpoint(run, max(checkpoint.last_key, keys[-1]), report)
+
+                progress.update(len(keys))
+                progress.set_postfix(matched=report.matched, failed=len(report.failed), skipped=len(report.skipped))
+
+        return report
+
+    @staticmethod
+    def _plan(keys: list[str], pattern: re.Pattern, replacement: str | None) -> list[tuple[str, str | None]]:
+        moves = []
+        for key in keys:
+            if not pattern.fullmatch(key):
+                continue
+            destination = pattern.sub(replacement, key) if replacement is not None else None
+            if destination == key:
+                continue
+            # a destination listed later would otherwise be processed again
+            if destination is not None and pattern.fullmatch(destination):
+                raise ValueError(f"Destination {destination} of {key} also matches the pattern")
+            moves.append((key, destination))
+
+        return moves
+
+    def _skip_conflicts(
+        self, moves: list[tuple[str, str]], destinations: set[str], report: MaintenanceReport
+    ) -> list[tuple[str, str]]:
+        # copying over an existing object loses it, and a rename then deletes the source it was overwritten with
+        existing_destinations = set(
+            self._object_store_repository.find_existing_keys(keys=[destination for _, destination in moves])
+        )
+
+        kept_moves = []
+        for source, destination in moves:
+            if destination in existing_destinations or destination in destinations:
+                self._logger.warning(f"Skipping {source}, its destination {destination} already exists")
+                report.skipped.append(source)
+            else:
+                destinations.add(destination)
+                kept_moves.append((source, destination))
+
+        return kept_moves
+
+    def _apply(self, operation: str, moves: list[tuple[str, str | None]], report: MaintenanceReport) -> None:
+        to_delete = [source for source, _ in moves]
+        if operation != "delete":
+            failed_copies = self._object_store_repository.copy_objects(moves=moves)
+            report.copied += len(moves) - len(failed_copies)
+            report.failed += failed_copies
+            # a source is only deleted once its copy exists
+            to_delete = [source for source in to_delete if source not in set(failed_copies)]
+
+        if operation != "copy" and to_delete:
+            failed_deletes = self._object_store_repository.delete_objects(keys=to_delete)
+            report.deleted += len(to_delete) - len(failed_deletes)
+            report.failed += failed_deletes
+            report.failed_deletes += failed_deletes
+
+    def _delete_pending(
+        self, checkpoint: MaintenanceCheckpoint, report: MaintenanceReport, run: str, dry_run: bool
+    ) -> MaintenanceCheckpoint:
+        # planned again, a copied source would be skipped since its own destination exists
+        moves = [(key, None) for key in checkpoint.pending_deletes]
+        report.matched += len(moves)
+        if dry_run:
+            self._log_plan("delete", moves, already_logged=0)
+            report.deleted += len(moves)
+            return checkpoint
+
+        self._apply("delete", moves, report)
+        return self._save_checkpoint(run, checkpoint.last_key, report)
+
+    def _save_checkpoint(self, run: str, last_key: str, report: MaintenanceReport) -> MaintenanceCheckpoint:
+        failed_deletes = set(report.failed_deletes)
+        checkpoint = MaintenanceCheckpoint(
+            last_key=last_key,
+            pending_keys=[key for key in report.failed if key not in failed_deletes] + report.skipped,
+            pending_deletes=report.failed_deletes,
+        )
+        self._object_store_repository.put_checkpoint(name=run, checkpoint=checkpoint)
+        return checkpoint
+
+    def _log_plan(self, operation: str, moves: list[tuple[str, str | None]], already_logged: int) -> None:
+        for source, destination in moves[: max(self.DRY_RUN_SAMPLE_SIZE - already_logged, 0)]:
+            self._logger.info(f"[dry run] {operation} {source}" + (f" -> {destination}" if destination else ""))
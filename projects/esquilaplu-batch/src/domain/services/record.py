@@ -1,11 +1,15 @@
+import contextlib
 import datetime as dt
 import logging
+from typing import Callable, ContextManager
 
 from tqdm import tqdm
 
+from ..entities import Record
 from ..exceptions import WeatherCollectionError
 from ..ports.inner import LapService, RecordService
 from ..ports.outer import AppRepository, WeatherDataRepository
+from ..value_objects import Laps
 
 
 class RecordServiceImpl(RecordService):
@@ -13,37 +17,122 @@ class RecordServiceImpl(RecordService):
         self,
         weather_repository: WeatherDataRepository,
         app_repository: AppRepository,
+        station_id: int,
         now: dt.datetime,
         laps_service: LapService,
         max_collect_history_hr: int,
         min_collect_history_hr: int,
         max_collect_iterations: int = -1,
+        collect_budget: dt.timedelta | None = None,
+        recent_window: dt.timedelta = dt.timedelta(days=1),
+        clock: Callable[[], dt.datetime] = dt.datetime.now,
+        laps_scope: Callable[[Laps], ContextManager] = contextlib.nullcontext,
     ) -> None:
         self._logger = logging.getLogger(__name__)
         self._record_repository = weather_repository
         self._app_repository = app_repository
+        self._station_id = station_id
         self._laps_service = laps_service
         self._now = now
         self._max_collect_history_hr = max_collect_history_hr
         self._min_collect_history_hr = min_collect_history_hr
         self._max_collect_iterations = max_collect_iterations
+        # wall clock time given to a run, its laps are then collected by priority until the deadline
+        self._collect_budget = collect_budget
+        self._recent_window = recent_window
+        self._clock = clock
+        # entered around the collect of each laps, for instance to profile it
+        self._laps_scope = laps_scope
+        # measured by the last persist, the time kept before the deadline to persist the collected laps
+        self._persist_duration_per_laps: dt.timedelta | None = None
 
-    def update_records(self) -> None:
-        start_time = self._now - dt.timedelta(hours=self._max_collect_history_hr)
-        end_time = self._now - dt.timedelta(hours=self._min_collect_history_hr)
+    def update_records(self, now: dt.datetime | None = None) -> tuple[list[Laps], list[Laps]]:
+        """Collect the missing laps of the window, and get the failed and the deferred laps."""
+        # the budget also covers the planning, which may rebuild the collect state from the storage
+        started_at = self._clock()
+        now = now or self._now
+        start_time = now - dt.timedelta(hours=self._max_collect_history_hr)
+        end_time = now - dt.timedelta(hours=self._min_collect_history_hr)
 
         missing_laps = self._laps_service.get_missing_laps(start_time=start_time, end_time=end_time)
+        deadline = None
+        if self._collect_budget is not None:
+            missing_laps = self._prioritize(missing_laps, recent_since=end_time - self._recent_window)
+            deadline = started_at + self._collect_budget
+        if self._max_collect_iterations > 0:
+            missing_laps = missing_laps[: self._max_collect_iterations]
 
+        failed_laps, deferred_laps = self._collect(laps=missing_laps, deadline=deadline)
+        if deferred_laps:
+            self._logger.warning(
+                f"Collect budget spent, {len(deferred_laps)} laps deferred to the next run, "
+                f"from {min(deferred_laps).start_time} to {max(deferred_laps).start_time}"
+            )
+
+        return failed_laps, deferred_laps
+
+    def collect_laps(self, laps: list[Laps]) -> list[Laps]:
+        failed_laps, _ = self._collect(laps=laps)
+        return failed_laps
+
+    def _collect(self, laps: list[Laps], deadline: dt.datetime | None = None) -> tuple[list[Laps], list[Laps]]:
+        """Collect laps in order until the deadline, and get the failed and the deferred laps."""
         records = []
-        for idx, laps in tqdm(enumerate(missing_laps)):
+        failures = {}
+        failed_laps = []
+        deferred_laps = []
+        longest_collect = dt.timedelta(0)
+        for position, laps_ in enumerate(tqdm(laps)):
+            # the next laps is only started when it should end, as slow as the slowest one so far, early enough to
+            # persist it along with the laps collected before it
+            if deadline is not None and not self._fits(deadline, longest_collect, laps_count=len(records) + 1):
+                # persisting the collected laps first frees the time kept for them
+                self._persist(records=records, failures=failures)
+                records, failures = [], {}
+                if not self._fits(deadline, longest_collect, laps_count=1):
+                    deferred_laps = laps[position:]
+                    break
+
+            started_at = self._clock()
             try:
-                record = self._record_repository.collect_record(laps=laps)
+                with self._laps_scope(laps_):
+                    record = self._record_repository.collect_record(laps=laps_)
                 records.append(record)
-            except WeatherCollectionError:
-                self._logger.error(f"Error while collecting weather data for {laps}. Skipping.")
-                continue
+            except WeatherCollectionError as e:
+                self._logger.error(f"Error while collecting weather data for {laps_}. Skipping.")
+                failures[laps_] = type(e).__name__
+                failed_laps.append(laps_)
+            longest_collect = max(longest_collect, self._clock() - started_at)
+
+            if deadline is not None and self._persist_duration_per_laps is None and records:
+                # the first collected laps is persisted alone, to measure the time to keep for the next ones
+                self._persist(records=records, failures=failures)
+                records, failures = [], {}
+
+        self._persist(records=records, failures=failures)
+
+        return failed_laps, deferred_laps
+
+    def _persist(self, records: list[Record], failures: dict[Laps, str]) -> None:
+        if not records and not failures:
+            return
+
+        started_at = self._clock()
+        self._app_repository.save_many_records(records=records, station_id=self._station_id)
+        self._app_repository.update_rollups(laps=[record.laps for record in records])
+        self._laps_service.mark_collected(laps=[record.laps for record in records])
+        self._laps_service.mark_failed(failures=failures)
+        if records:
+            self._persist_duration_per_laps = (self._clock() - started_at) / len(records)
 
-            if self._max_collect_iterations > 0 and idx + 1 >= self._max_collect_iterations:
-                break
+    def _fits(self, deadline: dt.datetime, longest_collect: dt.timedelta, laps_count: int) -> bool:
+        """Whether one more laps can be collected, then persisted with the others, before the deadline."""
+        persist_reserve = (self._persist_duration_per_laps or dt.timedelta(0)) * laps_count
+        return self._clock() + longest_collect + persist_reserve <= deadline
 
-        self._app_repository.save_many_records(records=records)
+    @staticmethod
+    def _prioritize(laps: list[Laps], recent_since: dt.datetime) -> list[Laps]:
+        """Most recent laps first, then the older gaps from the oldest one, which is the next to leave the window."""
+        recent_laps = sorted((laps_ for laps_ in laps if laps_.start_time >= recent_since), reverse=True)
+        older_laps = sorted(laps_ for laps_ in laps if laps_.start_time < recent_since)
+        return recent_laps + older_laps
@@ -0,0 +1,29 @@
+import datetime as dt
+import logging
+
+from tqdm import tqdm
+
+from ..ports.inner import ReplicaService
+from ..ports.outer import AppRepository
+
+
+class ReplicaServiceImpl(ReplicaService):
+    def __init__(self, source_repository: AppRepository, replica_repository: AppRepository) -> None:
+        self._logger = logging.getLogger(__name__)
+        self._source_repository = source_repository
+        self._replica_repository = replica_repository
+
+    def sync(self, since: dt.datetime) -> None:
+        replicated_laps = set(self._replica_repository.get_available_laps_since(since=since))
+        missing_laps = sorted(
+            laps
+            for laps in self._source_repository.get_available_laps_since(since=since)
+            if laps not in replicated_laps
+        )
+
+        for laps in tqdm(missing_laps):
+            dataset = self._source_repository.load_raw_dataset(laps=laps)
+            self._replica_repository.save_raw_dataset(dataset=dataset, laps=laps)
+
+        self._replica_repository.update_rollups(laps=missing_laps)
+        self._logger.info(f"{len(missing_laps)} raw datasets replicated")
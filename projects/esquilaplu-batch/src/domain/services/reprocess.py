@@ -0,0 +1,117 @@
+import datetime as dt
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator
+
+from tqdm import tqdm
+
+from ..entities import Lease
+from ..exceptions import WeatherRecordError
+from ..ports.inner import LeaseService, ReprocessService
+from ..ports.outer import AppRepository, WeatherDataRepository
+from ..value_objects import Laps
+
+Month = tuple[int, int]
+
+
+class ReprocessServiceImpl(ReprocessService):
+    def __init__(
+        self,
+        app_repository: AppRepository,
+        weather_repository: WeatherDataRepository,
+        station_id: int,
+        lease_service: LeaseService | None = None,
+        max_laps_per_second: float = 0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._logger = logging.getLogger(__name__)
+        self._app_repository = app_repository
+        self._weather_repository = weather_repository
+        self._station_id = station_id
+        # when set, done months are skipped so that an interrupted run resumes, and other workers can share the run
+        self._lease_service = lease_service
+        # raw datasets loaded per second, unthrottled when 0
+        self._max_laps_per_second = max_laps_per_second
+        self._clock = clock
+        self._sleep = sleep
+        self._next_load_at = 0.0
+
+    def reprocess(self, start_time: dt.datetime, end_time: dt.datetime) -> None:
+        available_laps = self._app_repository.get_available_laps_since(since=start_time)
+        available_laps = sorted(laps for laps in available_laps if laps.start_time <= end_time)
+        months = [
+            (month, list(month_laps))
+            for month, month_laps in itertools.groupby(
+                available_laps, key=lambda laps: (laps.start_time.year, laps.start_time.month)
+            )
+        ]
+
+        skipped_months: list[Month] = []
+        claimed_months = self._claim_months(months, skipped_months)
+
+        # the next month is downloaded and parsed while the records of the current one are extracted and saved
+        with ThreadPoolExecutor(max_workers=1) as loader:
+            claimed = next(claimed_months, None)
+            loading = loader.submit(self._load, claimed[1]) if claimed is not None else None
+            with tqdm(total=len(months)) as progress:
+                while claimed is not None:
+                    current, current_loading = claimed, loading
+                    claimed = next(claimed_months, None)
+                    loading = loader.submit(self._load, claimed[1]) if claimed is not None else None
+
+                    self._save(*current, datasets=current_loading.result())
+                    progress.update()
+
+        if skipped_months:
+            self._logger.warning(f"{len(skipped_months)} months are claimed by other workers: {skipped_months}")
+
+    def _claim_months(
+        self, months: list[tuple[Month, list[Laps]]], skipped_months: list[Month]
+    ) -> Iterator[tuple[Month, list[Laps], Lease | None]]:
+        for month, month_laps in months:
+            lease = None
+            if self._lease_service is not None:
+                lease = self._lease_service.acquire(name=f"{month[0]:04d}-{month[1]:02d}")
+                if lease is None:
+                    self._logger.info(f"{month} is done or handled by another worker, skipping")
+                    skipped_months.append(month)
+                    continue
+
+            yield month, month_laps, lease
+
+    def _load(self, laps: list[Laps]) -> list[Any]:
+        self._throttle(nb_laps=len(laps))
+        return self._app_repository.load_raw_datasets(laps=laps)
+
+    def _throttle(self, nb_laps: int) -> None:
+        if self._max_laps_per_second <= 0:
+            return
+
+        # each load books its share of the rate, the next one waits until that share has elapsed
+        now = self._clock()
+        if self._next_load_at > now:
+            self._sleep(self._next_load_at - now)
+        self._next_load_at = max(now, self._next_load_at) + nb_laps / self._max_laps_per_second
+
+    def _save(self, month: Month, laps: list[Laps], lease: Lease | None, datasets: list[Any]) -> None:
+        records = []
+        for laps_, dataset in zip(laps, datasets):
+            try:
+                records.append(self._weather_repository.extract_record(dataset=dataset, laps=laps_))
+            except WeatherRecordError as e:
+                self._logger.warning(f"No record for {laps_}: {e}. Skipping.")
+
+        if lease is not None:
+            lease = self._lease_service.renew(lease=lease)
+            if lease is None:
+                self._logger.warning(f"{month} was taken over by another worker, skipping")
+                return
+
+        self._app_repository.save_many_records(records=records, station_id=self._station_id)
+        self._logger.info(f"{len(records)} records rebuilt from {len(datasets)} raw datasets for {month}")
+
+        if lease is not None:
+            self._lease_service.complete(lease=lease)
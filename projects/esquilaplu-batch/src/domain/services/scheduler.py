@@ -0,0 +1,89 @@
+import datetime as dt
+import logging
+import time
+from typing import Callable
+
+from ..ports.inner import RecordService, SchedulerService
+from ..value_objects import Laps
+
+
+class SchedulerServiceImpl(SchedulerService):
+    MF_LAPS_DURATION = 3
+
+    def __init__(
+        self,
+        record_service: RecordService,
+        publication_delay: dt.timedelta = dt.timedelta(hours=2),
+        retry_delays: list[dt.timedelta] | None = None,
+        full_scan_interval: dt.timedelta = dt.timedelta(days=1),
+        clock: Callable[[], dt.datetime] = dt.datetime.now,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._logger = logging.getLogger(__name__)
+        self._record_service = record_service
+        self._publication_delay = publication_delay
+        self._retry_delays = (
+            retry_delays
+            if retry_delays is not None
+            else [dt.timedelta(minutes=10), dt.timedelta(minutes=20), dt.timedelta(minutes=40)]
+        )
+        self._full_scan_interval = full_scan_interval
+        self._clock = clock
+        self._sleep = sleep
+
+    def run(self, max_cycles: int = -1) -> None:
+        next_full_scan_at = self._clock()
+        handled_laps: Laps | None = None
+        pending_laps: Laps | None = None
+        attempts = 0
+        next_attempt_at = next_full_scan_at
+
+        cycles = 0
+        while max_cycles < 0 or cycles < max_cycles:
+            now = self._clock()
+            due_laps = self._get_due_laps(now)
+
+            if now >= next_full_scan_at:
+                # the full scan plans the due laps with the older ones, it is only retried here when it failed
+                self._logger.info("Scanning the whole history for missing laps")
+                failed_laps, _ = self._record_service.update_records(now=now)
+                next_full_scan_at = now + self._full_scan_interval
+                handled_laps, pending_laps = due_laps, None
+                if due_laps in failed_laps and self._retry_delays:
+                    # the full scan was its first attempt, the next ones follow the retry schedule
+                    pending_laps = due_laps
+                    attempts, next_attempt_at = 1, now + self._retry_delays[0]
+            elif handled_laps is None or due_laps != handled_laps:
+                handled_laps, pending_laps = due_laps, due_laps
+                attempts, next_attempt_at = 0, now
+
+            if pending_laps is not None and now >= next_attempt_at:
+                failed_laps = self._record_service.collect_laps(laps=[pending_laps])
+                if not failed_laps:
+                    pending_laps = None
+                elif attempts < len(self._retry_delays):
+                    next_attempt_at = now + self._retry_delays[attempts]
+                    attempts += 1
+                else:
+                    self._logger.warning(f"{pending_laps} still unavailable, left to the next full scan")
+                    pending_laps = None
+
+            wake_up_at = min(self._get_next_publication_time(due_laps), next_full_scan_at)
+            if pending_laps is not None:
+                wake_up_at = min(wake_up_at, next_attempt_at)
+            self._sleep(max((wake_up_at - self._clock()).total_seconds(), 0))
+            cycles += 1
+
+    def _get_due_laps(self, now: dt.datetime) -> Laps:
+        """Latest laps whose SYNOP file should already be published."""
+        latest_end_time = now - self._publication_delay
+        end_hour = latest_end_time.hour - latest_end_time.hour % self.MF_LAPS_DURATION
+        end_time = latest_end_time.replace(hour=end_hour, minute=0, second=0, microsecond=0)
+
+        return Laps(
+            start_time=end_time - dt.timedelta(hours=self.MF_LAPS_DURATION), duration_hours=self.MF_LAPS_DURATION
+        )
+
+    def _get_next_publication_time(self, due_laps: Laps) -> dt.datetime:
+        next_end_time = due_laps.start_time + dt.timedelta(hours=2 * due_laps.duration_hours)
+        return next_end_time + self._publication_delay
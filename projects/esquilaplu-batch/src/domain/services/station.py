@@ -0,0 +1,131 @@
+import datetime as dt
+import itertools
+import logging
+import time
+from typing import Callable
+
+from tqdm import tqdm
+
+from ..ports.inner import LeaseService, StationService
+from ..ports.outer import AppRepository
+from ..value_objects import Laps
+
+Month = tuple[int, int]
+
+
+class StationServiceImpl(StationService):
+    # rollups, rainfall indexes and climatologies are shared by every month, a single worker updates them
+    ROLLUPS_LEASE = "rollups"
+
+    def __init__(
+        self,
+        app_repository: AppRepository,
+        lease_service: LeaseService | None = None,
+        poll_interval: dt.timedelta = dt.timedelta(minutes=1),
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._logger = logging.getLogger(__name__)
+        self._app_repository = app_repository
+        # when set, the months are shared with the other workers of the same backfill
+        self._lease_service = lease_service
+        self._poll_interval = poll_interval
+        self._sleep = sleep
+
+    def backfill_stations(self, start_time: dt.datetime, end_time: dt.datetime) -> None:
+        available_laps = self._app_repository.get_available_laps_since(since=start_time)
+        available_laps = sorted(laps for laps in available_laps if laps.start_time <= end_time)
+        if not available_laps:
+            return
+
+        # one merge per month keeps the number of partition rewrites low, each month only writes its own partitions:
+        # observations are dated at the end of their laps, the last laps of a month belongs to the next one
+        months = [
+            (month, list(month_laps))
+            for month, month_laps in itertools.groupby(available_laps, key=self._get_partition_month)
+        ]
+        for month, month_laps in tqdm(months):
+            self._merge_month(month, month_laps)
+
+        # a worker may crash while holding the lease of a month, the month is taken over once its lease expires
+        pending_months = self._get_pending_months(months)
+        while pending_months:
+            self._logger.info(f"Waiting for {len(pending_months)} months handled by other workers")
+            self._sleep(self._poll_interval.total_seconds())
+            for month, month_laps in pending_months:
+                self._merge_month(month, month_laps)
+            pending_months = self._get_pending_months(months)
+
+        self._update_rollups(available_laps)
+
+    def _merge_month(self, month: Month, month_laps: list[Laps]) -> None:
+        lease = None
+        if self._lease_service is not None:
+            lease = self._lease_service.acquire(name=self._lease_name(month))
+            if lease is None:
+                self._logger.info(f"{month} is handled by another worker, skipping")
+                return
+
+        datasets = self._app_repository.load_raw_datasets(laps=month_laps)
+
+        # renewed between steps, so that a slow month cannot expire while it is written
+        if lease is not None:
+            lease = self._lease_service.renew(lease=lease)
+            if lease is None:
+                self._logger.warning(f"{month} was taken over by another worker, skipping")
+                return
+
+        self._app_repository.save_station_datasets(datasets=datasets)
+        self._logger.info(f"{len(datasets)} raw datasets merged into station partitions for {month}")
+
+        if lease is not None:
+            lease = self._lease_service.renew(lease=lease)
+            if lease is None:
+                self._logger.warning(f"{month} was taken over by another worker before completion")
+                return
+            self._lease_service.complete(lease=lease)
+
+    def _update_rollups(self, laps: list[Laps]) -> None:
+        lease = None
+        if self._lease_service is not None:
+            lease = self._lease_service.acquire(name=self.ROLLUPS_LEASE)
+            # as for the months, the rollups are taken over when the worker updating them stops
+            while lease is None and not self._lease_service.is_done(name=self.ROLLUPS_LEASE):
+                self._logger.info("Waiting for the rollups updated by another worker")
+                self._sleep(self._poll_interval.total_seconds())
+                lease = self._lease_service.acquire(name=self.ROLLUPS_LEASE)
+            if lease is None:
+                self._logger.info("Rollups are done by another worker, skipping")
+                return
+
+        # rollups cover the days the laps start on, one update per month bounds the observations held in memory
+        for month, month_laps in tqdm(
+            itertools.groupby(laps, key=lambda laps_: (laps_.start_time.year, laps_.start_time.month))
+        ):
+            self._app_repository.update_rollups(laps=list(month_laps))
+
+            if lease is not None:
+                lease = self._lease_service.renew(lease=lease)
+                if lease is None:
+                    self._logger.warning(f"Rollups were taken over by another worker after {month}, stopping")
+                    return
+
+        if lease is not None:
+            self._lease_service.complete(lease=lease)
+
+    def _get_pending_months(self, months: list[tuple[Month, list[Laps]]]) -> list[tuple[Month, list[Laps]]]:
+        if self._lease_service is None:
+            return []
+        return [
+            (month, month_laps)
+            for month, month_laps in months
+            if not self._lease_service.is_done(name=self._lease_name(month))
+        ]
+
+    @staticmethod
+    def _get_partition_month(laps: Laps) -> Month:
+        observation_time = laps.start_time + dt.timedelta(hours=laps.duration_hours)
+        return observation_time.year, observation_time.month
+
+    @staticmethod
+    def _lease_name(month: Month) -> str:
+        return f"{month[0]:04d}-{month[1]:02d}"
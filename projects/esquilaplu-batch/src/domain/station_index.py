@@ -0,0 +1,97 @@
+import heapq
+import math
+import unicodedata
+from typing import NamedTuple
+
+from .value_objects import Station
+
+
+class _Node(NamedTuple):
+    point: tuple[float, float, float]
+    station: Station
+    axis: int
+    left: "_Node | None"
+    right: "_Node | None"
+
+
+class StationIndex:
+    """KD-tree of the stations positions, to resolve any location to its nearest stations.
+
+    Positions are indexed as unit vectors, whose euclidean distance grows with the great circle distance, so the tree
+    needs no special case around the poles or the antimeridian.
+    """
+
+    EARTH_RADIUS_KM = 6371.0
+
+    def __init__(self, stations: list[Station]) -> None:
+        self._stations = list(stations)
+        self._root = self._build([(self._to_unit_vector(s.latitude, s.longitude), s) for s in self._stations], 0)
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1) -> list[Station]:
+        """Get the k nearest stations of a location, nearest first."""
+        target = self._to_unit_vector(latitude, longitude)
+        heap: list[tuple[float, int, Station]] = []
+        self._search(self._root, target, k, heap)
+
+        return [station for _, _, station in sorted(heap, key=lambda item: -item[0])]
+
+    def search(self, name: str) -> list[Station]:
+        """Get the stations whose name contains a place name, accents and case ignored."""
+        normalized_name = self._normalize(name)
+        return [station for station in self._stations if normalized_name in self._normalize(station.name)]
+
+    def get_distance_km(self, station: Station, latitude: float, longitude: float) -> float:
+        chord = math.dist(
+            self._to_unit_vector(station.latitude, station.longitude), self._to_unit_vector(latitude, longitude)
+        )
+        return 2 * self.EARTH_RADIUS_KM * math.asin(min(chord / 2, 1.0))
+
+    def _build(self, items: list[tuple[tuple[float, float, float], Station]], depth: int) -> _Node | None:
+        if not items:
+            return None
+
+        axis = depth % 3
+        items = sorted(items, key=lambda item: item[0][axis])
+        median = len(items) // 2
+        after_median = median + 1
+
+        return _Node(
+            point=items[median][0],
+            station=items[median][1],
+            axis=axis,
+            left=self._build(items[:median], depth + 1),
+            right=self._build(items[after_median:], depth + 1),
+        )
+
+    def _search(
+        self, node: _Node | None, target: tuple[float, float, float], k: int, heap: list[tuple[float, int, Station]]
+    ) -> None:
+        if node is None:
+            return
+
+        # the heap keeps the k nearest stations found so far, the farthest one on top
+        distance = math.dist(node.point, target) ** 2
+        if len(heap) < k:
+            heapq.heappush(heap, (-distance, node.station.id, node.station))
+        elif distance < -heap[0][0]:
+            heapq.heapreplace(heap, (-distance, node.station.id, node.station))
+
+        offset = target[node.axis] - node.point[node.axis]
+        near, far = (node.left, node.right) if offset < 0 else (node.right, node.left)
+        self._search(near, target, k, heap)
+        if len(heap) < k or offset**2 < -heap[0][0]:
+            self._search(far, target, k, heap)
+
+    @staticmethod
+    def _to_unit_vector(latitude: float, longitude: float) -> tuple[float, float, float]:
+        latitude, longitude = math.radians(latitude), math.radians(longitude)
+        return (
+            math.cos(latitude) * math.cos(longitude),
+            math.cos(latitude) * math.sin(longitude),
+            math.sin(latitude),
+        )
+
+    @staticmethod
+    def _normalize(name: str) -> str:
+        name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+        return name.upper().replace("-", " ").strip()
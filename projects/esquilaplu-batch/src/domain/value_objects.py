@@ -14,3 +14,23 @@ class Laps:
         if isinstance(other, dt.datetime):
             return self.start_time == other
         return self.start_time == other.start_time
+
+
+@dataclass(frozen=True)
+class WindowRainfall:
+    rainfall_mm: float
+    nb_laps: int
+    nb_valid_laps: int
+
+    @property
+    def coverage(self) -> float:
+        """Share of the window laps with a rainfall observation."""
+        return self.nb_valid_laps / self.nb_laps if self.nb_laps else 0.0
+
+
+@dataclass(frozen=True)
+class Station:
+    id: int
+    name: str
+    latitude: float
+    longitude: float
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+
+class ClimatologyFactory:
+    """Rainfall normals of a station, computed from its daily rollup over every year of history.
+
+    One row per day of the year (scope `day`, key 1 to 366 on a leap year calendar), pooling the days within
+    `WINDOW_DAYS` of it so that a few years are enough, and one row per month (scope `month`, key 1 to 12) of the
+    monthly totals.
+    """
+
+    COLUMNS = ["scope", "key", "nb_samples", "mean_mm", "p10_mm", "p50_mm", "p90_mm", "rainy_frequency"]
+    # usual threshold of a rainy day
+    RAINY_DAY_MM = 1.0
+    WINDOW_DAYS = 7
+    # days missing more laps, and months missing more days, would bias the normals towards dry
+    MIN_DAY_LAPS = 6
+    MIN_MONTH_COVERAGE = 0.75
+    LAPS_PER_DAY = 8
+
+    @classmethod
+    def compute(cls, daily_rollup: pd.DataFrame) -> pd.DataFrame:
+        """Compute the normals from the daily rollup rows of a single station."""
+        days = daily_rollup.loc[daily_rollup["nb_laps"] >= cls.MIN_DAY_LAPS]
+        if days.empty:
+            return pd.DataFrame({column: [] for column in cls.COLUMNS}).astype(
+                {"key": "int64", "nb_samples": "int64", "rainy_frequency": "float64"}
+            )
+
+        # each day also counts for the days of the year around it, the 29th of February included
+        offsets = np.arange(-cls.WINDOW_DAYS, cls.WINDOW_DAYS + 1)
+        day_of_year = cls._get_leap_day_of_year(days["period"]).to_numpy()
+        pooled = pd.DataFrame(
+            {
+                "key": ((day_of_year[:, None] - 1 + offsets) % 366 + 1).ravel(),
+                "rainfall_mm": np.repeat(days["rainfall_mm"].to_numpy(), len(offsets)),
+            }
+        )
+        day_normals = cls._summarize(pooled, rainy=pooled["rainfall_mm"] >= cls.RAINY_DAY_MM)
+
+        periods = daily_rollup["period"]
+        months = daily_rollup.groupby([periods.dt.year.rename("year"), periods.dt.month.rename("key")]).agg(
+            rainfall_mm=("rainfall_mm", "sum"), nb_laps=("nb_laps", "sum")
+        )
+        days_in_month = pd.to_datetime(
+            {"year": months.index.get_level_values("year"), "month": months.index.get_level_values("key"), "day": 1}
+        ).dt.days_in_month.to_numpy()
+        months = months.loc[months["nb_laps"].to_numpy() >= cls.MIN_MONTH_COVERAGE * cls.LAPS_PER_DAY * days_in_month]
+        month_normals = cls._summarize(months.reset_index()[["key", "rainfall_mm"]])
+        # the frequency of rainy days in a month comes from the days themselves
+        rainy_days = (days["rainfall_mm"] >= cls.RAINY_DAY_MM).groupby(days["period"].dt.month).mean()
+        month_normals["rainy_frequency"] = month_normals["key"].map(rainy_days)
+
+        normals = pd.concat([day_normals.assign(scope="day"), month_normals.assign(scope="month")], ignore_index=True)
+        return normals[cls.COLUMNS]
+
+    @staticmethod
+    def _summarize(samples: pd.DataFrame, rainy: pd.Series | None = None) -> pd.DataFrame:
+        grouped = samples.groupby("key")["rainfall_mm"]
+        quantiles = grouped.quantile([0.1, 0.5, 0.9]).unstack().reindex(columns=[0.1, 0.5, 0.9])
+        summary = pd.DataFrame(
+            {
+                "nb_samples": grouped.count(),
+                "mean_mm": grouped.mean(),
+                "p10_mm": quantiles[0.1],
+                "p50_mm": quantiles[0.5],
+                "p90_mm": quantiles[0.9],
+                "rainy_frequency": rainy.groupby(samples["key"]).mean() if rainy is not None else np.nan,
+            }
+        )
+        return summary.rename_axis("key").reset_index()
+
+    @staticmethod
+    def _get_leap_day_of_year(periods: pd.Series) -> pd.Series:
+        """Day of the year on a leap year calendar, so that a date keeps the same key every year."""
+        return periods.dt.dayofyear + ((~periods.dt.is_leap_year) & (periods.dt.month > 2))
@@ -0,0 +1,29 @@
+import datetime as dt
+import io
+
+import numpy as np
+import pandas as pd
+
+
+class MeteoFranceDatasetFactory:
+    @staticmethod
+    def to_columnar(dataset: pd.DataFrame) -> pd.DataFrame:
+        """Give raw SYNOP columns a stable numeric schema so datasets can be appended to each other."""
+        dataset = dataset.loc[:, ~dataset.columns.str.startswith("Unnamed")].copy()
+        for column in dataset.columns:
+            if column == "date":
+                continue
+            dataset[column] = pd.to_numeric(dataset[column], errors="coerce").astype("float64")
+        dataset = dataset.dropna(subset=["numer_sta"])
+        dataset["numer_sta"] = dataset["numer_sta"].astype("int64")
+
+        return dataset
+
+    @staticmethod
+    def parse_raw_csv(content: bytes, observation_time: dt.datetime) -> dict[str, np.ndarray]:
+        """Parse a raw SYNOP csv into columnar arrays, which are cheap to send back from a worker process."""
+        dataset = pd.read_csv(io.BytesIO(content), sep=";", header=0)
+        dataset["date"] = observation_time
+        dataset = MeteoFranceDatasetFactory.to_columnar(dataset.astype({"date": "datetime64[ns]"}))
+
+        return {column: dataset[column].to_numpy() for column in dataset.columns}
@@ -11,24 +11,14 @@ class MeteoFranceRecordFactory:
     MERIGNAC_STATION_ID = 7510
 
     @staticmethod
-    def from_dataframe(dataframe: pd.DataFrame, laps_duration_hr: int = 3) -> Record:
-        match (laps_duration_hr):
-            case 1:
-                rainfall_col = "rr1"
-            case 3:
-                rainfall_col = "rr3"
-            case 6:
-                rainfall_col = "rr6"
-            case 12:
-                rainfall_col = "rr12"
-            case 24:
-                rainfall_col = "rr24"
-            case _:
-                raise ValueError(f"Invalid laps duration: {laps_duration_hr}")
+    def from_dataframe(
+        dataframe: pd.DataFrame, laps_duration_hr: int = 3, station_id: int = MERIGNAC_STATION_ID
+    ) -> Record:
+        rainfall_col = MeteoFranceRecordFactory._get_rainfall_column(laps_duration_hr)
 
-        station_row = dataframe.loc[dataframe["numer_sta"] == MeteoFranceRecordFactory.MERIGNAC_STATION_ID, :].head(1)
+        station_row = dataframe.loc[dataframe["numer_sta"] == station_id, :].head(1)
         if station_row.empty:
-            raise WeatherRecordError("No data for Merignac station")
+            raise WeatherRecordError(f"No data for station {station_id}")
 
         # convert numpy datetime64 to datetime
         date = station_row["date"].values[0]
@@ -41,3 +31,32 @@ class MeteoFranceRecordFactory:
             laps=Laps(start_time=start_date, duration_hours=laps_duration_hr),
             rainfall_mm=station_row[rainfall_col].values[0],
         )
+
+    @staticmethod
+    def from_station_dataframe(dataframe: pd.DataFrame, laps_duration_hr: int = 3) -> list[Record]:
+        """Build one record per observation of a single station dataset, observations being dated at the laps end."""
+        rainfall_col = MeteoFranceRecordFactory._get_rainfall_column(laps_duration_hr)
+
+        return [
+            Record(
+                laps=Laps(start_time=date - dt.timedelta(hours=laps_duration_hr), duration_hours=laps_duration_hr),
+                rainfall_mm=float(rainfall_mm),
+            )
+            for date, rainfall_mm in zip(dataframe["date"].dt.to_pydatetime(), dataframe[rainfall_col])
+        ]
+
+    @staticmethod
+    def _get_rainfall_column(laps_duration_hr: int) -> str:
+        match (laps_duration_hr):
+            case 1:
+                return "rr1"
+            case 3:
+                return "rr3"
+            case 6:
+                return "rr6"
+            case 12:
+                return "rr12"
+            case 24:
+                return "rr24"
+            case _:
+                raise ValueError(f"Invalid laps duration: {laps_duration_hr}")
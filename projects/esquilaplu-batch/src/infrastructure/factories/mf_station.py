@@ -0,0 +1,26 @@
+import pandas as pd
+
+from src.domain.value_objects import Station
+
+
+class MeteoFranceStationFactory:
+    @staticmethod
+    def from_dataframe(dataframe: pd.DataFrame) -> list[Station]:
+        """Build the stations of the SYNOP stations list (ID, Nom, Latitude, Longitude columns)."""
+        return [
+            Station(
+                id=int(row["ID"]), name=row["Nom"], latitude=float(row["Latitude"]), longitude=float(row["Longitude"])
+            )
+            for row in dataframe.to_dict(orient="records")
+        ]
+
+    @staticmethod
+    def to_dataframe(stations: list[Station]) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "ID": [station.id for station in stations],
+                "Nom": [station.name for station in stations],
+                "Latitude": [station.latitude for station in stations],
+                "Longitude": [station.longitude for station in stations],
+            }
+        )
@@ -0,0 +1,75 @@
+import datetime as dt
+import math
+
+import pandas as pd
+
+from src.domain.value_objects import WindowRainfall
+
+
+class RainfallIndexFactory:
+    """Dense series of a station rainfall, one row per laps, with running sums of the rainfall and of the observed laps.
+
+    The total of any window is then the difference between the running sums of its last row and of the row before its
+    first one.
+    """
+
+    @staticmethod
+    def merge(index: pd.DataFrame | None, observations: pd.DataFrame, laps_duration_hr: int = 3) -> pd.DataFrame:
+        """Merge the observations of a station, dated at the end of their laps, into its index."""
+        laps_duration = pd.Timedelta(hours=laps_duration_hr)
+        rows = pd.DataFrame(
+            {
+                "slot": observations["date"] - laps_duration,
+                "rainfall_mm": observations["rr3"].clip(lower=0),
+                "valid": observations["rr3"].notna(),
+            }
+        )
+        if index is not None:
+            rows = pd.concat([index[["slot", "rainfall_mm", "valid"]], rows], ignore_index=True)
+        rows = rows.drop_duplicates(subset="slot", keep="last").set_index("slot")
+
+        rows = rows.reindex(pd.date_range(rows.index.min(), rows.index.max(), freq=laps_duration, name="slot"))
+        valid = rows["valid"].fillna(False).astype(bool)
+        rainfall_mm = rows["rainfall_mm"].where(valid, 0.0).astype("float32")
+
+        return pd.DataFrame(
+            {
+                "rainfall_mm": rainfall_mm,
+                "valid": valid,
+                "cumulative_mm": rainfall_mm.astype("float64").cumsum(),
+                "valid_count": valid.cumsum().astype("int32"),
+            }
+        ).reset_index()
+
+    @staticmethod
+    def get_window_rainfall(
+        index: pd.DataFrame | None, start_time: dt.datetime, end_time: dt.datetime, laps_duration_hr: int = 3
+    ) -> WindowRainfall:
+        """Get the rainfall of the laps starting between two datetimes, bounds included, in constant time."""
+        origin = index["slot"].iloc[0] if index is not None and not index.empty else pd.Timestamp(start_time.date())
+        first, last = RainfallIndexFactory.get_slot_range(origin, start_time, end_time, laps_duration_hr)
+        nb_laps = max(last - first + 1, 0)
+
+        size = 0 if index is None else len(index)
+        first, last = max(first, 0), min(last, size - 1)
+        if first > last:
+            return WindowRainfall(rainfall_mm=0.0, nb_laps=nb_laps, nb_valid_laps=0)
+
+        cumulative_mm = index["cumulative_mm"].to_numpy()
+        valid_count = index["valid_count"].to_numpy()
+        previous_mm = cumulative_mm[first - 1] if first > 0 else 0.0
+        previous_count = valid_count[first - 1] if first > 0 else 0
+
+        return WindowRainfall(
+            rainfall_mm=float(cumulative_mm[last] - previous_mm),
+            nb_laps=nb_laps,
+            nb_valid_laps=int(valid_count[last] - previous_count),
+        )
+
+    @staticmethod
+    def get_slot_range(
+        origin: dt.datetime, start_time: dt.datetime, end_time: dt.datetime, laps_duration_hr: int = 3
+    ) -> tuple[int, int]:
+        """Get the positions, counted in laps from origin, of the first and last laps starting in a window."""
+        laps_duration = dt.timedelta(hours=laps_duration_hr)
+        return math.ceil((start_time - origin) / laps_duration), math.floor((end_time - origin) / laps_duration)
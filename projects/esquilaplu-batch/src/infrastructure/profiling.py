@@ -0,0 +1,146 @@
+import collections
+import contextlib
+import cProfile
+import pstats
+import sys
+import threading
+import tracemalloc
+from pathlib import Path
+from typing import Iterator
+
+from src.domain.value_objects import Laps
+
+
+class StackSampler:
+    """Samples the stacks of every thread at a fixed interval, so that the time spent waiting on S3 or Météo-France
+    by the download threads shows up next to the CPU time of the main thread."""
+
+    def __init__(self, interval_sec: float) -> None:
+        self._interval_sec = interval_sec
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample_forever, name="stack-sampler", daemon=True)
+        self._lock = threading.Lock()
+        self._samples: collections.Counter[tuple[str, str]] = collections.Counter()
+        self.tag = "run"
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def get_samples(self, tag: str | None = None) -> list[tuple[str, int]]:
+        with self._lock:
+            return sorted((stack, count) for (tag_, stack), count in self._samples.items() if tag in (None, tag_))
+
+    def _sample_forever(self) -> None:
+        while not self._stop.wait(self._interval_sec):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = [
+                self._collapse(thread_names.get(thread_id, str(thread_id)), frame)
+                for thread_id, frame in sys._current_frames().items()
+                if thread_id != self._thread.ident
+            ]
+            with self._lock:
+                self._samples.update((self.tag, stack) for stack in stacks)
+
+    @staticmethod
+    def _collapse(thread_name: str, frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join([thread_name, *reversed(stack)])
+
+
+class RunProfiler:
+    """Profiles a batch run, as a whole and laps by laps.
+
+    Writes in the output directory, for the run and for each collected laps (`laps/<YYYY-MM-DD-HH>.*`):
+    - `.pstats`: deterministic profile of the main thread, for `python -m pstats` or snakeviz
+    - `.collapsed`: sampled stacks of every thread, for flamegraph.pl or speedscope
+    - `.memory.txt`: tracemalloc peak and largest allocation sites still alive at the end, when memory is traced
+    """
+
+    TOP_ALLOCATIONS = 25
+
+    def __init__(self, output_dir: Path, sample_interval_sec: float = 0.005, trace_memory: bool = False) -> None:
+        self._output_dir = output_dir
+        self._sample_interval_sec = sample_interval_sec
+        self._trace_memory = trace_memory
+        self._run_profile = cProfile.Profile()
+        self._laps_stats_paths: list[Path] = []
+        # each laps resets the tracemalloc peak, the peak of the run is kept apart
+        self._peak_bytes = 0
+        self._sampler: StackSampler | None = None
+
+    @contextlib.contextmanager
+    def run(self) -> Iterator[None]:
+        (self._output_dir / "laps").mkdir(parents=True, exist_ok=True)
+        self._sampler = StackSampler(interval_sec=self._sample_interval_sec)
+        if self._trace_memory:
+            tracemalloc.start()
+        self._sampler.start()
+        self._run_profile.enable()
+        try:
+            yield
+        finally:
+            self._run_profile.disable()
+            self._sampler.stop()
+
+            # the laps are profiled apart, the run statistics add them back
+            stats = pstats.Stats(self._run_profile)
+            for path in self._laps_stats_paths:
+                stats.add(str(path))
+            stats.dump_stats(self._output_dir / "run.pstats")
+            self._write_collapsed(self._output_dir / "run.collapsed")
+            if self._trace_memory:
+                self._write_memory(self._output_dir / "run.memory.txt", whole_run=True)
+                tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def laps(self, laps: Laps) -> Iterator[None]:
+        if self._sampler is None:
+            yield
+            return
+
+        tag = laps.start_time.strftime("%Y-%m-%d-%H")
+        laps_profile = cProfile.Profile()
+        if self._trace_memory:
+            self._peak_bytes = max(self._peak_bytes, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        # a single profiler can be active at a time
+        self._run_profile.disable()
+        self._sampler.tag = tag
+        laps_profile.enable()
+        try:
+            yield
+        finally:
+            laps_profile.disable()
+            self._sampler.tag = "run"
+
+            path = self._output_dir / "laps" / f"{tag}.pstats"
+            laps_profile.dump_stats(path)
+            self._laps_stats_paths.append(path)
+            self._write_collapsed(self._output_dir / "laps" / f"{tag}.collapsed", tag=tag)
+            if self._trace_memory:
+                self._write_memory(self._output_dir / "laps" / f"{tag}.memory.txt")
+            self._run_profile.enable()
+
+    def _write_collapsed(self, path: Path, tag: str | None = None) -> None:
+        with open(path, "w") as file:
+            for stack, count in self._sampler.get_samples(tag=tag):
+                file.write(f"{stack} {count}\n")
+
+    def _write_memory(self, path: Path, whole_run: bool = False) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        self._peak_bytes = max(self._peak_bytes, peak)
+        # the peak of the run includes those of its laps
+        peak = self._peak_bytes if whole_run else peak
+        statistics = tracemalloc.take_snapshot().statistics("lineno")
+        with open(path, "w") as file:
+            file.write(f"peak: {peak / 2**20:.1f} MiB, current: {current / 2**20:.1f} MiB\n\n")
+            for statistic in statistics[: self.TOP_ALLOCATIONS]:
+                file.write(f"{statistic}\n")
@@ -1,33 +1,56 @@
 import datetime as dt
+import io
 import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import boto3
 import pandas as pd
+import pyarrow as pa
+from botocore.exceptions import ClientError
 
-from src.domain.entities import Record
+from src.domain.entities import CollectState, Record
 from src.domain.ports.outer import AppRepository
-from src.domain.value_objects import Laps
+from src.domain.value_objects import Laps, Station, WindowRainfall
+from src.infrastructure.factories.climatology import ClimatologyFactory
+from src.infrastructure.factories.mf_dataset import MeteoFranceDatasetFactory
+from src.infrastructure.factories.mf_record import MeteoFranceRecordFactory
+from src.infrastructure.factories.mf_station import MeteoFranceStationFactory
+from src.infrastructure.factories.rainfall_index import RainfallIndexFactory
 
 
 class AppS3Repository(AppRepository):
     MF_LAPS_DURATION = 3
+    MAX_WORKERS = 8
+    # rollups are sorted by station then period, small row groups let a station range skip the others when read
+    ROLLUP_ROW_GROUP_SIZE = 4096
+    COARSE_ROLLUP_FREQUENCIES = {"monthly": "M", "yearly": "Y"}
 
-    def __init__(self, bucket: str, root_key: str, secret_key: str, access_key: str) -> None:
+    def __init__(
+        self,
+        bucket: str,
+        root_key: str,
+        secret_key: str,
+        access_key: str,
+        parse_workers: int = 0,
+        endpoint_url: str | None = None,
+    ) -> None:
         self._aws_s3_bucket = bucket
         self._root_key = root_key
+        # worker processes parsing raw datasets for large loads, parsing stays on threads when 0
+        self._parse_executor = ProcessPoolExecutor(max_workers=parse_workers) if parse_workers > 0 else None
 
         self._s3_client = boto3.client(
             "s3",
             aws_access_key_id=access_key,
             aws_secret_access_key=secret_key,
+            endpoint_url=endpoint_url,
         )
 
     def get_available_laps_since(self, since: dt.datetime) -> list[Laps]:
-        all_saved_data_files = self._list_existing_files()
+        all_saved_data_files = self._list_existing_files(since=since)
+        # raw datasets are keyed by their laps start time, see save_raw_dataset
         all_saved_dt = [
-            self._parse_datetime_from_filename(file) - dt.timedelta(hours=self.MF_LAPS_DURATION)
-            for file in all_saved_data_files
-            if file.endswith(".csv")
+            self._parse_datetime_from_filename(file) for file in all_saved_data_files if file.endswith(".csv")
         ]
         all_saved_dt = [
             Laps(start_time=saved_dt, duration_hours=self.MF_LAPS_DURATION)
@@ -37,12 +60,31 @@ class AppS3Repository(AppRepository):
 
         return all_saved_dt
 
-    def save_many_records(self, records: list[Record]) -> None:
+    def get_recorded_laps_since(self, station_id: int, since: dt.datetime) -> list[Laps]:
+        # record keys sort chronologically, listing starts right before the first one
+        paginator = self._s3_client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(
+            Bucket=self._aws_s3_bucket,
+            Prefix=self._records_prefix(station_id),
+            StartAfter=f"{self._records_prefix(station_id)}{since.strftime('%Y/%m/%d/%H')}",
+        )
+
+        recorded_times = [
+            dt.datetime.strptime(content["Key"].removeprefix(self._records_prefix(station_id)), "%Y/%m/%d/%H.json")
+            for page in pages
+            for content in page.get("Contents", [])
+        ]
+        return [
+            Laps(start_time=recorded_time, duration_hours=self.MF_LAPS_DURATION)
+            for recorded_time in recorded_times
+            if recorded_time >= since
+        ]
+
+    def save_many_records(self, records: list[Record], station_id: int) -> None:
         # serialize each day records in json
-        for record in records:
+        def save_record(record: Record) -> None:
             start_time = record.laps.start_time
-            filepath = f"{start_time.strftime('%Y/%m/%d/%H')}.json"
-            key = f"{self._root_key}/processed/records/{filepath}"
+            key = f"{self._records_prefix(station_id)}{start_time.strftime('%Y/%m/%d/%H')}.json"
             content = {
                 "data": record.to_dict(),
             }
@@ -55,32 +97,357 @@ class AppS3Repository(AppRepository):
                 Body=serialized_content,
             )
 
+        # one object per record, a reprocessed month writes hundreds of them
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            list(executor.map(save_record, records))
+
     def save_raw_dataset(self, dataset: pd.DataFrame, laps: Laps) -> None:
         data_to_save = dataset.copy()
         data_to_save["date"] = data_to_save["date"].apply(lambda x: x.strftime("%Y-%m-%d"))
 
-        filename = f"{laps.start_time.strftime('%Y-%m-%d-%H')}.csv"
-        key = f"{self._root_key}/raw/meteofrance/{filename}"
         self._s3_client.put_object(
             Bucket=self._aws_s3_bucket,
-            Key=key,
+            Key=self._raw_key(laps),
             Body=data_to_save.to_csv(index=False, sep=";", header=True),
         )
 
-    def _list_existing_files(self) -> list[str]:
-        response = self._s3_client.list_objects_v2(
-            Bucket=self._aws_s3_bucket, Prefix=f"{self._root_key}/raw/meteofrance"
+        self.save_station_datasets(datasets=[dataset])
+
+    def load_raw_datasets(self, laps: list[Laps]) -> list[pd.DataFrame]:
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            if self._parse_executor is None:
+                return list(executor.map(lambda laps_: self.load_raw_dataset(laps=laps_), laps))
+
+            # downloads stay on threads while the CPU bound parsing is spread over the worker processes
+            parsed_futures = list(
+                executor.map(
+                    lambda laps_: self._parse_executor.submit(
+                        MeteoFranceDatasetFactory.parse_raw_csv,
+                        self._s3_client.get_object(Bucket=self._aws_s3_bucket, Key=self._raw_key(laps_))["Body"].read(),
+                        laps_.start_time + dt.timedelta(hours=laps_.duration_hours),
+                    ),
+                    laps,
+                )
+            )
+
+        return [pd.DataFrame(future.result()) for future in parsed_futures]
+
+    def load_raw_dataset(self, laps: Laps) -> pd.DataFrame:
+        response = self._s3_client.get_object(Bucket=self._aws_s3_bucket, Key=self._raw_key(laps))
+        dataset = pd.read_csv(response["Body"], sep=";", header=0)
+
+        # raw files only keep the day, the observation time is the end of the laps
+        dataset["date"] = laps.start_time + dt.timedelta(hours=laps.duration_hours)
+
+        return dataset.astype({"date": "datetime64[ns]"})
+
+    def save_station_datasets(self, datasets: list[pd.DataFrame]) -> None:
+        if not datasets:
+            return
+
+        dataset = MeteoFranceDatasetFactory.to_columnar(pd.concat(datasets, ignore_index=True))
+        partitions = dataset.groupby(
+            [dataset["numer_sta"], dataset["date"].dt.year.rename("year"), dataset["date"].dt.month.rename("month")]
         )
 
-        if response.get("KeyCount", 0) == 0:
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            list(
+                executor.map(
+                    lambda partition: self._merge_parquet(
+                        self._station_partition_key(*partition[0]), partition[1], unique_columns=["date"]
+                    ),
+                    partitions,
+                )
+            )
+
+    def get_consolidated_laps(self) -> list[Laps]:
+        manifest = self._read_json(self._history_manifest_key()) or {"laps": []}
+
+        return [
+            Laps(start_time=dt.datetime.fromisoformat(start_time), duration_hours=self.MF_LAPS_DURATION)
+            for start_time in manifest["laps"]
+        ]
+
+    def save_consolidated_datasets(self, datasets: list[pd.DataFrame], laps: list[Laps]) -> None:
+        if not datasets:
+            return
+
+        dataset = MeteoFranceDatasetFactory.to_columnar(pd.concat(datasets, ignore_index=True))
+        partitions = dataset.groupby([dataset["date"].dt.year.rename("year"), dataset["date"].dt.month.rename("month")])
+
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            list(
+                executor.map(
+                    lambda partition: self._merge_parquet(
+                        self._history_partition_key(*partition[0]), partition[1], unique_columns=["numer_sta", "date"]
+                    ),
+                    partitions,
+                )
+            )
+
+        # the manifest is only updated once the partitions are written, so an interrupted run is merged again
+        consolidated_laps = {laps_.start_time for laps_ in self.get_consolidated_laps()} | {
+            laps_.start_time for laps_ in laps
+        }
+        self._s3_client.put_object(
+            Bucket=self._aws_s3_bucket,
+            Key=self._history_manifest_key(),
+            Body=json.dumps({"laps": [start_time.isoformat() for start_time in sorted(consolidated_laps)]}),
+        )
+
+    def update_rollups(self, laps: list[Laps]) -> None:
+        if not laps:
+            return
+
+        touched_periods = pd.DatetimeIndex(sorted({laps_.start_time.date() for laps_ in laps}))
+        observations = self._load_day_observations(touched_periods)
+        self._update_rainfall_indexes(observations)
+        finer_rollup = self._upsert_rollup("daily", self._compute_daily_rollup(observations), touched_periods)
+        self._update_climatologies(finer_rollup, station_ids=observations["numer_sta"].unique())
+
+        # coarser rollups are rebuilt, for the touched periods only, from the finer one
+        for name, frequency in self.COARSE_ROLLUP_FREQUENCIES.items():
+            touched_periods = touched_periods.to_period(frequency).unique().to_timestamp()
+            rows = (
+                finer_rollup.assign(period=finer_rollup["period"].dt.to_period(frequency).dt.to_timestamp())
+                .loc[lambda rollup: rollup["period"].isin(touched_periods)]
+                .groupby(["numer_sta", "period"], as_index=False)
+                .agg(rainfall_mm=("rainfall_mm", "sum"), nb_laps=("nb_laps", "sum"))
+            )
+            finer_rollup = self._upsert_rollup(name, rows, touched_periods)
+
+    def get_station_records(self, station_id: int, start_time: dt.datetime, end_time: dt.datetime) -> list[Record]:
+        # observations are dated at the end of their laps
+        laps_duration = dt.timedelta(hours=self.MF_LAPS_DURATION)
+        first_date, last_date = start_time + laps_duration, end_time + laps_duration
+
+        keys = [
+            self._station_partition_key(station_id, month.year, month.month)
+            for month in pd.period_range(first_date, last_date, freq="M")
+        ]
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            partitions = [partition for partition in executor.map(self._read_parquet, keys) if partition is not None]
+
+        if not partitions:
             return []
 
+        observations = pd.concat(partitions, ignore_index=True)
+        observations = observations.loc[observations["date"].between(first_date, last_date)]
+
+        return MeteoFranceRecordFactory.from_station_dataframe(observations, laps_duration_hr=self.MF_LAPS_DURATION)
+
+    def get_daily_rainfall(self, station_id: int, start_date: dt.date, end_date: dt.date) -> dict[dt.date, float]:
+        rollup = self._read_parquet(
+            self._rollup_key("daily"),
+            filters=[
+                ("numer_sta", "=", station_id),
+                ("period", ">=", pd.Timestamp(start_date)),
+                ("period", "<=", pd.Timestamp(end_date)),
+            ],
+        )
+        if rollup is None:
+            return {}
+
+        return {period.date(): rainfall_mm for period, rainfall_mm in zip(rollup["period"], rollup["rainfall_mm"])}
+
+    def get_window_rainfall(self, station_id: int, start_time: dt.datetime, end_time: dt.datetime) -> WindowRainfall:
+        index = self._read_parquet(self._rainfall_index_key(station_id))
+        return RainfallIndexFactory.get_window_rainfall(index, start_time, end_time, self.MF_LAPS_DURATION)
+
+    def load_stations(self) -> list[Station]:
+        body = self._get_object_body(self._stations_key())
+        if body is None:
+            return []
+        return MeteoFranceStationFactory.from_dataframe(pd.read_csv(io.BytesIO(body), sep=";", header=0))
+
+    def save_stations(self, stations: list[Station]) -> None:
+        self._s3_client.put_object(
+            Bucket=self._aws_s3_bucket,
+            Key=self._stations_key(),
+            Body=MeteoFranceStationFactory.to_dataframe(stations).to_csv(index=False, sep=";", header=True),
+        )
+
+    def load_collect_state(self, station_id: int) -> CollectState | None:
+        content = self._read_json(self._collect_state_key(station_id))
+        return None if content is None else CollectState.from_dict(content)
+
+    def save_collect_state(self, state: CollectState, station_id: int) -> None:
+        self._s3_client.put_object(
+            Bucket=self._aws_s3_bucket,
+            Key=self._collect_state_key(station_id),
+            Body=json.dumps(state.to_dict(), default=str),
+        )
+
+    def _load_day_observations(self, days: pd.DatetimeIndex) -> pd.DataFrame:
+        # a day is made of the laps starting that day, whose observations end up to 3 hours later
+        months = sorted({(day.year, day.month) for day in days.union(days + pd.Timedelta(days=1))})
+        station_ids = self._list_station_ids()
+
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            partitions = executor.map(
+                lambda partition_id: self._read_parquet(self._station_partition_key(*partition_id)),
+                [(station_id, year, month) for station_id in station_ids for year, month in months],
+            )
+            partitions = [partition for partition in partitions if partition is not None]
+
+        if not partitions:
+            return pd.DataFrame({"numer_sta": [], "date": [], "rr3": [], "period": []}).astype(
+                {"numer_sta": "int64", "date": "datetime64[ns]", "rr3": "float64", "period": "datetime64[ns]"}
+            )
+
+        observations = pd.concat(partitions, ignore_index=True)
+        observations["period"] = (observations["date"] - pd.Timedelta(hours=self.MF_LAPS_DURATION)).dt.normalize()
+
+        return observations.loc[observations["period"].isin(days)]
+
+    @staticmethod
+    def _compute_daily_rollup(observations: pd.DataFrame) -> pd.DataFrame:
+        return (
+            observations.assign(rr3=observations["rr3"].clip(lower=0))
+            .groupby(["numer_sta", "period"], as_index=False)
+            .agg(rainfall_mm=("rr3", "sum"), nb_laps=("rr3", "count"))
+            .astype({"numer_sta": "int64", "rainfall_mm": "float64", "nb_laps": "int64"})
+        )
+
+    def _update_rainfall_indexes(self, observations: pd.DataFrame) -> None:
+        def update_rainfall_index(station_id: int, station_observations: pd.DataFrame) -> None:
+            key = self._rainfall_index_key(station_id)
+            index = RainfallIndexFactory.merge(self._read_parquet(key), station_observations, self.MF_LAPS_DURATION)
+            self._write_parquet(key, index)
+            # the app memory-maps this copy, bytes flags keep every column readable without a copy
+            self._write_arrow(self._rainfall_series_key(station_id), index.astype({"valid": "uint8"}))
+
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            list(executor.map(lambda group: update_rainfall_index(*group), observations.groupby("numer_sta")))
+
+    def _update_climatologies(self, daily_rollup: pd.DataFrame, station_ids: list[int]) -> None:
+        # only the stations with new days are computed again, each over its whole history
+        daily_rollup = daily_rollup.loc[daily_rollup["numer_sta"].isin(station_ids)]
+
+        with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+            list(
+                executor.map(
+                    lambda group: self._write_parquet(
+                        self._climatology_key(group[0]), ClimatologyFactory.compute(group[1])
+                    ),
+                    daily_rollup.groupby("numer_sta"),
+                )
+            )
+
+    def _upsert_rollup(self, name: str, rows: pd.DataFrame, touched_periods: pd.DatetimeIndex) -> pd.DataFrame:
+        key = self._rollup_key(name)
+
+        existing = self._read_parquet(key)
+        if existing is not None:
+            existing = existing.loc[~existing["period"].isin(touched_periods)]
+            rows = pd.concat([existing, rows], ignore_index=True)
+
+        rows = rows.sort_values(["numer_sta", "period"]).reset_index(drop=True)
+        self._write_parquet(key, rows, row_group_size=self.ROLLUP_ROW_GROUP_SIZE)
+
+        return rows
+
+    def _list_station_ids(self) -> list[int]:
+        paginator = self._s3_client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(Bucket=self._aws_s3_bucket, Prefix=f"{self._root_key}/stations/", Delimiter="/")
+
+        return [
+            int(prefix["Prefix"].rstrip("/").rsplit("/", 1)[-1])
+            for page in pages
+            for prefix in page.get("CommonPrefixes", [])
+        ]
+
+    def _merge_parquet(self, key: str, dataset: pd.DataFrame, unique_columns: list[str]) -> None:
+        existing = self._read_parquet(key)
+        if existing is not None:
+            dataset = pd.concat([existing, dataset], ignore_index=True)
+
+        dataset = (
+            dataset.drop_duplicates(subset=unique_columns, keep="last")
+            .sort_values(unique_columns[::-1])
+            .reset_index(drop=True)
+        )
+        self._write_parquet(key, dataset)
+
+    def _read_json(self, key: str) -> dict | None:
+        body = self._get_object_body(key)
+        return None if body is None else json.loads(body)
+
+    def _read_parquet(self, key: str, filters: list[tuple] | None = None) -> pd.DataFrame | None:
+        body = self._get_object_body(key)
+        return None if body is None else pd.read_parquet(io.BytesIO(body), filters=filters)
+
+    def _get_object_body(self, key: str) -> bytes | None:
+        try:
+            response = self._s3_client.get_object(Bucket=self._aws_s3_bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+
+        return response["Body"].read()
+
+    def _write_parquet(self, key: str, dataset: pd.DataFrame, row_group_size: int | None = None) -> None:
+        buffer = io.BytesIO()
+        dataset.to_parquet(buffer, index=False, row_group_size=row_group_size)
+        self._s3_client.put_object(Bucket=self._aws_s3_bucket, Key=key, Body=buffer.getvalue())
+
+    def _write_arrow(self, key: str, dataset: pd.DataFrame) -> None:
+        # uncompressed Arrow IPC file in a single record batch, fixed width columns can be memory-mapped as is
+        table = pa.Table.from_pandas(dataset, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        self._s3_client.put_object(Bucket=self._aws_s3_bucket, Key=key, Body=sink.getvalue().to_pybytes())
+
+    def _list_existing_files(self, since: dt.datetime) -> list[str]:
+        # raw keys sort chronologically, listing starts right before the first one, a page holds 1000 keys at most
+        prefix = f"{self._root_key}/raw/meteofrance/"
+        paginator = self._s3_client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(
+            Bucket=self._aws_s3_bucket,
+            Prefix=prefix,
+            # formatted by hand, strftime does not pad the years of dt.datetime.min
+            StartAfter=f"{prefix}{since.year:04d}-{since.month:02d}-{since.day:02d}-{since.hour:02d}",
+        )
+
         return [
-            content["Key"].lstrip(f"{self._root_key}/")
-            for content in response["Contents"]
-            if content["Key"] != self._root_key
+            content["Key"].removeprefix(f"{self._root_key}/") for page in pages for content in page.get("Contents", [])
         ]
 
+    def _raw_key(self, laps: Laps) -> str:
+        return f"{self._root_key}/raw/meteofrance/{laps.start_time.strftime('%Y-%m-%d-%H')}.csv"
+
+    def _station_partition_key(self, station_id: int, year: int, month: int) -> str:
+        return f"{self._root_key}/stations/{station_id}/{year:04d}/{month:02d}.parquet"
+
+    def _history_partition_key(self, year: int, month: int) -> str:
+        return f"{self._root_key}/history/{year:04d}/{month:02d}.parquet"
+
+    def _history_manifest_key(self) -> str:
+        return f"{self._root_key}/history/manifest.json"
+
+    def _rollup_key(self, name: str) -> str:
+        return f"{self._root_key}/rollups/{name}.parquet"
+
+    def _rainfall_index_key(self, station_id: int) -> str:
+        return f"{self._root_key}/index/rainfall/{station_id}.parquet"
+
+    def _rainfall_series_key(self, station_id: int) -> str:
+        return f"{self._root_key}/index/rainfall/{station_id}.arrow"
+
+    def _climatology_key(self, station_id: int) -> str:
+        return f"{self._root_key}/climatology/{station_id}.parquet"
+
+    def _stations_key(self) -> str:
+        return f"{self._root_key}/metadata/stations.csv"
+
+    def _records_prefix(self, station_id: int) -> str:
+        return f"{self._root_key}/processed/records/{station_id}/"
+
+    def _collect_state_key(self, station_id: int) -> str:
+        return f"{self._root_key}/state/collect/{station_id}.json"
+
     @staticmethod
     def _parse_datetime_from_filename(filename: str) -> dt.datetime:
         return dt.datetime.strptime(filename, "raw/meteofrance/%Y-%m-%d-%H.csv")
@@ -0,0 +1,325 @@
+import datetime as dt
+import functools
+import json
+import sqlite3
+import threading
+from typing import Callable, TypeVar
+
+import pandas as pd
+
+from src.domain.entities import CollectState, Record
+from src.domain.ports.outer import AppRepository
+from src.domain.value_objects import Laps, Station, WindowRainfall
+from src.infrastructure.factories.mf_dataset import MeteoFranceDatasetFactory
+from src.infrastructure.factories.mf_record import MeteoFranceRecordFactory
+from src.infrastructure.factories.rainfall_index import RainfallIndexFactory
+
+T = TypeVar("T")
+
+
+def _serialized(method: Callable[..., T]) -> Callable[..., T]:
+    """Run the method holding the repository lock, the connection is shared by the threads of the batch."""
+
+    @functools.wraps(method)
+    def wrapper(self: "AppSQLiteRepository", *args, **kwargs) -> T:
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class AppSQLiteRepository(AppRepository):
+    MF_LAPS_DURATION = 3
+    RAINFALL_COLUMNS = ["rr1", "rr3", "rr6", "rr12", "rr24"]
+    # rollup name, source rollup and period format of the coarser rollups
+    COARSE_ROLLUPS = [("monthly", "daily", "%Y-%m-01"), ("yearly", "monthly", "%Y-01-01")]
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS raw_datasets (
+            start_time TEXT PRIMARY KEY,
+            duration_hours INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS observations (
+            numer_sta INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            rr1 REAL,
+            rr3 REAL,
+            rr6 REAL,
+            rr12 REAL,
+            rr24 REAL,
+            payload TEXT NOT NULL,
+            PRIMARY KEY (numer_sta, date)
+        );
+        CREATE INDEX IF NOT EXISTS observations_date_idx ON observations (date);
+        CREATE TABLE IF NOT EXISTS records (
+            numer_sta INTEGER NOT NULL,
+            start_time TEXT NOT NULL,
+            duration_hours INTEGER NOT NULL,
+            rainfall_mm REAL,
+            PRIMARY KEY (numer_sta, start_time)
+        );
+        CREATE TABLE IF NOT EXISTS rollups (
+            name TEXT NOT NULL,
+            numer_sta INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            rainfall_mm REAL NOT NULL,
+            nb_laps INTEGER NOT NULL,
+            PRIMARY KEY (name, numer_sta, period)
+        );
+        CREATE TABLE IF NOT EXISTS stations (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS collect_state (
+            numer_sta INTEGER PRIMARY KEY,
+            content TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path: str) -> None:
+        # reprocess loads the next month on a worker thread, statements are serialized by the lock instead
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.RLock()
+        self._connection.executescript(self.SCHEMA)
+
+    @_serialized
+    def get_available_laps_since(self, since: dt.datetime) -> list[Laps]:
+        rows = self._connection.execute(
+            "SELECT start_time, duration_hours FROM raw_datasets WHERE start_time >= ? ORDER BY start_time",
+            (self._format_datetime(since),),
+        )
+
+        return [
+            Laps(start_time=dt.datetime.fromisoformat(start_time), duration_hours=hours) for start_time, hours in rows
+        ]
+
+    @_serialized
+    def get_recorded_laps_since(self, station_id: int, since: dt.datetime) -> list[Laps]:
+        rows = self._connection.execute(
+            "SELECT start_time, duration_hours FROM records WHERE numer_sta = ? AND start_time >= ? "
+            "ORDER BY start_time",
+            (station_id, self._format_datetime(since)),
+        )
+
+        return [
+            Laps(start_time=dt.datetime.fromisoformat(start_time), duration_hours=hours) for start_time, hours in rows
+        ]
+
+    @_serialized
+    def save_many_records(self, records: list[Record], station_id: int) -> None:
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO records (numer_sta, start_time, duration_hours, rainfall_mm) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        station_id,
+                        self._format_datetime(record.laps.start_time),
+                        record.laps.duration_hours,
+                        record.rainfall_mm,
+                    )
+                    for record in records
+                ],
+            )
+
+    @_serialized
+    def save_raw_dataset(self, dataset: pd.DataFrame, laps: Laps) -> None:
+        self.save_station_datasets(datasets=[dataset])
+
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO raw_datasets (start_time, duration_hours) VALUES (?, ?)",
+                (self._format_datetime(laps.start_time), laps.duration_hours),
+            )
+
+    @_serialized
+    def load_raw_dataset(self, laps: Laps) -> pd.DataFrame:
+        end_time = laps.start_time + dt.timedelta(hours=laps.duration_hours)
+        rows = self._connection.execute(
+            "SELECT payload FROM observations WHERE date = ? ORDER BY numer_sta", (self._format_datetime(end_time),)
+        )
+
+        dataset = pd.DataFrame.from_records([json.loads(payload) for payload, in rows])
+        dataset.insert(0, "date", end_time)
+
+        return dataset.astype({"date": "datetime64[ns]"})
+
+    @_serialized
+    def load_raw_datasets(self, laps: list[Laps]) -> list[pd.DataFrame]:
+        return [self.load_raw_dataset(laps=laps_) for laps_ in laps]
+
+    @_serialized
+    def save_station_datasets(self, datasets: list[pd.DataFrame]) -> None:
+        if not datasets:
+            return
+
+        dataset = MeteoFranceDatasetFactory.to_columnar(pd.concat(datasets, ignore_index=True))
+        dataset = dataset.reindex(columns=[*dataset.columns, *set(self.RAINFALL_COLUMNS) - set(dataset.columns)])
+
+        payloads = dataset.drop(columns="date").to_dict(orient="records")
+        rows = [
+            (
+                int(row["numer_sta"]),
+                self._format_datetime(row["date"]),
+                *[self._to_nullable(row[column]) for column in self.RAINFALL_COLUMNS],
+                json.dumps({key: self._to_nullable(value) for key, value in payload.items()}),
+            )
+            for row, payload in zip(dataset.to_dict(orient="records"), payloads)
+        ]
+
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO observations (numer_sta, date, rr1, rr3, rr6, rr12, rr24, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    @_serialized
+    def get_consolidated_laps(self) -> list[Laps]:
+        # observations are already the consolidated history of every saved raw dataset
+        return self.get_available_laps_since(since=dt.datetime.min)
+
+    @_serialized
+    def save_consolidated_datasets(self, datasets: list[pd.DataFrame], laps: list[Laps]) -> None:
+        self.save_station_datasets(datasets=datasets)
+
+    @_serialized
+    def update_rollups(self, laps: list[Laps]) -> None:
+        if not laps:
+            return
+
+        touched_days = sorted({laps_.start_time.date() for laps_ in laps})
+        placeholders = ", ".join("?" * len(touched_days))
+        touched_periods = [day.isoformat() for day in touched_days]
+
+        with self._connection:
+            # a day is made of the laps starting that day, whose observations end up to 3 hours later
+            self._connection.execute(
+                f"DELETE FROM rollups WHERE name = 'daily' AND period IN ({placeholders})", touched_periods
+            )
+            self._connection.execute(
+                f"""
+                INSERT INTO rollups (name, numer_sta, period, rainfall_mm, nb_laps)
+                SELECT 'daily', numer_sta, date(date, '-{self.MF_LAPS_DURATION} hours') AS period,
+                    TOTAL(MAX(rr3, 0)), COUNT(rr3)
+                FROM observations
+                WHERE date > ? AND date <= ? AND period IN ({placeholders})
+                GROUP BY numer_sta, period
+                """,
+                [
+                    self._format_datetime(touched_days[0]),
+                    self._format_datetime(touched_days[-1] + dt.timedelta(days=1)),
+                    *touched_periods,
+                ],
+            )
+
+            # coarser rollups are rebuilt, for the touched periods only, from the finer one
+            for name, source, period_format in self.COARSE_ROLLUPS:
+                touched_periods = sorted(
+                    {dt.date.fromisoformat(period).strftime(period_format) for period in touched_periods}
+                )
+                placeholders = ", ".join("?" * len(touched_periods))
+
+                self._connection.execute(
+                    f"DELETE FROM rollups WHERE name = ? AND period IN ({placeholders})", [name, *touched_periods]
+                )
+                self._connection.execute(
+                    f"""
+                    INSERT INTO rollups (name, numer_sta, period, rainfall_mm, nb_laps)
+                    SELECT ?, numer_sta, strftime(?, period) AS coarse_period, TOTAL(rainfall_mm), SUM(nb_laps)
+                    FROM rollups
+                    WHERE name = ? AND coarse_period IN ({placeholders})
+                    GROUP BY numer_sta, coarse_period
+                    """,
+                    [name, period_format, source, *touched_periods],
+                )
+
+    @_serialized
+    def get_station_records(self, station_id: int, start_time: dt.datetime, end_time: dt.datetime) -> list[Record]:
+        # observations are dated at the end of their laps
+        laps_duration = dt.timedelta(hours=self.MF_LAPS_DURATION)
+        observations = pd.read_sql_query(
+            "SELECT date, rr1, rr3, rr6, rr12, rr24 FROM observations "
+            "WHERE numer_sta = ? AND date BETWEEN ? AND ? ORDER BY date",
+            self._connection,
+            params=(
+                station_id,
+                self._format_datetime(start_time + laps_duration),
+                self._format_datetime(end_time + laps_duration),
+            ),
+            parse_dates=["date"],
+        )
+
+        return MeteoFranceRecordFactory.from_station_dataframe(observations, laps_duration_hr=self.MF_LAPS_DURATION)
+
+    @_serialized
+    def get_daily_rainfall(self, station_id: int, start_date: dt.date, end_date: dt.date) -> dict[dt.date, float]:
+        rows = self._connection.execute(
+            "SELECT period, rainfall_mm FROM rollups "
+            "WHERE name = 'daily' AND numer_sta = ? AND period BETWEEN ? AND ? ORDER BY period",
+            (station_id, start_date.isoformat(), end_date.isoformat()),
+        )
+
+        return {dt.date.fromisoformat(period): rainfall_mm for period, rainfall_mm in rows}
+
+    @_serialized
+    def get_window_rainfall(self, station_id: int, start_time: dt.datetime, end_time: dt.datetime) -> WindowRainfall:
+        # the (numer_sta, date) primary key already serves range sums, no running sum is kept here
+        laps_duration = dt.timedelta(hours=self.MF_LAPS_DURATION)
+        rainfall_mm, nb_valid_laps = self._connection.execute(
+            "SELECT TOTAL(MAX(rr3, 0)), COUNT(rr3) FROM observations WHERE numer_sta = ? AND date BETWEEN ? AND ?",
+            (
+                station_id,
+                self._format_datetime(start_time + laps_duration),
+                self._format_datetime(end_time + laps_duration),
+            ),
+        ).fetchone()
+        first, last = RainfallIndexFactory.get_slot_range(
+            dt.datetime(start_time.year, start_time.month, start_time.day), start_time, end_time, self.MF_LAPS_DURATION
+        )
+
+        return WindowRainfall(rainfall_mm=rainfall_mm, nb_laps=max(last - first + 1, 0), nb_valid_laps=nb_valid_laps)
+
+    @_serialized
+    def load_stations(self) -> list[Station]:
+        rows = self._connection.execute("SELECT id, name, latitude, longitude FROM stations ORDER BY id")
+        return [
+            Station(id=id_, name=name, latitude=latitude, longitude=longitude)
+            for id_, name, latitude, longitude in rows
+        ]
+
+    @_serialized
+    def save_stations(self, stations: list[Station]) -> None:
+        with self._connection:
+            self._connection.execute("DELETE FROM stations")
+            self._connection.executemany(
+                "INSERT INTO stations (id, name, latitude, longitude) VALUES (?, ?, ?, ?)",
+                [(station.id, station.name, station.latitude, station.longitude) for station in stations],
+            )
+
+    @_serialized
+    def load_collect_state(self, station_id: int) -> CollectState | None:
+        row = self._connection.execute(
+            "SELECT content FROM collect_state WHERE numer_sta = ?", (station_id,)
+        ).fetchone()
+        return None if row is None else CollectState.from_dict(json.loads(row[0]))
+
+    @_serialized
+    def save_collect_state(self, state: CollectState, station_id: int) -> None:
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO collect_state (numer_sta, content) VALUES (?, ?)",
+                (station_id, json.dumps(state.to_dict(), default=str)),
+            )
+
+    @staticmethod
+    def _format_datetime(value: dt.date | dt.datetime | pd.Timestamp) -> str:
+        if not isinstance(value, dt.datetime):
+            value = dt.datetime(value.year, value.month, value.day)
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+
+    @staticmethod
+    def _to_nullable(value: float) -> float | None:
+        return None if pd.isna(value) else value
@@ -0,0 +1,42 @@
+import json
+
+import boto3
+from botocore.exceptions import ClientError
+
+from src.domain.entities import Lease
+from src.domain.ports.outer import LeaseRepository
+
+
+class S3LeaseRepository(LeaseRepository):
+    def __init__(
+        self, bucket: str, root_key: str, secret_key: str, access_key: str, endpoint_url: str | None = None
+    ) -> None:
+        self._aws_s3_bucket = bucket
+        self._root_key = root_key
+
+        self._s3_client = boto3.client(
+            "s3",
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            endpoint_url=endpoint_url,
+        )
+
+    def get_lease(self, name: str) -> Lease | None:
+        try:
+            response = self._s3_client.get_object(Bucket=self._aws_s3_bucket, Key=self._lease_key(name))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+
+        return Lease.from_dict(json.loads(response["Body"].read()))
+
+    def put_lease(self, lease: Lease) -> None:
+        self._s3_client.put_object(
+            Bucket=self._aws_s3_bucket,
+            Key=self._lease_key(lease.name),
+            Body=json.dumps(lease.to_dict(), default=str),
+        )
+
+    def _lease_key(self, name: str) -> str:
+        return f"{self._root_key}/leases/{name}.json"
@@ -9,17 +9,31 @@ import requests
 from requests.exceptions import HTTPError
 
 from src.domain.entities import Record
-from src.domain.exceptions import WeatherCollectionError
+from src.domain.exceptions import WeatherCollectionError, WeatherDataNotFoundError
 from src.domain.ports.outer import WeatherDataRepository
-from src.domain.value_objects import Laps
+from src.domain.value_objects import Laps, Station
 from src.infrastructure.factories.mf_record import MeteoFranceRecordFactory
+from src.infrastructure.factories.mf_station import MeteoFranceStationFactory
 from src.infrastructure.repositories.app_s3 import AppS3Repository
 
 
 class MeteoFranceRepository(WeatherDataRepository):
-    def __init__(self, app_repository: AppS3Repository) -> None:
+    BASE_URL = "https://donneespubliques.meteofrance.fr"
+
+    def __init__(
+        self,
+        app_repository: AppS3Repository,
+        station_id: int = MeteoFranceRecordFactory.MERIGNAC_STATION_ID,
+        base_url: str = BASE_URL,
+        request_delay_sec: tuple[float, float] = (0.2, 1.5),
+    ) -> None:
         self._logger = logging.getLogger(__name__)
         self._app_repository = app_repository
+        self._station_id = station_id
+        # another server, such as the load harness stand-in, can be targeted instead of Météo-France
+        self._base_url = base_url
+        # random pause after each download, not to hammer the public server
+        self._request_delay_sec = request_delay_sec
 
     def collect_record(self, laps: Laps) -> Record:
         end_time = laps.start_time + dt.timedelta(hours=laps.duration_hours)
@@ -27,7 +41,7 @@ class MeteoFranceRepository(WeatherDataRepository):
         date_id = end_time.strftime("%Y%m%d")
         time_id = f"{date_id}{hour}"
 
-        url = f"https://donneespubliques.meteofrance.fr/donnees_libres/Txt/Synop/synop.{time_id}.csv"
+        url = f"{self._base_url}/donnees_libres/Txt/Synop/synop.{time_id}.csv"
         headers = {
             "Referer": (
                 f"https://donneespubliques.meteofrance.fr/?fond=donnee_libre&prefixe=Txt%2FSynop%2Fsynop&extension"
@@ -48,6 +62,8 @@ class MeteoFranceRepository(WeatherDataRepository):
             response.raise_for_status()
         except HTTPError as e:
             self._logger.error(f"Error while collecting weather data: {e}")
+            if response.status_code == 404:
+                raise WeatherDataNotFoundError()
             raise WeatherCollectionError()
 
         try:
@@ -69,7 +85,29 @@ class MeteoFranceRepository(WeatherDataRepository):
 
         self._app_repository.save_raw_dataset(dataset=dataframe, laps=laps)
 
-        wait_sec: float = random.uniform(0.2, 1.5)
+        wait_sec: float = random.uniform(*self._request_delay_sec)
         time.sleep(wait_sec)
 
-        return MeteoFranceRecordFactory.from_dataframe(dataframe, laps_duration_hr=3)
+        return self.extract_record(dataset=dataframe, laps=laps)
+
+    def extract_record(self, dataset: pd.DataFrame, laps: Laps) -> Record:
+        return MeteoFranceRecordFactory.from_dataframe(
+            dataset, laps_duration_hr=laps.duration_hours, station_id=self._station_id
+        )
+
+    def collect_stations(self) -> list[Station]:
+        response = requests.get(
+            f"{self._base_url}/donnees_libres/Txt/Synop/postesSynop.csv",
+            headers={
+                "User-Agent": "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/112.0",
+                "Host": "donneespubliques.meteofrance.fr",
+            },
+        )
+
+        try:
+            response.raise_for_status()
+        except HTTPError as e:
+            self._logger.error(f"Error while collecting weather stations: {e}")
+            raise WeatherCollectionError()
+
+        return MeteoFranceStationFactory.from_dataframe(pd.read_csv(io.StringIO(response.text), sep=";", header=0))
@@ -0,0 +1,112 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from src.domain.entities import MaintenanceCheckpoint
+from src.domain.ports.outer import ObjectStoreRepository
+
+
+class S3ObjectStoreRepository(ObjectStoreRepository):
+    # maximum number of keys of a DeleteObjects call
+    DELETE_BATCH_SIZE = 1000
+
+    def __init__(
+        self,
+        bucket: str,
+        root_key: str,
+        secret_key: str,
+        access_key: str,
+        endpoint_url: str | None = None,
+        copy_workers: int = 16,
+    ) -> None:
+        self._aws_s3_bucket = bucket
+        self._root_key = root_key
+        self._copy_workers = copy_workers
+
+        self._s3_client = boto3.client(
+            "s3",
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            endpoint_url=endpoint_url,
+            # one connection per copy thread
+            config=Config(max_pool_connections=max(copy_workers, 10)),
+        )
+
+    def list_keys(self, prefix: str, start_after: str = "") -> Iterator[list[str]]:
+        paginate_kwargs = {"Bucket": self._aws_s3_bucket, "Prefix": self._get_key(prefix)}
+        if start_after:
+            paginate_kwargs["StartAfter"] = self._get_key(start_after)
+
+        for page in self._s3_client.get_paginator("list_objects_v2").paginate(**paginate_kwargs):
+            keys = [content["Key"].removeprefix(f"{self._root_key}/") for content in page.get("Contents", [])]
+            if keys:
+                yield keys
+
+    def copy_objects(self, moves: list[tuple[str, str]]) -> list[str]:
+        def copy_object(move: tuple[str, str]) -> str | None:
+            source, destination = move
+            try:
+                self._s3_client.copy_object(
+                    Bucket=self._aws_s3_bucket,
+                    CopySource={"Bucket": self._aws_s3_bucket, "Key": self._get_key(source)},
+                    Key=self._get_key(destination),
+                )
+            except ClientError:
+                return source
+            return None
+
+        with ThreadPoolExecutor(max_workers=self._copy_workers) as executor:
+            return [source for source in executor.map(copy_object, moves) if source is not None]
+
+    def find_existing_keys(self, keys: list[str]) -> list[str]:
+        def exists(key: str) -> bool:
+            try:
+                self._s3_client.head_object(Bucket=self._aws_s3_bucket, Key=self._get_key(key))
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                    return False
+                raise
+            return True
+
+        with ThreadPoolExecutor(max_workers=self._copy_workers) as executor:
+            return [key for key, found in zip(keys, executor.map(exists, keys)) if found]
+
+    def delete_objects(self, keys: list[str]) -> list[str]:
+        failed_keys, batch_size = [], self.DELETE_BATCH_SIZE
+        for start in range(0, len(keys), batch_size):
+            end = start + batch_size
+            batch = keys[start:end]
+            response = self._s3_client.delete_objects(
+                Bucket=self._aws_s3_bucket,
+                Delete={"Objects": [{"Key": self._get_key(key)} for key in batch], "Quiet": True},
+            )
+            failed_keys += [error["Key"].removeprefix(f"{self._root_key}/") for error in response.get("Errors", [])]
+
+        return failed_keys
+
+    def get_checkpoint(self, name: str) -> MaintenanceCheckpoint | None:
+        try:
+            response = self._s3_client.get_object(Bucket=self._aws_s3_bucket, Key=self._checkpoint_key(name))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+
+        return MaintenanceCheckpoint.from_dict(json.loads(response["Body"].read()))
+
+    def put_checkpoint(self, name: str, checkpoint: MaintenanceCheckpoint) -> None:
+        self._s3_client.put_object(
+            Bucket=self._aws_s3_bucket,
+            Key=self._checkpoint_key(name),
+            Body=json.dumps(checkpoint.to_dict()),
+        )
+
+    def _get_key(self, key: str) -> str:
+        return f"{self._root_key}/{key}"
+
+    def _checkpoint_key(self, name: str) -> str:
+        return f"{self._root_key}/state/maintenance/{name}.json"
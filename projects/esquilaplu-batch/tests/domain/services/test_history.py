@@ -0,0 +1,55 @@
+import datetime as dt
+from unittest.mock import MagicMock, call
+
+import pytest
+
+from src.domain.ports.outer import AppRepository
+from src.domain.services.history import HistoryServiceImpl
+from src.domain.value_objects import Laps
+
+
+class TestHistoryServiceImpl:
+    @pytest.fixture
+    def mock_app_repository(self):
+        return MagicMock(spec=AppRepository)
+
+    @pytest.fixture
+    def service(self, mock_app_repository):
+        return HistoryServiceImpl(app_repository=mock_app_repository)
+
+    class TestConsolidate:
+        def test_should_merge_only_pending_laps_month_by_month(self, service, mock_app_repository):
+            # Given
+            mock_app_repository.get_available_laps_since.return_value = [
+                Laps(start_time=dt.datetime(2021, 2, 1, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 31, 21), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3),
+            ]
+            mock_app_repository.get_consolidated_laps.return_value = [
+                Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3),
+            ]
+            mock_app_repository.load_raw_datasets.side_effect = [["jan-21"], ["feb-00"]]
+
+            # When
+            service.consolidate()
+
+            # Then
+            mock_app_repository.save_consolidated_datasets.assert_has_calls(
+                [
+                    call(datasets=["jan-21"], laps=[Laps(start_time=dt.datetime(2021, 1, 31, 21), duration_hours=3)]),
+                    call(datasets=["feb-00"], laps=[Laps(start_time=dt.datetime(2021, 2, 1, 0), duration_hours=3)]),
+                ]
+            )
+
+        def test_should_do_nothing_when_everything_is_consolidated(self, service, mock_app_repository):
+            # Given
+            laps = [Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3)]
+            mock_app_repository.get_available_laps_since.return_value = laps
+            mock_app_repository.get_consolidated_laps.return_value = laps
+
+            # When
+            service.consolidate()
+
+            # Then
+            mock_app_repository.load_raw_datasets.assert_not_called()
+            mock_app_repository.save_consolidated_datasets.assert_not_called()
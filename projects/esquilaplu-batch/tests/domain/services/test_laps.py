@@ -3,6 +3,7 @@ from unittest.mock import MagicMock
 
 import pytest
 
+from src.domain.entities import CollectFailure, CollectState
 from src.domain.ports.outer import AppRepository
 from src.domain.services.laps import LapsServiceImpl
 from src.domain.value_objects import Laps
@@ -11,11 +12,19 @@ from src.domain.value_objects import Laps
 class TestLapsServiceImpl:
     @pytest.fixture
     def mock_app_repository(self):
-        return MagicMock(spec=AppRepository)
+        mock_app_repository = MagicMock(spec=AppRepository)
+        mock_app_repository.load_collect_state.return_value = None
+        return mock_app_repository
 
     @pytest.fixture
     def service(self, mock_app_repository):
-        return LapsServiceImpl(app_repository=mock_app_repository)
+        return LapsServiceImpl(
+            app_repository=mock_app_repository,
+            station_id=7510,
+            max_attempts=3,
+            retry_base_delay=dt.timedelta(hours=1),
+            clock=lambda: dt.datetime(2021, 1, 2, 12),
+        )
 
     class TestGetMissingLaps:
         def test_should_return_empty_list_when_no_missing(self, service, mock_app_repository):
@@ -32,14 +41,14 @@ class TestLapsServiceImpl:
                 Laps(start_time=dt.datetime(2021, 1, 1, 18), duration_hours=3),
                 Laps(start_time=dt.datetime(2021, 1, 1, 21), duration_hours=3),
             ]
-            mock_app_repository.get_available_laps_since.return_value = available_laps
+            mock_app_repository.get_recorded_laps_since.return_value = available_laps
 
             # When
             result = service.get_missing_laps(start_dt, end_dt)
 
             # Then
             assert result == []
-            mock_app_repository.get_available_laps_since.assert_called_once_with(since=start_dt)
+            mock_app_repository.get_recorded_laps_since.assert_called_once_with(station_id=7510, since=start_dt)
 
         def test_should_return_one_missing_dt(self, service, mock_app_repository):
             # Given
@@ -54,7 +63,7 @@ class TestLapsServiceImpl:
                 Laps(start_time=dt.datetime(2021, 1, 1, 18), duration_hours=3),
                 Laps(start_time=dt.datetime(2021, 1, 1, 21), duration_hours=3),
             ]
-            mock_app_repository.get_available_laps_since.return_value = available_laps
+            mock_app_repository.get_recorded_laps_since.return_value = available_laps
 
             # When
             result = service.get_missing_laps(start_dt, end_dt)
@@ -76,7 +85,7 @@ class TestLapsServiceImpl:
                 Laps(start_time=dt.datetime(2021, 1, 1, 18), duration_hours=3),
                 Laps(start_time=dt.datetime(2021, 1, 1, 21), duration_hours=3),
             ]
-            mock_app_repository.get_available_laps_since.return_value = available_laps
+            mock_app_repository.get_recorded_laps_since.return_value = available_laps
 
             # When
             result = service.get_missing_laps(start_dt, end_dt)
@@ -103,7 +112,7 @@ class TestLapsServiceImpl:
                 Laps(start_time=dt.datetime(2021, 1, 2, 15), duration_hours=3),
                 Laps(start_time=dt.datetime(2021, 1, 2, 18), duration_hours=3),
             ]
-            mock_app_repository.get_available_laps_since.return_value = available_laps
+            mock_app_repository.get_recorded_laps_since.return_value = available_laps
 
             # When
             result = service.get_missing_laps(start_dt, end_dt)
@@ -117,3 +126,257 @@ class TestLapsServiceImpl:
                 Laps(start_time=dt.datetime(2021, 1, 2, 12), duration_hours=3),
                 Laps(start_time=dt.datetime(2021, 1, 2, 21), duration_hours=3),
             ]
+
+        def test_should_plan_from_saved_collect_state_without_listing_storage(self, service, mock_app_repository):
+            # Given
+            mock_app_repository.load_collect_state.return_value = CollectState(
+                since=dt.datetime(2021, 1, 1, 0),
+                watermark=dt.datetime(2021, 1, 1, 15),
+                holes=[dt.datetime(2021, 1, 1, 6)],
+            )
+
+            # When
+            result = service.get_missing_laps(dt.datetime(2021, 1, 1, 0), dt.datetime(2021, 1, 1, 21))
+
+            # Then
+            mock_app_repository.get_recorded_laps_since.assert_not_called()
+            assert result == [
+                Laps(start_time=dt.datetime(2021, 1, 1, 6), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 1, 18), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 1, 21), duration_hours=3),
+            ]
+
+        def test_should_reconcile_when_window_starts_before_collect_state(self, service, mock_app_repository):
+            # Given
+            mock_app_repository.load_collect_state.return_value = CollectState(
+                since=dt.datetime(2021, 1, 2, 0), watermark=dt.datetime(2021, 1, 2, 21)
+            )
+            mock_app_repository.get_recorded_laps_since.return_value = [
+                Laps(start_time=dt.datetime(2021, 1, 1, 3), duration_hours=3),
+            ]
+
+            # When
+            result = service.get_missing_laps(dt.datetime(2021, 1, 1, 0), dt.datetime(2021, 1, 1, 6))
+
+            # Then
+            mock_app_repository.get_recorded_laps_since.assert_called_once_with(
+                station_id=7510, since=dt.datetime(2021, 1, 1, 0)
+            )
+            assert result == [
+                Laps(start_time=dt.datetime(2021, 1, 1, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 1, 6), duration_hours=3),
+            ]
+
+        def test_should_forget_holes_older_than_the_window(self, service, mock_app_repository):
+            # Given
+            mock_app_repository.load_collect_state.return_value = CollectState(
+                since=dt.datetime(2021, 1, 1, 0),
+                watermark=dt.datetime(2021, 1, 2, 21),
+                holes=[dt.datetime(2021, 1, 1, 6), dt.datetime(2021, 1, 2, 6)],
+            )
+
+            # When
+            service.get_missing_laps(dt.datetime(2021, 1, 2, 1), dt.datetime(2021, 1, 2, 21))
+
+            # Then
+            mock_app_repository.save_collect_state.assert_called_once_with(
+                state=CollectState(
+                    since=dt.datetime(2021, 1, 2, 0),
+                    watermark=dt.datetime(2021, 1, 2, 21),
+                    holes=[dt.datetime(2021, 1, 2, 6)],
+                ),
+                station_id=7510,
+            )
+
+        def test_should_skip_failed_laps_until_their_next_attempt(self, service, mock_app_repository):
+            # Given
+            mock_app_repository.load_collect_state.return_value = CollectState(
+                since=dt.datetime(2021, 1, 1, 0),
+                watermark=dt.datetime(2021, 1, 1, 6),
+                holes=[dt.datetime(2021, 1, 1, 0), dt.datetime(2021, 1, 1, 3)],
+                failures=[
+                    CollectFailure(
+                        start_time=dt.datetime(2021, 1, 1, 0),
+                        failure_class="WeatherCollectionError",
+                        attempts=1,
+                        next_attempt_time=dt.datetime(2021, 1, 2, 12),
+                    ),
+                    CollectFailure(
+                        start_time=dt.datetime(2021, 1, 1, 3),
+                        failure_class="WeatherCollectionError",
+                        attempts=2,
+                        next_attempt_time=dt.datetime(2021, 1, 2, 13),
+                    ),
+                ],
+            )
+
+            # When
+            result = service.get_missing_laps(dt.datetime(2021, 1, 1, 0), dt.datetime(2021, 1, 1, 6))
+
+            # Then
+            assert result == [Laps(start_time=dt.datetime(2021, 1, 1, 0), duration_hours=3)]
+
+        def test_should_skip_permanently_missing_laps(self, service, mock_app_repository):
+            # Given
+            mock_app_repository.load_collect_state.return_value = CollectState(
+                since=dt.datetime(2021, 1, 1, 0),
+                watermark=dt.datetime(2021, 1, 1, 6),
+                holes=[dt.datetime(2021, 1, 1, 0), dt.datetime(2021, 1, 1, 3)],
+                failures=[
+                    CollectFailure(
+                        start_time=dt.datetime(2021, 1, 1, 0),
+                        failure_class="WeatherDataNotFoundError",
+                        attempts=3,
+                        next_attempt_time=dt.datetime(2021, 1, 1, 12),
+                    ),
+                    CollectFailure(
+                        start_time=dt.datetime(2021, 1, 1, 3),
+                        failure_class="WeatherCollectionError",
+                        attempts=3,
+                        next_attempt_time=dt.datetime(2021, 1, 1, 12),
+                    ),
+                ],
+            )
+
+            # When
+            result = service.get_missing_laps(dt.datetime(2021, 1, 1, 0), dt.datetime(2021, 1, 1, 6))
+
+            # Then
+            assert result == [Laps(start_time=dt.datetime(2021, 1, 1, 3), duration_hours=3)]
+
+    class TestMarkFailed:
+        def test_should_save_failure_with_exponential_retry_delay(self, service, mock_app_repository):
+            # Given
+            mock_app_repository.load_collect_state.return_value = CollectState(
+                since=dt.datetime(2021, 1, 1, 0),
+                watermark=dt.datetime(2021, 1, 1, 3),
+                holes=[dt.datetime(2021, 1, 1, 0)],
+                failures=[
+                    CollectFailure(
+                        start_time=dt.datetime(2021, 1, 1, 0),
+                        failure_class="WeatherCollectionError",
+                        attempts=2,
+                        next_attempt_time=dt.datetime(2021, 1, 2, 0),
+                    )
+                ],
+            )
+
+            # When
+            service.mark_failed(
+                {Laps(start_time=dt.datetime(2021, 1, 1, 0), duration_hours=3): "WeatherDataNotFoundError"}
+            )
+
+            # Then
+            saved_state = mock_app_repository.save_collect_state.call_args.kwargs["state"]
+            assert saved_state.failures == [
+                CollectFailure(
+                    start_time=dt.datetime(2021, 1, 1, 0),
+                    failure_class="WeatherDataNotFoundError",
+                    attempts=3,
+                    next_attempt_time=dt.datetime(2021, 1, 2, 16),
+                )
+            ]
+
+        def test_should_not_count_missing_files_of_laps_still_in_publication_window(self, service, mock_app_repository):
+            # Given
+            mock_app_repository.load_collect_state.return_value = CollectState(
+                since=dt.datetime(2021, 1, 1, 0),
+                watermark=dt.datetime(2021, 1, 2, 0),
+                holes=[dt.datetime(2021, 1, 1, 0)],
+            )
+
+            # When
+            service.mark_failed(
+                {
+                    Laps(start_time=dt.datetime(2021, 1, 2, 6), duration_hours=3): "WeatherDataNotFoundError",
+                    Laps(start_time=dt.datetime(2021, 1, 2, 3), duration_hours=3): "WeatherCollectionError",
+                }
+            )
+
+            # Then
+            saved_state = mock_app_repository.save_collect_state.call_args.kwargs["state"]
+            assert saved_state.failures == [
+                CollectFailure(
+                    start_time=dt.datetime(2021, 1, 2, 3),
+                    failure_class="WeatherCollectionError",
+                    attempts=1,
+                    next_attempt_time=dt.datetime(2021, 1, 2, 13),
+                )
+            ]
+
+    class TestMarkCollected:
+        def test_should_save_updated_collect_state(self, service, mock_app_repository):
+            # Given
+            mock_app_repository.load_collect_state.return_value = CollectState(
+                since=dt.datetime(2021, 1, 1, 0), watermark=dt.datetime(2021, 1, 1, 3)
+            )
+
+            # When
+            service.mark_collected([Laps(start_time=dt.datetime(2021, 1, 1, 9), duration_hours=3)])
+
+            # Then
+            mock_app_repository.save_collect_state.assert_called_once_with(
+                state=CollectState(
+                    since=dt.datetime(2021, 1, 1, 0),
+                    watermark=dt.datetime(2021, 1, 1, 9),
+                    holes=[dt.datetime(2021, 1, 1, 6)],
+                ),
+                station_id=7510,
+            )
+
+        def test_should_do_nothing_when_no_collect_state(self, service, mock_app_repository):
+            # When
+            service.mark_collected([Laps(start_time=dt.datetime(2021, 1, 1, 9), duration_hours=3)])
+
+            # Then
+            mock_app_repository.save_collect_state.assert_not_called()
+
+    class TestReconcile:
+        def test_should_rebuild_collect_state_from_recorded_laps_of_station(self, service, mock_app_repository):
+            # Given
+            mock_app_repository.get_recorded_laps_since.return_value = [
+                Laps(start_time=dt.datetime(2021, 1, 1, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 1, 9), duration_hours=3),
+            ]
+
+            # When
+            result = service.reconcile(since=dt.datetime(2021, 1, 1, 0))
+
+            # Then
+            expected = CollectState(
+                since=dt.datetime(2021, 1, 1, 0),
+                watermark=dt.datetime(2021, 1, 1, 9),
+                holes=[dt.datetime(2021, 1, 1, 3), dt.datetime(2021, 1, 1, 6)],
+            )
+            assert result == expected
+            mock_app_repository.save_collect_state.assert_called_once_with(state=expected, station_id=7510)
+
+        def test_should_keep_failures_of_laps_still_missing(self, service, mock_app_repository):
+            # Given
+            failure = CollectFailure(
+                start_time=dt.datetime(2021, 1, 1, 3),
+                failure_class="WeatherDataNotFoundError",
+                attempts=1,
+                next_attempt_time=dt.datetime(2021, 1, 2, 0),
+            )
+            mock_app_repository.load_collect_state.return_value = CollectState(
+                since=dt.datetime(2021, 1, 1, 0),
+                failures=[
+                    failure,
+                    CollectFailure(
+                        start_time=dt.datetime(2021, 1, 1, 6),
+                        failure_class="WeatherDataNotFoundError",
+                        attempts=1,
+                        next_attempt_time=dt.datetime(2021, 1, 2, 0),
+                    ),
+                ],
+            )
+            mock_app_repository.get_recorded_laps_since.return_value = [
+                Laps(start_time=dt.datetime(2021, 1, 1, 6), duration_hours=3),
+            ]
+
+            # When
+            result = service.reconcile(since=dt.datetime(2021, 1, 1, 0))
+
+            # Then
+            assert result.failures == [failure]
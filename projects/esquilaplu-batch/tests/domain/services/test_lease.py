@@ -0,0 +1,166 @@
+import datetime as dt
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.domain.entities import Lease
+from src.domain.ports.outer import LeaseRepository
+from src.domain.services.lease import LeaseServiceImpl
+
+
+class InMemoryLeaseRepository(LeaseRepository):
+    def __init__(self) -> None:
+        self.leases: dict[str, Lease] = {}
+
+    def get_lease(self, name: str) -> Lease | None:
+        return self.leases.get(name)
+
+    def put_lease(self, lease: Lease) -> None:
+        self.leases[lease.name] = lease
+
+
+class TestLeaseServiceImpl:
+    @pytest.fixture
+    def lease_repository(self):
+        return InMemoryLeaseRepository()
+
+    @pytest.fixture
+    def service(self, lease_repository):
+        return LeaseServiceImpl(
+            lease_repository=lease_repository,
+            owner="worker-1",
+            namespace="backfill",
+            ttl=dt.timedelta(minutes=15),
+            clock=lambda: dt.datetime(2021, 1, 1, 12),
+            sleep=MagicMock(),
+        )
+
+    class TestAcquire:
+        def test_should_write_lease_when_unclaimed(self, service, lease_repository):
+            # When
+            result = service.acquire(name="2021-01")
+
+            # Then
+            expected = Lease(name="backfill/2021-01", owner="worker-1", expires_at=dt.datetime(2021, 1, 1, 12, 15))
+            assert result == expected
+            assert lease_repository.leases == {"backfill/2021-01": expected}
+
+        def test_should_return_none_when_claimed_by_another_worker(self, service, lease_repository):
+            # Given
+            lease_repository.put_lease(
+                Lease(name="backfill/2021-01", owner="worker-2", expires_at=dt.datetime(2021, 1, 1, 12, 5))
+            )
+
+            # When
+            result = service.acquire(name="2021-01")
+
+            # Then
+            assert result is None
+            assert lease_repository.leases["backfill/2021-01"].owner == "worker-2"
+
+        def test_should_take_over_expired_lease(self, service, lease_repository):
+            # Given
+            lease_repository.put_lease(
+                Lease(name="backfill/2021-01", owner="worker-2", expires_at=dt.datetime(2021, 1, 1, 11, 55))
+            )
+
+            # When
+            result = service.acquire(name="2021-01")
+
+            # Then
+            assert result.owner == "worker-1"
+            assert lease_repository.leases["backfill/2021-01"].owner == "worker-1"
+
+        def test_should_return_none_when_work_is_done(self, service, lease_repository):
+            # Given
+            lease_repository.put_lease(
+                Lease(name="backfill/2021-01", owner="worker-2", expires_at=dt.datetime(2021, 1, 1, 11), done=True)
+            )
+
+            # When
+            result = service.acquire(name="2021-01")
+
+            # Then
+            assert result is None
+
+        def test_should_return_none_when_a_concurrent_claim_wins(self, lease_repository):
+            # Given
+            concurrent_lease = Lease(
+                name="backfill/2021-01", owner="worker-2", expires_at=dt.datetime(2021, 1, 1, 12, 15)
+            )
+            service = LeaseServiceImpl(
+                lease_repository=lease_repository,
+                owner="worker-1",
+                namespace="backfill",
+                clock=lambda: dt.datetime(2021, 1, 1, 12),
+                sleep=lambda seconds: lease_repository.put_lease(concurrent_lease),
+            )
+
+            # When
+            result = service.acquire(name="2021-01")
+
+            # Then
+            assert result is None
+
+    class TestRenew:
+        def test_should_extend_lease_expiry(self, service, lease_repository):
+            # Given
+            lease = Lease(name="backfill/2021-01", owner="worker-1", expires_at=dt.datetime(2021, 1, 1, 12, 5))
+            lease_repository.put_lease(lease)
+
+            # When
+            result = service.renew(lease)
+
+            # Then
+            assert result.expires_at == dt.datetime(2021, 1, 1, 12, 15)
+            assert lease_repository.leases["backfill/2021-01"] == result
+
+        def test_should_return_none_when_lease_was_taken_over(self, service, lease_repository):
+            # Given
+            lease = Lease(name="backfill/2021-01", owner="worker-1", expires_at=dt.datetime(2021, 1, 1, 11))
+            lease_repository.put_lease(
+                Lease(name="backfill/2021-01", owner="worker-2", expires_at=dt.datetime(2021, 1, 1, 12, 10))
+            )
+
+            # When
+            result = service.renew(lease)
+
+            # Then
+            assert result is None
+            assert lease_repository.leases["backfill/2021-01"].owner == "worker-2"
+
+    class TestComplete:
+        def test_should_mark_lease_done(self, service, lease_repository):
+            # Given
+            lease = Lease(name="backfill/2021-01", owner="worker-1", expires_at=dt.datetime(2021, 1, 1, 12, 15))
+
+            # When
+            service.complete(lease)
+
+            # Then
+            assert lease_repository.leases["backfill/2021-01"].done is True
+
+    class TestIsDone:
+        def test_should_return_true_when_lease_is_done(self, service, lease_repository):
+            # Given
+            lease_repository.put_lease(
+                Lease(name="backfill/2021-01", owner="worker-2", expires_at=dt.datetime(2021, 1, 1, 12), done=True)
+            )
+
+            # When
+            result = service.is_done(name="2021-01")
+
+            # Then
+            assert result is True
+
+        def test_should_return_false_when_lease_is_held_or_missing(self, service, lease_repository):
+            # Given
+            lease_repository.put_lease(
+                Lease(name="backfill/2021-01", owner="worker-2", expires_at=dt.datetime(2021, 1, 1, 12, 5))
+            )
+
+            # When
+            result = service.is_done(name="2021-01"), service.is_done(name="2021-02")
+
+            # Then
+            assert result == (False, False)
@@ -0,0 +1,280 @@
+from unittest.mock import MagicMock, call
+
+import pytest
+
+from src.domain.entities import MaintenanceCheckpoint, MaintenanceReport
+from src.domain.ports.outer import ObjectStoreRepository
+from src.domain.services.maintenance import MaintenanceServiceImpl
+
+PATTERN = r"raw/meteofrance/(\d{4}-\d{2}-\d{2})-(\d)\.csv"
+REPLACEMENT = r"raw/meteofrance/\1-0\2.csv"
+
+
+class TestMaintenanceServiceImpl:
+    @pytest.fixture
+    def mock_object_store_repository(self):
+        mock = MagicMock(spec=ObjectStoreRepository)
+        mock.list_keys.return_value = iter(
+            [
+                ["raw/meteofrance/2021-01-01-00.csv", "raw/meteofrance/2021-01-01-3.csv"],
+                ["raw/meteofrance/2021-01-01-6.csv", "raw/meteofrance/README.md"],
+            ]
+        )
+        mock.get_checkpoint.return_value = None
+        mock.find_existing_keys.return_value = []
+        mock.copy_objects.return_value = []
+        mock.delete_objects.return_value = []
+        return mock
+
+    @pytest.fixture
+    def service(self, mock_object_store_repository):
+        return MaintenanceServiceImpl(object_store_repository=mock_object_store_repository)
+
+    class TestMaintainKeys:
+        def test_should_copy_then_delete_matched_keys_page_by_page(self, service, mock_object_store_repository):
+            # When
+            result = service.maintain_keys(
+                operation="rename", prefix="raw/meteofrance/", pattern=PATTERN, replacement=REPLACEMENT
+            )
+
+            # Then
+            mock_object_store_repository.copy_objects.assert_has_calls(
+                [
+                    call(moves=[("raw/meteofrance/2021-01-01-3.csv", "raw/meteofrance/2021-01-01-03.csv")]),
+                    call(moves=[("raw/meteofrance/2021-01-01-6.csv", "raw/meteofrance/2021-01-01-06.csv")]),
+                ]
+            )
+            mock_object_store_repository.delete_objects.assert_has_calls(
+                [call(keys=["raw/meteofrance/2021-01-01-3.csv"]), call(keys=["raw/meteofrance/2021-01-01-6.csv"])]
+            )
+            assert result == MaintenanceReport(listed=4, matched=2, copied=2, deleted=2)
+
+        def test_should_not_delete_keys_which_could_not_be_copied(self, service, mock_object_store_repository):
+            # Given
+            mock_object_store_repository.copy_objects.side_effect = [["raw/meteofrance/2021-01-01-3.csv"], []]
+
+            # When
+            result = service.maintain_keys(
+                operation="rename", prefix="raw/meteofrance/", pattern=PATTERN, replacement=REPLACEMENT
+            )
+
+            # Then
+            mock_object_store_repository.delete_objects.assert_called_once_with(
+                keys=["raw/meteofrance/2021-01-01-6.csv"]
+            )
+            assert result.failed == ["raw/meteofrance/2021-01-01-3.csv"]
+
+        def test_should_only_copy_keys(self, service, mock_object_store_repository):
+            # When
+            service.maintain_keys(operation="copy", prefix="raw/meteofrance/", pattern=PATTERN, replacement=REPLACEMENT)
+
+            # Then
+            assert mock_object_store_repository.copy_objects.call_count == 2
+            mock_object_store_repository.delete_objects.assert_not_called()
+
+        def test_should_delete_every_key_under_prefix_by_default(self, service, mock_object_store_repository):
+            # When
+            result = service.maintain_keys(operation="delete", prefix="raw/meteofrance/")
+
+            # Then
+            mock_object_store_repository.copy_objects.assert_not_called()
+            mock_object_store_repository.delete_objects.assert_has_calls(
+                [
+                    call(keys=["raw/meteofrance/2021-01-01-00.csv", "raw/meteofrance/2021-01-01-3.csv"]),
+                    call(keys=["raw/meteofrance/2021-01-01-6.csv", "raw/meteofrance/README.md"]),
+                ]
+            )
+            assert result.deleted == 4
+
+        def test_should_only_report_planned_actions_on_dry_run(self, service, mock_object_store_repository):
+            # When
+            result = service.maintain_keys(
+                operation="rename", prefix="raw/meteofrance/", pattern=PATTERN, replacement=REPLACEMENT, dry_run=True
+            )
+
+            # Then
+            mock_object_store_repository.copy_objects.assert_not_called()
+            mock_object_store_repository.delete_objects.assert_not_called()
+            mock_object_store_repository.put_checkpoint.assert_not_called()
+            assert result == MaintenanceReport(listed=4, matched=2, copied=2, deleted=2)
+
+        def test_should_resume_after_checkpoint_of_run(self, service, mock_object_store_repository):
+            # Given
+            mock_object_store_repository.get_checkpoint.return_value = MaintenanceCheckpoint(
+                last_key="raw/meteofrance/2021-01-01-3.csv"
+            )
+
+            # When
+            service.maintain_keys(
+                operation="rename", prefix="raw/meteofrance/", pattern=PATTERN, replacement=REPLACEMENT, run="pad"
+            )
+
+            # Then
+            mock_object_store_repository.get_checkpoint.assert_called_once_with(name="pad")
+            mock_object_store_repository.list_keys.assert_called_once_with(
+                prefix="raw/meteofrance/", start_after="raw/meteofrance/2021-01-01-3.csv"
+            )
+            mock_object_store_repository.put_checkpoint.assert_has_calls(
+                [
+                    call(name="pad", checkpoint=MaintenanceCheckpoint(last_key="raw/meteofrance/2021-01-01-3.csv")),
+                    call(name="pad", checkpoint=MaintenanceCheckpoint(last_key="raw/meteofrance/README.md")),
+                ]
+            )
+
+        def test_should_keep_failed_keys_in_checkpoint(self, service, mock_object_store_repository):
+            # Given
+            mock_object_store_repository.copy_objects.side_effect = [["raw/meteofrance/2021-01-01-3.csv"], []]
+
+            # When
+            service.maintain_keys(
+                operation="rename", prefix="raw/meteofrance/", pattern=PATTERN, replacement=REPLACEMENT, run="pad"
+            )
+
+            # Then
+            mock_object_store_repository.put_checkpoint.assert_called_with(
+                name="pad",
+                checkpoint=MaintenanceCheckpoint(
+                    last_key="raw/meteofrance/README.md", pending_keys=["raw/meteofrance/2021-01-01-3.csv"]
+                ),
+            )
+
+        def test_should_retry_pending_keys_of_checkpoint_first(self, service, mock_object_store_repository):
+            # Given
+            mock_object_store_repository.get_checkpoint.return_value = MaintenanceCheckpoint(
+                last_key="raw/meteofrance/2021-01-01-6.csv", pending_keys=["raw/meteofrance/2021-01-01-3.csv"]
+            )
+            mock_object_store_repository.list_keys.return_value = iter([["raw/meteofrance/2021-01-01-9.csv"]])
+
+            # When
+            result = service.maintain_keys(
+                operation="rename", prefix="raw/meteofrance/", pattern=PATTERN, replacement=REPLACEMENT, run="pad"
+            )
+
+            # Then
+            mock_object_store_repository.copy_objects.assert_has_calls(
+                [
+                    call(moves=[("raw/meteofrance/2021-01-01-3.csv", "raw/meteofrance/2021-01-01-03.csv")]),
+                    call(moves=[("raw/meteofrance/2021-01-01-9.csv", "raw/meteofrance/2021-01-01-09.csv")]),
+                ]
+            )
+            mock_object_store_repository.put_checkpoint.assert_called_with(
+                name="pad", checkpoint=MaintenanceCheckpoint(last_key="raw/meteofrance/2021-01-01-9.csv")
+            )
+            assert result.copied == 2
+
+        def test_should_keep_copied_keys_whose_delete_failed_as_pending_deletes(
+            self, service, mock_object_store_repository
+        ):
+            # Given
+            mock_object_store_repository.delete_objects.side_effect = [["raw/meteofrance/2021-01-01-3.csv"], []]
+
+            # When
+            service.maintain_keys(
+                operation="rename", prefix="raw/meteofrance/", pattern=PATTERN, replacement=REPLACEMENT, run="pad"
+            )
+
+            # Then
+            mock_object_store_repository.put_checkpoint.assert_called_with(
+                name="pad",
+                checkpoint=MaintenanceCheckpoint(
+                    last_key="raw/meteofrance/README.md", pending_deletes=["raw/meteofrance/2021-01-01-3.csv"]
+                ),
+            )
+
+        def test_should_only_delete_pending_deletes_of_checkpoint(self, service, mock_object_store_repository):
+            # Given
+            mock_object_store_repository.get_checkpoint.return_value = MaintenanceCheckpoint(
+                last_key="raw/meteofrance/2021-01-01-6.csv", pending_deletes=["raw/meteofrance/2021-01-01-3.csv"]
+            )
+            mock_object_store_repository.list_keys.return_value = iter([])
+
+            # When
+            result = service.maintain_keys(
+                operation="rename", prefix="raw/meteofrance/", pattern=PATTERN, replacement=REPLACEMENT, run="pad"
+            )
+
+            # Then
+            mock_object_store_repository.copy_objects.assert_not_called()
+            mock_object_store_repository.delete_objects.assert_called_once_with(
+                keys=["raw/meteofrance/2021-01-01-3.csv"]
+            )
+            mock_object_store_repository.put_checkpoint.assert_called_once_with(
+                name="pad", checkpoint=MaintenanceCheckpoint(last_key="raw/meteofrance/2021-01-01-6.csv")
+            )
+            assert result.deleted == 1
+            assert result.skipped == []
+
+        def test_should_skip_keys_whose_destination_exists(self, service, mock_object_store_repository):
+            # Given
+            mock_object_store_repository.find_existing_keys.side_effect = [["raw/meteofrance/2021-01-01-03.csv"], []]
+
+            # When
+            result = service.maintain_keys(
+                operation="rename", prefix="raw/meteofrance/", pattern=PATTERN, replacement=REPLACEMENT
+            )
+
+            # Then
+            mock_object_store_repository.find_existing_keys.assert_has_calls(
+                [call(keys=["raw/meteofrance/2021-01-01-03.csv"]), call(keys=["raw/meteofrance/2021-01-01-06.csv"])]
+            )
+            mock_object_store_repository.copy_objects.assert_has_calls(
+                [
+                    call(moves=[]),
+                    call(moves=[("raw/meteofrance/2021-01-01-6.csv", "raw/meteofrance/2021-01-01-06.csv")]),
+                ]
+            )
+            mock_object_store_repository.delete_objects.assert_called_once_with(
+                keys=["raw/meteofrance/2021-01-01-6.csv"]
+            )
+            assert result == MaintenanceReport(
+                listed=4, matched=1, copied=1, deleted=1, skipped=["raw/meteofrance/2021-01-01-3.csv"]
+            )
+
+        def test_should_skip_keys_sharing_a_destination(self, service, mock_object_store_repository):
+            # Given
+            mock_object_store_repository.list_keys.return_value = iter(
+                [["raw/meteofrance/2021-01-01-03.csv"], ["raw/meteofrance/2021-01-01-3.csv"]]
+            )
+
+            # When
+            result = service.maintain_keys(
+                operation="copy",
+                prefix="raw/meteofrance/",
+                pattern=r"raw/meteofrance/(\d{4}-\d{2}-\d{2})-0?(\d)\.csv",
+                replacement=r"backup/\1-\2.csv",
+            )
+
+            # Then
+            mock_object_store_repository.copy_objects.assert_has_calls(
+                [call(moves=[("raw/meteofrance/2021-01-01-03.csv", "backup/2021-01-01-3.csv")]), call(moves=[])]
+            )
+            assert result.skipped == ["raw/meteofrance/2021-01-01-3.csv"]
+
+        def test_should_copy_over_existing_destinations_when_overwriting(self, service, mock_object_store_repository):
+            # Given
+            mock_object_store_repository.find_existing_keys.return_value = ["raw/meteofrance/2021-01-01-03.csv"]
+
+            # When
+            result = service.maintain_keys(
+                operation="rename",
+                prefix="raw/meteofrance/",
+                pattern=PATTERN,
+                replacement=REPLACEMENT,
+                overwrite=True,
+            )
+
+            # Then
+            mock_object_store_repository.find_existing_keys.assert_not_called()
+            assert result == MaintenanceReport(listed=4, matched=2, copied=2, deleted=2)
+
+        def test_should_refuse_destinations_matching_the_pattern(self, service):
+            # When / Then
+            with pytest.raises(ValueError):
+                service.maintain_keys(
+                    operation="copy", prefix="raw/", pattern=r"raw/(.*)", replacement=r"raw/backup/\1"
+                )
+
+        def test_should_require_a_replacement_to_rename(self, service):
+            # When / Then
+            with pytest.raises(ValueError):
+                service.maintain_keys(operation="rename", prefix="raw/meteofrance/", pattern=PATTERN)
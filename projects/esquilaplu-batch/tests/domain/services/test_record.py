@@ -1,10 +1,11 @@
+import contextlib
 import datetime as dt
 from unittest.mock import MagicMock, call
 
 import pytest
 
 from src.domain.entities import Record
-from src.domain.exceptions import WeatherCollectionError
+from src.domain.exceptions import WeatherCollectionError, WeatherDataNotFoundError
 from src.domain.ports.inner import LapService
 from src.domain.ports.outer import AppRepository, WeatherDataRepository
 from src.domain.services.record import RecordServiceImpl
@@ -31,6 +32,7 @@ class TestRecordServiceImpl:
         service = RecordServiceImpl(
             weather_repository=mock_weather_repository,
             app_repository=mock_app_repository,
+            station_id=7510,
             now=fake_now,
             laps_service=mock_lap_service,
             max_collect_history_hr=14 * 24,
@@ -98,7 +100,8 @@ class TestRecordServiceImpl:
                     Record(laps=Laps(start_time=dt.datetime(2021, 1, 16, 10, 0, 0), duration_hours=3), rainfall_mm=0.1),
                     Record(laps=Laps(start_time=dt.datetime(2021, 1, 16, 13, 0, 0), duration_hours=3), rainfall_mm=0.2),
                     Record(laps=Laps(start_time=dt.datetime(2021, 1, 16, 16, 0, 0), duration_hours=3), rainfall_mm=0.3),
-                ]
+                ],
+                station_id=7510,
             )
 
         def test_should_stop_after_max_collect_iterations(self, mock_lap_service, mock_weather_repository, service):
@@ -150,5 +153,237 @@ class TestRecordServiceImpl:
                 records=[
                     Record(laps=Laps(start_time=dt.datetime(2021, 1, 16, 10, 0, 0), duration_hours=3), rainfall_mm=0.1),
                     Record(laps=Laps(start_time=dt.datetime(2021, 1, 16, 16, 0, 0), duration_hours=3), rainfall_mm=0.3),
-                ]
+                ],
+                station_id=7510,
+            )
+
+        def test_should_update_rollups_of_collected_laps(
+            self, mock_lap_service, mock_weather_repository, service, mock_app_repository
+        ):
+            # Given
+            mock_lap_service.get_missing_laps.return_value = [
+                Laps(start_time=dt.datetime(2021, 1, 16, 10, 0, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 16, 13, 0, 0), duration_hours=3),
+            ]
+            mock_weather_repository.collect_record.side_effect = [
+                WeatherCollectionError(),
+                Record(laps=Laps(start_time=dt.datetime(2021, 1, 16, 13, 0, 0), duration_hours=3), rainfall_mm=0.2),
+            ]
+
+            # When
+            service.update_records()
+
+            # Then
+            mock_app_repository.update_rollups.assert_called_once_with(
+                laps=[Laps(start_time=dt.datetime(2021, 1, 16, 13, 0, 0), duration_hours=3)]
+            )
+
+        def test_should_mark_collected_laps_in_collect_state(self, mock_lap_service, mock_weather_repository, service):
+            # Given
+            mock_lap_service.get_missing_laps.return_value = [
+                Laps(start_time=dt.datetime(2021, 1, 16, 10, 0, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 16, 13, 0, 0), duration_hours=3),
+            ]
+            mock_weather_repository.collect_record.side_effect = [
+                WeatherCollectionError(),
+                Record(laps=Laps(start_time=dt.datetime(2021, 1, 16, 13, 0, 0), duration_hours=3), rainfall_mm=0.2),
+            ]
+
+            # When
+            service.update_records()
+
+            # Then
+            mock_lap_service.mark_collected.assert_called_once_with(
+                laps=[Laps(start_time=dt.datetime(2021, 1, 16, 13, 0, 0), duration_hours=3)]
+            )
+
+        def test_should_use_given_now_instead_of_construction_time(self, mock_lap_service, service):
+            # Given
+            mock_lap_service.get_missing_laps.return_value = []
+
+            # When
+            service.update_records(now=dt.datetime(2021, 2, 15, 10, 0, 0))
+
+            # Then
+            mock_lap_service.get_missing_laps.assert_called_once_with(
+                start_time=dt.datetime(2021, 2, 1, 10, 0, 0), end_time=dt.datetime(2021, 2, 15, 5, 0, 0)
+            )
+
+    class TestUpdateRecordsWithBudget:
+        @pytest.fixture
+        def clock(self):
+            # every collect takes 20 minutes
+            return MagicMock(return_value=dt.datetime(2021, 1, 30, 10, 0, 0))
+
+        @pytest.fixture
+        def service(self, mock_app_repository, mock_weather_repository, mock_lap_service, clock):
+            def collect_record(laps):
+                clock.return_value += dt.timedelta(minutes=20)
+                return Record(laps=laps, rainfall_mm=0.1)
+
+            mock_weather_repository.collect_record.side_effect = collect_record
+            mock_lap_service.get_missing_laps.return_value = [
+                Laps(start_time=dt.datetime(2021, 1, 16, 10, 0, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 20, 13, 0, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 29, 6, 0, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 29, 9, 0, 0), duration_hours=3),
+            ]
+            return RecordServiceImpl(
+                weather_repository=mock_weather_repository,
+                app_repository=mock_app_repository,
+                station_id=7510,
+                now=fake_now,
+                laps_service=mock_lap_service,
+                max_collect_history_hr=14 * 24,
+                min_collect_history_hr=5,
+                collect_budget=dt.timedelta(hours=2),
+                clock=clock,
+            )
+
+        def test_should_collect_most_recent_laps_first_then_oldest_gaps(self, mock_weather_repository, service):
+            # When
+            service.update_records()
+
+            # Then
+            assert mock_weather_repository.collect_record.call_args_list == [
+                call(laps=Laps(start_time=dt.datetime(2021, 1, 29, 9, 0, 0), duration_hours=3)),
+                call(laps=Laps(start_time=dt.datetime(2021, 1, 29, 6, 0, 0), duration_hours=3)),
+                call(laps=Laps(start_time=dt.datetime(2021, 1, 16, 10, 0, 0), duration_hours=3)),
+                call(laps=Laps(start_time=dt.datetime(2021, 1, 20, 13, 0, 0), duration_hours=3)),
+            ]
+
+        def test_should_defer_laps_which_would_not_be_persisted_before_the_deadline(
+            self, mock_weather_repository, mock_app_repository, service, clock
+        ):
+            # Given
+            def save_many_records(records, station_id):
+                clock.return_value += dt.timedelta(minutes=5)
+
+            mock_app_repository.save_many_records.side_effect = save_many_records
+            service._collect_budget = dt.timedelta(hours=1)
+
+            # When
+            _, result = service.update_records()
+
+            # Then
+            assert result == [
+                Laps(start_time=dt.datetime(2021, 1, 16, 10, 0, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 20, 13, 0, 0), duration_hours=3),
+            ]
+            assert mock_app_repository.save_many_records.call_args_list == [
+                call(
+                    records=[
+                        Record(
+                            laps=Laps(start_time=dt.datetime(2021, 1, 29, 9, 0, 0), duration_hours=3), rainfall_mm=0.1
+                        )
+                    ],
+                    station_id=7510,
+                ),
+                call(
+                    records=[
+                        Record(
+                            laps=Laps(start_time=dt.datetime(2021, 1, 29, 6, 0, 0), duration_hours=3), rainfall_mm=0.1
+                        )
+                    ],
+                    station_id=7510,
+                ),
+            ]
+            assert clock.return_value <= dt.datetime(2021, 1, 30, 11, 0, 0)
+
+        def test_should_count_the_planning_in_the_budget(
+            self, mock_weather_repository, mock_lap_service, service, clock
+        ):
+            # Given
+            def get_missing_laps(start_time, end_time):
+                clock.return_value += dt.timedelta(hours=3)
+                return [Laps(start_time=dt.datetime(2021, 1, 29, 9, 0, 0), duration_hours=3)]
+
+            mock_lap_service.get_missing_laps.side_effect = get_missing_laps
+
+            # When
+            _, result = service.update_records()
+
+            # Then
+            assert result == [Laps(start_time=dt.datetime(2021, 1, 29, 9, 0, 0), duration_hours=3)]
+            mock_weather_repository.collect_record.assert_not_called()
+
+    class TestCollectLaps:
+        def test_should_mark_failed_laps_with_their_failure_class(
+            self, mock_lap_service, mock_weather_repository, service
+        ):
+            # Given
+            laps = [
+                Laps(start_time=dt.datetime(2021, 1, 16, 10, 0, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 16, 13, 0, 0), duration_hours=3),
+            ]
+            mock_weather_repository.collect_record.side_effect = [WeatherDataNotFoundError(), WeatherCollectionError()]
+
+            # When
+            service.collect_laps(laps=laps)
+
+            # Then
+            mock_lap_service.mark_failed.assert_called_once_with(
+                failures={
+                    Laps(start_time=dt.datetime(2021, 1, 16, 10, 0, 0), duration_hours=3): "WeatherDataNotFoundError",
+                    Laps(start_time=dt.datetime(2021, 1, 16, 13, 0, 0), duration_hours=3): "WeatherCollectionError",
+                }
+            )
+
+        def test_should_return_laps_that_could_not_be_collected(
+            self, mock_weather_repository, service, mock_app_repository
+        ):
+            # Given
+            laps = [
+                Laps(start_time=dt.datetime(2021, 1, 16, 10, 0, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 16, 13, 0, 0), duration_hours=3),
+            ]
+            mock_weather_repository.collect_record.side_effect = [
+                WeatherCollectionError(),
+                Record(laps=Laps(start_time=dt.datetime(2021, 1, 16, 13, 0, 0), duration_hours=3), rainfall_mm=0.2),
+            ]
+
+            # When
+            result = service.collect_laps(laps=laps)
+
+            # Then
+            assert result == [Laps(start_time=dt.datetime(2021, 1, 16, 10, 0, 0), duration_hours=3)]
+            mock_app_repository.save_many_records.assert_called_once_with(
+                records=[
+                    Record(laps=Laps(start_time=dt.datetime(2021, 1, 16, 13, 0, 0), duration_hours=3), rainfall_mm=0.2)
+                ],
+                station_id=7510,
             )
+
+        def test_should_enter_laps_scope_around_each_collect(self, mock_weather_repository, mock_app_repository):
+            # Given
+            scoped_laps = []
+
+            @contextlib.contextmanager
+            def laps_scope(laps):
+                scoped_laps.append(laps)
+                yield
+
+            service = RecordServiceImpl(
+                weather_repository=mock_weather_repository,
+                app_repository=mock_app_repository,
+                station_id=7510,
+                now=fake_now,
+                laps_service=MagicMock(spec=LapService),
+                max_collect_history_hr=14 * 24,
+                min_collect_history_hr=5,
+                laps_scope=laps_scope,
+            )
+            laps = [
+                Laps(start_time=dt.datetime(2021, 1, 16, 10, 0, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 16, 13, 0, 0), duration_hours=3),
+            ]
+            mock_weather_repository.collect_record.side_effect = [
+                Record(laps=laps[0], rainfall_mm=0.1),
+                WeatherCollectionError(),
+            ]
+
+            # When
+            service.collect_laps(laps=laps)
+
+            # Then
+            assert scoped_laps == laps
@@ -0,0 +1,56 @@
+import datetime as dt
+from unittest.mock import MagicMock, call
+
+import pytest
+
+from src.domain.ports.outer import AppRepository
+from src.domain.services.replica import ReplicaServiceImpl
+from src.domain.value_objects import Laps
+
+
+class TestReplicaServiceImpl:
+    @pytest.fixture
+    def mock_source_repository(self):
+        return MagicMock(spec=AppRepository)
+
+    @pytest.fixture
+    def mock_replica_repository(self):
+        return MagicMock(spec=AppRepository)
+
+    @pytest.fixture
+    def service(self, mock_source_repository, mock_replica_repository):
+        return ReplicaServiceImpl(source_repository=mock_source_repository, replica_repository=mock_replica_repository)
+
+    class TestSync:
+        def test_should_copy_only_laps_missing_from_replica(
+            self, service, mock_source_repository, mock_replica_repository
+        ):
+            # Given
+            since = dt.datetime(2021, 1, 1)
+            mock_source_repository.get_available_laps_since.return_value = [
+                Laps(start_time=dt.datetime(2021, 1, 1, 6), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 1, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 1, 3), duration_hours=3),
+            ]
+            mock_replica_repository.get_available_laps_since.return_value = [
+                Laps(start_time=dt.datetime(2021, 1, 1, 3), duration_hours=3),
+            ]
+            mock_source_repository.load_raw_dataset.side_effect = ["dataset-00", "dataset-06"]
+
+            # When
+            service.sync(since=since)
+
+            # Then
+            mock_replica_repository.get_available_laps_since.assert_called_once_with(since=since)
+            mock_replica_repository.save_raw_dataset.assert_has_calls(
+                [
+                    call(dataset="dataset-00", laps=Laps(start_time=dt.datetime(2021, 1, 1, 0), duration_hours=3)),
+                    call(dataset="dataset-06", laps=Laps(start_time=dt.datetime(2021, 1, 1, 6), duration_hours=3)),
+                ]
+            )
+            mock_replica_repository.update_rollups.assert_called_once_with(
+                laps=[
+                    Laps(start_time=dt.datetime(2021, 1, 1, 0), duration_hours=3),
+                    Laps(start_time=dt.datetime(2021, 1, 1, 6), duration_hours=3),
+                ]
+            )
@@ -0,0 +1,202 @@
+import datetime as dt
+from unittest.mock import MagicMock, call
+
+import pandas as pd
+import pytest
+
+from src.domain.entities import Lease, Record
+from src.domain.exceptions import WeatherRecordError
+from src.domain.ports.inner import LeaseService
+from src.domain.ports.outer import AppRepository, WeatherDataRepository
+from src.domain.services.reprocess import ReprocessServiceImpl
+from src.domain.value_objects import Laps
+from src.infrastructure.repositories.app_sqlite import AppSQLiteRepository
+
+
+def a_record(laps: Laps) -> Record:
+    return Record(laps=laps, rainfall_mm=0.5)
+
+
+class TestReprocessServiceImpl:
+    @pytest.fixture
+    def mock_app_repository(self):
+        mock = MagicMock(spec=AppRepository)
+        mock.get_available_laps_since.return_value = [
+            Laps(start_time=dt.datetime(2021, 2, 1, 0), duration_hours=3),
+            Laps(start_time=dt.datetime(2021, 1, 31, 21), duration_hours=3),
+            Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3),
+        ]
+        mock.load_raw_datasets.side_effect = lambda laps: [f"dataset-{laps_.start_time}" for laps_ in laps]
+        return mock
+
+    @pytest.fixture
+    def mock_weather_repository(self):
+        mock = MagicMock(spec=WeatherDataRepository)
+        mock.extract_record.side_effect = lambda dataset, laps: a_record(laps)
+        return mock
+
+    @pytest.fixture
+    def service(self, mock_app_repository, mock_weather_repository):
+        return ReprocessServiceImpl(
+            app_repository=mock_app_repository, weather_repository=mock_weather_repository, station_id=7510
+        )
+
+    class TestReprocess:
+        def test_should_rebuild_records_month_by_month_from_raw_datasets(
+            self, service, mock_app_repository, mock_weather_repository
+        ):
+            # When
+            service.reprocess(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 3, 1))
+
+            # Then
+            mock_app_repository.load_raw_datasets.assert_has_calls(
+                [
+                    call(
+                        laps=[
+                            Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3),
+                            Laps(start_time=dt.datetime(2021, 1, 31, 21), duration_hours=3),
+                        ]
+                    ),
+                    call(laps=[Laps(start_time=dt.datetime(2021, 2, 1, 0), duration_hours=3)]),
+                ]
+            )
+            mock_weather_repository.extract_record.assert_any_call(
+                dataset="dataset-2021-01-31 18:00:00",
+                laps=Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3),
+            )
+            mock_app_repository.save_many_records.assert_has_calls(
+                [
+                    call(
+                        records=[
+                            a_record(Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3)),
+                            a_record(Laps(start_time=dt.datetime(2021, 1, 31, 21), duration_hours=3)),
+                        ],
+                        station_id=7510,
+                    ),
+                    call(
+                        records=[a_record(Laps(start_time=dt.datetime(2021, 2, 1, 0), duration_hours=3))],
+                        station_id=7510,
+                    ),
+                ]
+            )
+
+        def test_should_skip_datasets_without_station_record(
+            self, service, mock_app_repository, mock_weather_repository
+        ):
+            # Given
+            def extract_record(dataset, laps):
+                if laps.start_time.hour == 21:
+                    raise WeatherRecordError("No data for station 7510")
+                return a_record(laps)
+
+            mock_weather_repository.extract_record.side_effect = extract_record
+
+            # When
+            service.reprocess(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 1, 31, 23))
+
+            # Then
+            mock_app_repository.save_many_records.assert_called_once_with(
+                records=[a_record(Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3))], station_id=7510
+            )
+
+        def test_should_ignore_laps_after_end_time(self, service, mock_app_repository):
+            # When
+            service.reprocess(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 1, 31, 19))
+
+            # Then
+            mock_app_repository.load_raw_datasets.assert_called_once_with(
+                laps=[Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3)]
+            )
+
+        def test_should_throttle_raw_dataset_loads(self, mock_app_repository, mock_weather_repository):
+            # Given
+            sleep = MagicMock()
+            service = ReprocessServiceImpl(
+                app_repository=mock_app_repository,
+                weather_repository=mock_weather_repository,
+                station_id=7510,
+                max_laps_per_second=0.5,
+                clock=lambda: 100.0,
+                sleep=sleep,
+            )
+
+            # When
+            service.reprocess(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 3, 1))
+
+            # Then
+            sleep.assert_called_once_with(4.0)
+
+    class TestReprocessWithLeases:
+        @pytest.fixture
+        def mock_lease_service(self):
+            mock = MagicMock(spec=LeaseService)
+            mock.acquire.side_effect = lambda name: Lease(name=name, owner="me", expires_at=dt.datetime(2021, 3, 1))
+            mock.renew.side_effect = lambda lease: lease
+            return mock
+
+        @pytest.fixture
+        def service(self, mock_app_repository, mock_weather_repository, mock_lease_service):
+            return ReprocessServiceImpl(
+                app_repository=mock_app_repository,
+                weather_repository=mock_weather_repository,
+                station_id=7510,
+                lease_service=mock_lease_service,
+            )
+
+        def test_should_resume_with_months_not_done_yet(self, service, mock_app_repository, mock_lease_service):
+            # Given
+            mock_lease_service.acquire.side_effect = [
+                None,
+                Lease(name="2021-02", owner="me", expires_at=dt.datetime(2021, 3, 1)),
+            ]
+
+            # When
+            service.reprocess(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 3, 1))
+
+            # Then
+            mock_lease_service.acquire.assert_has_calls([call(name="2021-01"), call(name="2021-02")])
+            mock_app_repository.load_raw_datasets.assert_called_once_with(
+                laps=[Laps(start_time=dt.datetime(2021, 2, 1, 0), duration_hours=3)]
+            )
+            mock_lease_service.complete.assert_called_once_with(
+                lease=Lease(name="2021-02", owner="me", expires_at=dt.datetime(2021, 3, 1))
+            )
+
+        def test_should_not_save_month_whose_lease_is_lost(self, service, mock_app_repository, mock_lease_service):
+            # Given
+            mock_lease_service.renew.side_effect = None
+            mock_lease_service.renew.return_value = None
+
+            # When
+            service.reprocess(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 3, 1))
+
+            # Then
+            mock_app_repository.save_many_records.assert_not_called()
+            mock_lease_service.complete.assert_not_called()
+
+    class TestReprocessWithSQLiteRepository:
+        @pytest.fixture
+        def sqlite_repository(self):
+            repository = AppSQLiteRepository(path=":memory:")
+            for start_time in [dt.datetime(2021, 1, 31, 21), dt.datetime(2021, 2, 1, 0)]:
+                end_time = start_time + dt.timedelta(hours=3)
+                repository.save_raw_dataset(
+                    pd.DataFrame({"date": [end_time], "numer_sta": [7510], "rr3": [0.5]}),
+                    Laps(start_time=start_time, duration_hours=3),
+                )
+            return repository
+
+        def test_should_load_months_from_the_loader_thread(self, sqlite_repository, mock_weather_repository):
+            # Given
+            service = ReprocessServiceImpl(
+                app_repository=sqlite_repository, weather_repository=mock_weather_repository, station_id=7510
+            )
+
+            # When
+            service.reprocess(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 3, 1))
+
+            # Then
+            assert sqlite_repository.get_recorded_laps_since(station_id=7510, since=dt.datetime(2021, 1, 1)) == [
+                Laps(start_time=dt.datetime(2021, 1, 31, 21), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 2, 1, 0), duration_hours=3),
+            ]
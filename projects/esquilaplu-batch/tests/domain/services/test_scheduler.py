@@ -0,0 +1,105 @@
+import datetime as dt
+from unittest.mock import MagicMock, call
+
+import pytest
+
+from src.domain.ports.inner import RecordService
+from src.domain.services.scheduler import SchedulerServiceImpl
+from src.domain.value_objects import Laps
+
+
+class FakeClock:
+    def __init__(self, now: dt.datetime) -> None:
+        self.now = now
+
+    def __call__(self) -> dt.datetime:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += dt.timedelta(seconds=seconds)
+
+
+class TestSchedulerServiceImpl:
+    @pytest.fixture
+    def mock_record_service(self):
+        mock = MagicMock(spec=RecordService)
+        mock.update_records.return_value = ([], [])
+        mock.collect_laps.return_value = []
+        return mock
+
+    @pytest.fixture
+    def clock(self):
+        return FakeClock(dt.datetime(2021, 1, 30, 10, 30))
+
+    @pytest.fixture
+    def service(self, mock_record_service, clock):
+        return SchedulerServiceImpl(
+            record_service=mock_record_service,
+            publication_delay=dt.timedelta(hours=2),
+            retry_delays=[dt.timedelta(minutes=10), dt.timedelta(minutes=20)],
+            full_scan_interval=dt.timedelta(days=1),
+            clock=clock,
+            sleep=clock.sleep,
+        )
+
+    class TestRun:
+        def test_should_start_with_a_full_scan(self, service, mock_record_service, clock):
+            # When
+            service.run(max_cycles=1)
+
+            # Then
+            mock_record_service.update_records.assert_called_once_with(now=dt.datetime(2021, 1, 30, 10, 30))
+            mock_record_service.collect_laps.assert_not_called()
+
+        def test_should_wake_up_after_next_publication_and_collect_only_the_due_laps(
+            self, service, mock_record_service, clock
+        ):
+            # When
+            service.run(max_cycles=3)
+
+            # Then
+            assert mock_record_service.update_records.call_count == 1
+            mock_record_service.collect_laps.assert_has_calls(
+                [
+                    call(laps=[Laps(start_time=dt.datetime(2021, 1, 30, 6), duration_hours=3)]),
+                    call(laps=[Laps(start_time=dt.datetime(2021, 1, 30, 9), duration_hours=3)]),
+                ]
+            )
+            assert clock.now == dt.datetime(2021, 1, 30, 17)
+
+        def test_should_retry_late_files_then_give_up_until_next_full_scan(self, service, mock_record_service, clock):
+            # Given
+            mock_record_service.collect_laps.side_effect = lambda laps: laps
+
+            # When
+            service.run(max_cycles=5)
+
+            # Then
+            late_laps = [Laps(start_time=dt.datetime(2021, 1, 30, 6), duration_hours=3)]
+            next_laps = [Laps(start_time=dt.datetime(2021, 1, 30, 9), duration_hours=3)]
+            assert mock_record_service.collect_laps.call_args_list == [call(laps=late_laps)] * 3 + [
+                call(laps=next_laps)
+            ]
+            assert clock.now == dt.datetime(2021, 1, 30, 14, 10)
+
+        def test_should_retry_due_laps_failed_by_the_full_scan(self, service, mock_record_service, clock):
+            # Given
+            late_laps = Laps(start_time=dt.datetime(2021, 1, 30, 3), duration_hours=3)
+            mock_record_service.update_records.return_value = ([late_laps], [])
+
+            # When
+            service.run(max_cycles=2)
+
+            # Then
+            assert mock_record_service.collect_laps.call_args_list == [call(laps=[late_laps])]
+            assert clock.now == dt.datetime(2021, 1, 30, 11)
+
+        def test_should_run_a_full_scan_periodically(self, service, mock_record_service, clock):
+            # When
+            service.run(max_cycles=10)
+
+            # Then
+            assert mock_record_service.update_records.call_args_list == [
+                call(now=dt.datetime(2021, 1, 30, 10, 30)),
+                call(now=dt.datetime(2021, 1, 31, 10, 30)),
+            ]
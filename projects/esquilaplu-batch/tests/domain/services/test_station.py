@@ -0,0 +1,272 @@
+import datetime as dt
+from unittest.mock import MagicMock, call
+
+import pytest
+
+from src.domain.entities import Lease
+from src.domain.ports.inner import LeaseService
+from src.domain.ports.outer import AppRepository
+from src.domain.services.station import StationServiceImpl
+from src.domain.value_objects import Laps
+
+
+class TestStationServiceImpl:
+    @pytest.fixture
+    def mock_app_repository(self):
+        return MagicMock(spec=AppRepository)
+
+    @pytest.fixture
+    def service(self, mock_app_repository):
+        return StationServiceImpl(app_repository=mock_app_repository)
+
+    class TestBackfillStations:
+        def test_should_merge_raw_datasets_month_by_month(self, service, mock_app_repository):
+            # Given
+            mock_app_repository.get_available_laps_since.return_value = [
+                Laps(start_time=dt.datetime(2021, 2, 1, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 31, 21), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3),
+            ]
+            mock_app_repository.load_raw_datasets.side_effect = [["jan-18"], ["jan-21", "feb-00"]]
+
+            # When
+            service.backfill_stations(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 3, 1))
+
+            # Then
+            mock_app_repository.get_available_laps_since.assert_called_once_with(since=dt.datetime(2021, 1, 1))
+            mock_app_repository.save_station_datasets.assert_has_calls(
+                [
+                    call(datasets=["jan-18"]),
+                    call(datasets=["jan-21", "feb-00"]),
+                ]
+            )
+
+        def test_should_group_last_laps_of_month_with_next_month(self, service, mock_app_repository):
+            # Given
+            mock_app_repository.get_available_laps_since.return_value = [
+                Laps(start_time=dt.datetime(2021, 1, 31, 21), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3),
+            ]
+
+            # When
+            service.backfill_stations(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 3, 1))
+
+            # Then
+            assert mock_app_repository.load_raw_datasets.call_args_list == [
+                call(laps=[Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3)]),
+                call(laps=[Laps(start_time=dt.datetime(2021, 1, 31, 21), duration_hours=3)]),
+            ]
+
+        def test_should_update_rollups_month_by_month_once_partitions_are_saved(self, service, mock_app_repository):
+            # Given
+            mock_app_repository.get_available_laps_since.return_value = [
+                Laps(start_time=dt.datetime(2021, 2, 1, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 31, 21), duration_hours=3),
+            ]
+            calls = MagicMock()
+            mock_app_repository.save_station_datasets.side_effect = lambda datasets: calls.save_station_datasets()
+            mock_app_repository.update_rollups.side_effect = lambda laps: calls.update_rollups()
+
+            # When
+            service.backfill_stations(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 3, 1))
+
+            # Then
+            mock_app_repository.update_rollups.assert_has_calls(
+                [
+                    call(laps=[Laps(start_time=dt.datetime(2021, 1, 31, 21), duration_hours=3)]),
+                    call(laps=[Laps(start_time=dt.datetime(2021, 2, 1, 0), duration_hours=3)]),
+                ]
+            )
+            assert calls.mock_calls == [call.save_station_datasets(), call.update_rollups(), call.update_rollups()]
+
+        def test_should_ignore_laps_after_end_time(self, service, mock_app_repository):
+            # Given
+            mock_app_repository.get_available_laps_since.return_value = [
+                Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 2, 1, 0), duration_hours=3),
+            ]
+
+            # When
+            service.backfill_stations(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 1, 31, 23))
+
+            # Then
+            mock_app_repository.load_raw_datasets.assert_called_once_with(
+                laps=[Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3)]
+            )
+
+    class TestBackfillStationsWithLeases:
+        @pytest.fixture
+        def mock_lease_service(self):
+            mock = MagicMock(spec=LeaseService)
+            mock.acquire.side_effect = lambda name: Lease(name=name, owner="me", expires_at=dt.datetime(2021, 3, 1))
+            mock.renew.side_effect = lambda lease: lease
+            mock.is_done.return_value = True
+            return mock
+
+        @pytest.fixture
+        def sleep(self):
+            return MagicMock()
+
+        @pytest.fixture
+        def service(self, mock_app_repository, mock_lease_service, sleep):
+            return StationServiceImpl(
+                app_repository=mock_app_repository,
+                lease_service=mock_lease_service,
+                poll_interval=dt.timedelta(minutes=1),
+                sleep=sleep,
+            )
+
+        @pytest.fixture(autouse=True)
+        def available_laps(self, mock_app_repository):
+            mock_app_repository.get_available_laps_since.return_value = [
+                Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 2, 1, 0), duration_hours=3),
+            ]
+
+        def test_should_merge_only_months_whose_lease_is_acquired(
+            self, service, mock_app_repository, mock_lease_service
+        ):
+            # Given
+            mock_lease_service.acquire.side_effect = lambda name: (
+                None if name == "2021-01" else Lease(name=name, owner="me", expires_at=dt.datetime(2021, 3, 1))
+            )
+
+            # When
+            service.backfill_stations(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 3, 1))
+
+            # Then
+            mock_lease_service.acquire.assert_has_calls([call(name="2021-01"), call(name="2021-02")])
+            mock_app_repository.load_raw_datasets.assert_called_once_with(
+                laps=[Laps(start_time=dt.datetime(2021, 2, 1, 0), duration_hours=3)]
+            )
+
+        def test_should_complete_lease_once_month_is_merged(self, service, mock_app_repository, mock_lease_service):
+            # When
+            service.backfill_stations(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 3, 1))
+
+            # Then
+            mock_lease_service.complete.assert_has_calls(
+                [
+                    call(lease=Lease(name="2021-01", owner="me", expires_at=dt.datetime(2021, 3, 1))),
+                    call(lease=Lease(name="2021-02", owner="me", expires_at=dt.datetime(2021, 3, 1))),
+                ]
+            )
+
+        def test_should_renew_lease_between_steps(self, service, mock_app_repository, mock_lease_service):
+            # When
+            service.backfill_stations(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 3, 1))
+
+            # Then
+            january_renewals = [
+                renewal
+                for renewal in mock_lease_service.renew.call_args_list
+                if renewal.kwargs["lease"].name == "2021-01"
+            ]
+            assert len(january_renewals) == 2
+
+        def test_should_wait_for_months_left_to_other_workers_before_updating_rollups(
+            self, service, mock_app_repository, mock_lease_service, sleep
+        ):
+            # Given
+            february_done = iter([False, True])
+            mock_lease_service.acquire.side_effect = lambda name: (
+                None if name == "2021-02" else Lease(name=name, owner="me", expires_at=dt.datetime(2021, 3, 1))
+            )
+            mock_lease_service.is_done.side_effect = lambda name: name != "2021-02" or next(february_done)
+
+            # When
+            service.backfill_stations(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 3, 1))
+
+            # Then
+            sleep.assert_called_once_with(60)
+            mock_app_repository.load_raw_datasets.assert_called_once_with(
+                laps=[Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3)]
+            )
+            mock_lease_service.acquire.assert_called_with(name="rollups")
+            assert mock_app_repository.update_rollups.call_count == 2
+
+        def test_should_take_over_month_whose_lease_expires(
+            self, service, mock_app_repository, mock_lease_service, sleep
+        ):
+            # Given
+            done_leases = set()
+            january_acquisitions = iter(
+                [None, None, Lease(name="2021-01", owner="me", expires_at=dt.datetime(2021, 3, 1))]
+            )
+            mock_lease_service.acquire.side_effect = lambda name: (
+                next(january_acquisitions)
+                if name == "2021-01"
+                else Lease(name=name, owner="me", expires_at=dt.datetime(2021, 3, 1))
+            )
+            mock_lease_service.complete.side_effect = lambda lease: done_leases.add(lease.name)
+            mock_lease_service.is_done.side_effect = lambda name: name in done_leases
+
+            # When
+            service.backfill_stations(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 3, 1))
+
+            # Then
+            assert sleep.call_count == 2
+            assert mock_app_repository.load_raw_datasets.call_args_list == [
+                call(laps=[Laps(start_time=dt.datetime(2021, 2, 1, 0), duration_hours=3)]),
+                call(laps=[Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3)]),
+            ]
+            assert done_leases == {"2021-01", "2021-02", "rollups"}
+
+        def test_should_take_over_rollups_whose_lease_expires(
+            self, service, mock_app_repository, mock_lease_service, sleep
+        ):
+            # Given
+            rollups_acquisitions = iter([None, Lease(name="rollups", owner="me", expires_at=dt.datetime(2021, 3, 1))])
+            mock_lease_service.acquire.side_effect = lambda name: (
+                next(rollups_acquisitions)
+                if name == "rollups"
+                else Lease(name=name, owner="me", expires_at=dt.datetime(2021, 3, 1))
+            )
+            mock_lease_service.is_done.side_effect = lambda name: name != "rollups"
+
+            # When
+            service.backfill_stations(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 3, 1))
+
+            # Then
+            sleep.assert_called_once_with(60)
+            assert mock_app_repository.update_rollups.call_count == 2
+
+        def test_should_update_rollups_under_a_single_lease_once_every_month_is_done(
+            self, service, mock_app_repository, mock_lease_service
+        ):
+            # When
+            service.backfill_stations(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 3, 1))
+
+            # Then
+            mock_lease_service.acquire.assert_called_with(name="rollups")
+            assert mock_app_repository.update_rollups.call_count == 2
+            mock_lease_service.complete.assert_called_with(
+                lease=Lease(name="rollups", owner="me", expires_at=dt.datetime(2021, 3, 1))
+            )
+
+        def test_should_not_update_rollups_when_rollups_lease_is_held(
+            self, service, mock_app_repository, mock_lease_service
+        ):
+            # Given
+            mock_lease_service.acquire.side_effect = lambda name: (
+                None if name == "rollups" else Lease(name=name, owner="me", expires_at=dt.datetime(2021, 3, 1))
+            )
+
+            # When
+            service.backfill_stations(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 3, 1))
+
+            # Then
+            assert mock_app_repository.save_station_datasets.call_count == 2
+            mock_app_repository.update_rollups.assert_not_called()
+
+        def test_should_not_save_month_whose_lease_is_lost(self, service, mock_app_repository, mock_lease_service):
+            # Given
+            mock_lease_service.renew.side_effect = None
+            mock_lease_service.renew.return_value = None
+
+            # When
+            service.backfill_stations(start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 3, 1))
+
+            # Then
+            mock_app_repository.save_station_datasets.assert_not_called()
+            mock_lease_service.complete.assert_not_called()
@@ -1,6 +1,7 @@
 import datetime as dt
+import json
 
-from src.domain.entities import Record
+from src.domain.entities import CollectFailure, CollectState, Lease, Record
 from src.domain.value_objects import Laps
 
 
@@ -47,3 +48,161 @@ class TestRecord:
             },
             "rainfall_mm": 1.0,
         }
+
+
+class TestCollectState:
+    def test_should_build_holes_from_available_laps(self):
+        # Given
+        available_laps = [
+            Laps(start_time=dt.datetime(2020, 12, 31, 21), duration_hours=3),
+            Laps(start_time=dt.datetime(2021, 1, 1, 3), duration_hours=3),
+            Laps(start_time=dt.datetime(2021, 1, 1, 12), duration_hours=3),
+        ]
+
+        # When
+        result = CollectState.from_available_laps(since=dt.datetime(2021, 1, 1, 0), available_laps=available_laps)
+
+        # Then
+        assert result == CollectState(
+            since=dt.datetime(2021, 1, 1, 0),
+            watermark=dt.datetime(2021, 1, 1, 12),
+            holes=[dt.datetime(2021, 1, 1, 0), dt.datetime(2021, 1, 1, 6), dt.datetime(2021, 1, 1, 9)],
+        )
+
+    def test_should_return_holes_and_laps_after_watermark_as_missing(self):
+        # Given
+        state = CollectState(
+            since=dt.datetime(2021, 1, 1, 0),
+            watermark=dt.datetime(2021, 1, 1, 12),
+            holes=[dt.datetime(2021, 1, 1, 0), dt.datetime(2021, 1, 1, 9)],
+        )
+
+        # When
+        result = state.get_missing_laps(start_time=dt.datetime(2021, 1, 1, 3), end_time=dt.datetime(2021, 1, 1, 18))
+
+        # Then
+        assert result == [
+            Laps(start_time=dt.datetime(2021, 1, 1, 9), duration_hours=3),
+            Laps(start_time=dt.datetime(2021, 1, 1, 15), duration_hours=3),
+            Laps(start_time=dt.datetime(2021, 1, 1, 18), duration_hours=3),
+        ]
+
+    def test_should_return_every_laps_as_missing_when_nothing_collected(self):
+        # Given
+        state = CollectState(since=dt.datetime(2021, 1, 1, 0))
+
+        # When
+        result = state.get_missing_laps(start_time=dt.datetime(2021, 1, 1, 0), end_time=dt.datetime(2021, 1, 1, 6))
+
+        # Then
+        assert [laps.start_time for laps in result] == [
+            dt.datetime(2021, 1, 1, 0),
+            dt.datetime(2021, 1, 1, 3),
+            dt.datetime(2021, 1, 1, 6),
+        ]
+
+    def test_should_fill_holes_and_move_watermark_when_marking_collected(self):
+        # Given
+        state = CollectState(
+            since=dt.datetime(2021, 1, 1, 0), watermark=dt.datetime(2021, 1, 1, 3), holes=[dt.datetime(2021, 1, 1, 0)]
+        )
+
+        # When
+        state.mark_collected(
+            [
+                Laps(start_time=dt.datetime(2021, 1, 1, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 1, 9), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 1, 15), duration_hours=3),
+            ]
+        )
+
+        # Then
+        assert state.watermark == dt.datetime(2021, 1, 1, 15)
+        assert state.holes == [dt.datetime(2021, 1, 1, 6), dt.datetime(2021, 1, 1, 12)]
+
+    def test_should_count_attempts_and_double_retry_delay_when_marking_failed(self):
+        # Given
+        state = CollectState(since=dt.datetime(2021, 1, 1, 0))
+        laps = Laps(start_time=dt.datetime(2021, 1, 1, 3), duration_hours=3)
+
+        # When
+        state.mark_failed(laps, "WeatherDataNotFoundError", dt.datetime(2021, 1, 2, 0), dt.timedelta(hours=3))
+        result = state.mark_failed(laps, "WeatherDataNotFoundError", dt.datetime(2021, 1, 2, 3), dt.timedelta(hours=3))
+
+        # Then
+        assert state.failures == [
+            CollectFailure(
+                start_time=dt.datetime(2021, 1, 1, 3),
+                failure_class="WeatherDataNotFoundError",
+                attempts=2,
+                next_attempt_time=dt.datetime(2021, 1, 2, 9),
+            )
+        ]
+        assert result is state.failures[0]
+
+    def test_should_clear_failure_when_marking_collected(self):
+        # Given
+        state = CollectState(since=dt.datetime(2021, 1, 1, 0))
+        laps = Laps(start_time=dt.datetime(2021, 1, 1, 0), duration_hours=3)
+        state.mark_failed(laps, "WeatherCollectionError", dt.datetime(2021, 1, 2, 0), dt.timedelta(hours=3))
+
+        # When
+        state.mark_collected([laps])
+
+        # Then
+        assert state.failures == []
+
+    def test_should_forget_holes_before_given_datetime(self):
+        # Given
+        state = CollectState(
+            since=dt.datetime(2021, 1, 1, 0),
+            watermark=dt.datetime(2021, 1, 2, 12),
+            holes=[dt.datetime(2021, 1, 1, 6), dt.datetime(2021, 1, 2, 6)],
+        )
+
+        # When
+        state.forget_before(dt.datetime(2021, 1, 2, 0))
+
+        # Then
+        assert state.since == dt.datetime(2021, 1, 2, 0)
+        assert state.holes == [dt.datetime(2021, 1, 2, 6)]
+
+    def test_should_round_trip_through_dict(self):
+        # Given
+        state = CollectState(
+            since=dt.datetime(2021, 1, 1, 0), watermark=dt.datetime(2021, 1, 1, 12), holes=[dt.datetime(2021, 1, 1, 6)]
+        )
+        state.mark_failed(
+            Laps(start_time=dt.datetime(2021, 1, 1, 6), duration_hours=3),
+            "WeatherCollectionError",
+            dt.datetime(2021, 1, 2, 0),
+            dt.timedelta(hours=3),
+        )
+
+        # When
+        result = CollectState.from_dict(json.loads(json.dumps(state.to_dict(), default=str)))
+
+        # Then
+        assert result == state
+
+
+class TestLease:
+    def test_should_be_expired_after_expiry_time(self):
+        # Given
+        lease = Lease(name="2021-01", owner="worker-1", expires_at=dt.datetime(2021, 1, 1, 12))
+
+        # When
+        result = [lease.is_expired(dt.datetime(2021, 1, 1, 11)), lease.is_expired(dt.datetime(2021, 1, 1, 12))]
+
+        # Then
+        assert result == [False, True]
+
+    def test_should_never_expire_once_done(self):
+        # Given
+        lease = Lease(name="2021-01", owner="worker-1", expires_at=dt.datetime(2021, 1, 1, 12), done=True)
+
+        # When
+        result = lease.is_expired(dt.datetime(2021, 1, 2))
+
+        # Then
+        assert result is False
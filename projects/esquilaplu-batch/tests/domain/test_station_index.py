@@ -0,0 +1,70 @@
+import math
+import random
+
+import pytest
+
+from src.domain.station_index import StationIndex
+from src.domain.value_objects import Station
+
+
+class TestStationIndex:
+    @pytest.fixture
+    def stations(self):
+        return [
+            Station(id=7005, name="ABBEVILLE", latitude=50.136, longitude=1.834),
+            Station(id=7015, name="LILLE-LESQUIN", latitude=50.57, longitude=3.0975),
+            Station(id=7110, name="BREST-GUIPAVAS", latitude=48.444167, longitude=-4.412),
+            Station(id=7510, name="BORDEAUX-MERIGNAC", latitude=44.830667, longitude=-0.691333),
+            Station(id=7630, name="TOULOUSE-BLAGNAC", latitude=43.621, longitude=1.378833),
+            Station(id=7650, name="MARIGNANE", latitude=43.437667, longitude=5.216),
+            Station(id=61980, name="GILLOT-AEROPORT", latitude=-20.8925, longitude=55.528667),
+        ]
+
+    @pytest.fixture
+    def index(self, stations):
+        return StationIndex(stations)
+
+    class TestNearest:
+        def test_should_return_nearest_station(self, index):
+            # When
+            result = index.nearest(44.806, -0.631)  # Pessac
+
+            # Then
+            assert [station.id for station in result] == [7510]
+
+        def test_should_return_k_nearest_stations_nearest_first(self, index):
+            # When
+            result = index.nearest(43.6, 1.44, k=3)  # Toulouse
+
+            # Then
+            assert [station.id for station in result] == [7630, 7510, 7650]
+
+        def test_should_match_exhaustive_search(self, stations, index):
+            # Given
+            generator = random.Random(42)
+            locations = [(generator.uniform(-60, 60), generator.uniform(-180, 180)) for _ in range(200)]
+
+            # When
+            result = [index.nearest(latitude, longitude, k=2) for latitude, longitude in locations]
+
+            # Then
+            assert result == [
+                sorted(stations, key=lambda station: index.get_distance_km(station, latitude, longitude))[:2]
+                for latitude, longitude in locations
+            ]
+
+    class TestSearch:
+        def test_should_match_place_name_ignoring_accents_and_case(self, index):
+            # When
+            result = index.search("Mérignac")
+
+            # Then
+            assert [station.id for station in result] == [7510]
+
+    class TestGetDistanceKm:
+        def test_should_return_great_circle_distance(self, stations, index):
+            # When
+            result = index.get_distance_km(stations[3], 43.621, 1.378833)
+
+            # Then
+            assert math.isclose(result, 212.5, abs_tol=1)
@@ -1,6 +1,6 @@
 import datetime as dt
 
-from src.domain.value_objects import Laps
+from src.domain.value_objects import Laps, WindowRainfall
 
 
 class TestLaps:
@@ -41,3 +41,25 @@ class TestLaps:
 
         # Then
         assert result is True
+
+
+class TestWindowRainfall:
+    def test_should_compute_coverage_from_observed_laps(self):
+        # Given
+        window = WindowRainfall(rainfall_mm=3.0, nb_laps=8, nb_valid_laps=6)
+
+        # When
+        result = window.coverage
+
+        # Then
+        assert result == 0.75
+
+    def test_should_have_no_coverage_when_window_is_empty(self):
+        # Given
+        window = WindowRainfall(rainfall_mm=0.0, nb_laps=0, nb_valid_laps=0)
+
+        # When
+        result = window.coverage
+
+        # Then
+        assert result == 0.0
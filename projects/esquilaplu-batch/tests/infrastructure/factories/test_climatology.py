@@ -0,0 +1,82 @@
+import datetime as dt
+
+import pandas as pd
+
+from src.infrastructure.factories.climatology import ClimatologyFactory
+
+
+def a_daily_rollup(rainfall_by_day: dict[dt.date, float], nb_laps: int = 8) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "numer_sta": 7510,
+            "period": pd.to_datetime(list(rainfall_by_day)),
+            "rainfall_mm": list(rainfall_by_day.values()),
+            "nb_laps": nb_laps,
+        }
+    )
+
+
+class TestClimatologyFactory:
+    class TestCompute:
+        def test_should_pool_the_days_around_each_day_of_the_year(self):
+            # Given
+            daily_rollup = a_daily_rollup({dt.date(2020, 3, 10): 4.0, dt.date(2021, 3, 14): 0.0})
+
+            # When
+            result = ClimatologyFactory.compute(daily_rollup)
+
+            # Then
+            day_normals = result.loc[result["scope"] == "day"].set_index("key")
+            # on a leap year calendar, the 10th of March is the 70th day
+            assert day_normals.loc[70, "nb_samples"] == 2
+            assert day_normals.loc[70, "mean_mm"] == 2.0
+            assert day_normals.loc[70, "rainy_frequency"] == 0.5
+            assert day_normals.loc[63, "nb_samples"] == 1
+            assert 62 not in day_normals.index
+
+        def test_should_give_the_same_key_to_a_date_on_leap_and_common_years(self):
+            # Given
+            daily_rollup = a_daily_rollup({dt.date(2020, 12, 31): 1.0, dt.date(2021, 12, 31): 3.0})
+
+            # When
+            result = ClimatologyFactory.compute(daily_rollup)
+
+            # Then
+            day_normals = result.loc[result["scope"] == "day"].set_index("key")
+            assert day_normals.loc[366, "nb_samples"] == 2
+            # the window wraps around the end of the year
+            assert day_normals.loc[7, "nb_samples"] == 2
+            assert 8 not in day_normals.index
+
+        def test_should_skip_days_missing_laps(self):
+            # Given
+            daily_rollup = a_daily_rollup({dt.date(2021, 3, 10): 4.0}, nb_laps=5)
+
+            # When
+            result = ClimatologyFactory.compute(daily_rollup)
+
+            # Then
+            assert result.empty
+            assert list(result.columns) == ClimatologyFactory.COLUMNS
+
+        def test_should_summarize_monthly_totals_of_covered_months(self):
+            # Given
+            daily_rollup = pd.concat(
+                [
+                    a_daily_rollup({day.date(): 1.0 for day in pd.date_range("2020-02-01", "2020-02-29")}),
+                    a_daily_rollup({day.date(): 0.5 for day in pd.date_range("2021-02-01", "2021-02-28")}),
+                    # a single day of February 2022 is far from covering the month
+                    a_daily_rollup({dt.date(2022, 2, 1): 30.0}),
+                ],
+                ignore_index=True,
+            )
+
+            # When
+            result = ClimatologyFactory.compute(daily_rollup)
+
+            # Then
+            february = result.loc[(result["scope"] == "month") & (result["key"] == 2)].iloc[0]
+            assert february["nb_samples"] == 2
+            assert february["mean_mm"] == (29.0 + 14.0) / 2
+            assert february["p50_mm"] == (29.0 + 14.0) / 2
+            assert february["rainy_frequency"] == 30 / 58
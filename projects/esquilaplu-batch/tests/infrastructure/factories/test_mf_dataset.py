@@ -0,0 +1,22 @@
+import datetime as dt
+
+import numpy as np
+
+from src.infrastructure.factories.mf_dataset import MeteoFranceDatasetFactory
+
+
+class TestMeteoFranceDatasetFactory:
+    class TestParseRawCsv:
+        def test_should_return_columnar_arrays_dated_at_observation_time(self):
+            # Given
+            content = b"numer_sta;date;pmer;rr3;Unnamed: 59\n7510;20210130;101870;0.2;\n7520;20210130;mq;mq;\n"
+
+            # When
+            result = MeteoFranceDatasetFactory.parse_raw_csv(content, dt.datetime(2021, 1, 30, 3))
+
+            # Then
+            assert list(result) == ["numer_sta", "date", "pmer", "rr3"]
+            assert result["numer_sta"].tolist() == [7510, 7520]
+            np.testing.assert_array_equal(result["date"], np.array(["2021-01-30T03:00"] * 2, dtype="datetime64[ns]"))
+            np.testing.assert_array_equal(result["pmer"], [101870.0, np.nan])
+            np.testing.assert_array_equal(result["rr3"], [0.2, np.nan])
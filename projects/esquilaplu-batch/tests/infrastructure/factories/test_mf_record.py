@@ -94,6 +94,23 @@ class TestMeteoFranceRecordFactory:
             # Then
             assert result == expected_record
 
+        def test_should_build_record_of_given_station(self, factory):
+            # Given
+            dataframe = (
+                DataFrameBuilder.a_dataframe()
+                .with_columns(["date", "numer_sta", "rr3"])
+                .with_dtypes(date="datetime64[ns]", rr3="float64")
+                .with_row(date=dt.datetime(2021, 1, 1, 3, 0, 0), numer_sta=7510, rr3=0.2)
+                .with_row(date=dt.datetime(2021, 1, 1, 3, 0, 0), numer_sta=7110, rr3=1.4)
+                .build()
+            )
+
+            # When
+            result = factory.from_dataframe(dataframe, station_id=7110)
+
+            # Then
+            assert result.rainfall_mm == 1.4
+
         def test_should_raise_when_no_station_data(self, factory):
             # Given
             dataframe = (
@@ -129,3 +146,40 @@ class TestMeteoFranceRecordFactory:
             # When & Then
             with pytest.raises(ValueError, match=re.escape("Invalid laps duration: 2")):
                 factory.from_dataframe(dataframe, laps_duration_hr=2)
+
+    class TestFromStationDataFrame:
+        def test_should_build_one_record_per_observation(self, factory):
+            # Given
+            dataframe = (
+                DataFrameBuilder.a_dataframe()
+                .with_columns(["date", "numer_sta", "rr3", "rr6"])
+                .with_dtypes(date="datetime64[ns]", rr3="float64", rr6="float64")
+                .with_row(date=dt.datetime(2021, 1, 1, 3), numer_sta=7510, rr3=0.2, rr6=0.3)
+                .with_row(date=dt.datetime(2021, 1, 1, 6), numer_sta=7510, rr3=1.5, rr6=1.7)
+                .build()
+            )
+
+            # When
+            result = factory.from_station_dataframe(dataframe)
+
+            # Then
+            assert result == [
+                Record(laps=Laps(start_time=dt.datetime(2021, 1, 1, 0), duration_hours=3), rainfall_mm=0.2),
+                Record(laps=Laps(start_time=dt.datetime(2021, 1, 1, 3), duration_hours=3), rainfall_mm=1.5),
+            ]
+            assert [record.rainfall_mm for record in result] == [0.2, 1.5]
+
+        def test_should_return_empty_list_when_no_observation(self, factory):
+            # Given
+            dataframe = (
+                DataFrameBuilder.a_dataframe()
+                .with_columns(["date", "numer_sta", "rr3"])
+                .with_dtypes(date="datetime64[ns]", rr3="float64")
+                .build()
+            )
+
+            # When
+            result = factory.from_station_dataframe(dataframe)
+
+            # Then
+            assert result == []
@@ -0,0 +1,77 @@
+import datetime as dt
+
+import pandas as pd
+from easy_testing import assert_frame_equals
+
+from src.domain.value_objects import WindowRainfall
+from src.infrastructure.factories.rainfall_index import RainfallIndexFactory
+
+
+class TestRainfallIndexFactory:
+    class TestMerge:
+        def test_should_build_dense_index_with_running_sums(self):
+            # Given
+            observations = pd.DataFrame(
+                {
+                    "date": [dt.datetime(2021, 1, 1, 3), dt.datetime(2021, 1, 1, 12), dt.datetime(2021, 1, 1, 6)],
+                    "rr3": [1.5, 2.0, -0.1],
+                }
+            )
+
+            # When
+            result = RainfallIndexFactory.merge(None, observations)
+
+            # Then
+            assert_frame_equals(
+                result,
+                pd.DataFrame(
+                    {
+                        "slot": [dt.datetime(2021, 1, 1, hour) for hour in (0, 3, 6, 9)],
+                        "rainfall_mm": pd.Series([1.5, 0.0, 0.0, 2.0], dtype="float32"),
+                        "valid": [True, True, False, True],
+                        "cumulative_mm": [1.5, 1.5, 1.5, 3.5],
+                        "valid_count": pd.Series([1, 2, 2, 3], dtype="int32"),
+                    }
+                ),
+            )
+
+        def test_should_replace_existing_slots_and_update_following_running_sums(self):
+            # Given
+            index = RainfallIndexFactory.merge(
+                None,
+                pd.DataFrame({"date": [dt.datetime(2021, 1, 1, 3), dt.datetime(2021, 1, 1, 6)], "rr3": [1.0, 2.0]}),
+            )
+
+            # When
+            result = RainfallIndexFactory.merge(
+                index, pd.DataFrame({"date": [dt.datetime(2021, 1, 1, 3)], "rr3": [4.0]})
+            )
+
+            # Then
+            assert result["cumulative_mm"].tolist() == [4.0, 6.0]
+
+    class TestGetWindowRainfall:
+        @staticmethod
+        def _index() -> pd.DataFrame:
+            dates = [dt.datetime(2021, 1, 1, 3) + dt.timedelta(hours=3 * i) for i in range(16)]
+            return RainfallIndexFactory.merge(
+                None, pd.DataFrame({"date": dates, "rr3": [1.0] * 7 + [None] + [2.0] * 8})
+            )
+
+        def test_should_return_window_total_and_coverage(self):
+            # When
+            result = RainfallIndexFactory.get_window_rainfall(
+                self._index(), dt.datetime(2021, 1, 1, 18), dt.datetime(2021, 1, 2, 3)
+            )
+
+            # Then
+            assert result == WindowRainfall(rainfall_mm=5.0, nb_laps=4, nb_valid_laps=3)
+
+        def test_should_count_laps_outside_the_index_as_missing(self):
+            # When
+            result = RainfallIndexFactory.get_window_rainfall(
+                self._index(), dt.datetime(2021, 1, 2, 19), dt.datetime(2021, 1, 3, 5)
+            )
+
+            # Then
+            assert result == WindowRainfall(rainfall_mm=2.0, nb_laps=3, nb_valid_laps=1)
@@ -1,11 +1,16 @@
 import datetime as dt
-from unittest.mock import call
+import io
+from unittest.mock import MagicMock, call
 
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
-from easy_testing import DataFrameBuilder
+from botocore.exceptions import ClientError
+from easy_testing import DataFrameBuilder, assert_frame_equals
 
-from src.domain.entities import Record
-from src.domain.value_objects import Laps
+from src.domain.entities import CollectState, Record
+from src.domain.value_objects import Laps, Station, WindowRainfall
 from src.infrastructure.repositories.app_s3 import AppS3Repository
 
 
@@ -18,6 +23,25 @@ class TestAppS3Repository:
     def mock_s3_client(self, mock_boto3):
         return mock_boto3.client.return_value
 
+    @pytest.fixture
+    def no_such_key(self):
+        return ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+
+    @pytest.fixture
+    def s3_parquet_objects(self, mock_s3_client, no_such_key):
+        """Serve the given frames as parquet objects from get_object, keyed by S3 key."""
+        objects = {}
+
+        def get_object(Bucket, Key):
+            if Key not in objects:
+                raise no_such_key
+            buffer = io.BytesIO()
+            objects[Key].to_parquet(buffer, index=False)
+            return {"Body": MagicMock(read=MagicMock(return_value=buffer.getvalue()))}
+
+        mock_s3_client.get_object.side_effect = get_object
+        return objects
+
     @pytest.fixture
     def repository(self):
         return AppS3Repository(bucket="mybucket", root_key="esquilaplu", secret_key="azerty", access_key="coucou")
@@ -29,58 +53,84 @@ class TestAppS3Repository:
                 "s3",
                 aws_access_key_id="coucou",
                 aws_secret_access_key="azerty",
+                endpoint_url=None,
             )
 
     class TestGetAvailableLapsSince:
-        def test_should_return_empty_list_when_no_file(self, repository, mock_s3_client):
-            # Given
-            mock_s3_client.list_objects_v2.return_value = {
-                "Contents": [],
-            }
+        @pytest.fixture
+        def raw_keys(self, mock_s3_client):
+            """Serve the given keys from a paginator, 1000 keys per page after StartAfter as S3 does."""
+            keys = []
+
+            def paginate(Bucket, Prefix, StartAfter):
+                listed_keys = sorted(key for key in keys if key.startswith(Prefix) and key > StartAfter)
+                pages = [{"Contents": []}]
+                for key in listed_keys:
+                    if len(pages[-1]["Contents"]) == 1000:
+                        pages.append({"Contents": []})
+                    pages[-1]["Contents"].append({"Key": key})
+                return pages
 
+            mock_s3_client.get_paginator.return_value.paginate.side_effect = paginate
+            return keys
+
+        def test_should_return_empty_list_when_no_file(self, repository, mock_s3_client, raw_keys):
             # When
             result = repository.get_available_laps_since(dt.datetime(2021, 1, 1))
 
             # Then
             assert result == []
-            mock_s3_client.list_objects_v2.assert_called_once_with(
-                Bucket="mybucket", Prefix="esquilaplu/raw/meteofrance"
+            mock_s3_client.get_paginator.assert_called_once_with("list_objects_v2")
+            mock_s3_client.get_paginator.return_value.paginate.assert_called_once_with(
+                Bucket="mybucket",
+                Prefix="esquilaplu/raw/meteofrance/",
+                StartAfter="esquilaplu/raw/meteofrance/2021-01-01-00",
             )
 
-        def test_should_list_existing_file_as_datetime(self, repository, mock_s3_client):
+        def test_should_list_existing_file_as_datetime(self, repository, raw_keys):
             # Given
-            mock_s3_client.list_objects_v2.return_value = {
-                "Contents": [
-                    {"Key": "esquilaplu/raw/meteofrance/2021-01-01-03.csv"},
-                    {"Key": "esquilaplu/raw/meteofrance/2021-01-01-04.csv"},
-                    {"Key": "esquilaplu/raw/meteofrance/2021-01-02-03.csv"},
-                ],
-                "KeyCount": 3,
-            }
+            raw_keys += [
+                "esquilaplu/raw/meteofrance/2021-01-01-03.csv",
+                "esquilaplu/raw/meteofrance/2021-01-01-04.csv",
+                "esquilaplu/raw/meteofrance/2021-01-02-03.csv",
+            ]
 
             # When
-            result = repository.get_available_laps_since(dt.datetime(2021, 1, 1, 1))
+            result = repository.get_available_laps_since(dt.datetime(2021, 1, 1, 4))
 
             # Then
             assert result == [
-                Laps(start_time=dt.datetime(2021, 1, 1, 1), duration_hours=3),
-                Laps(start_time=dt.datetime(2021, 1, 2, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 1, 4), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 2, 3), duration_hours=3),
             ]
 
-        def test_should_returns_empty_list_when_no_file_exists_in_s3(self, repository, mock_s3_client):
+        def test_should_list_laps_with_the_key_of_their_saved_raw_dataset(self, repository, raw_keys):
             # Given
-            mock_s3_client.list_objects_v2.return_value = {
-                "KeyCount": 0,
-            }
+            laps = Laps(start_time=dt.datetime(2021, 1, 30, 21), duration_hours=3)
+            raw_keys.append("esquilaplu/raw/meteofrance/2021-01-30-21.csv")
 
             # When
-            result = repository.get_available_laps_since(dt.datetime(2021, 1, 3, 1))
+            result = repository.get_available_laps_since(dt.datetime(2021, 1, 30))
 
             # Then
-            assert result == []
+            assert result == [laps]
+
+        def test_should_list_every_page_of_raw_datasets(self, repository, raw_keys):
+            # Given
+            laps = [
+                Laps(start_time=dt.datetime(2021, 1, 1) + dt.timedelta(hours=3 * position), duration_hours=3)
+                for position in range(1200)
+            ]
+            raw_keys += [f"esquilaplu/raw/meteofrance/{laps_.start_time.strftime('%Y-%m-%d-%H')}.csv" for laps_ in laps]
+
+            # When
+            result = repository.get_available_laps_since(dt.datetime.min)
+
+            # Then
+            assert result == laps
 
     class TestSaveRawDataset:
-        def test_should_save_dataframe_to_s3_as_csv(self, repository, mock_s3_client):
+        def test_should_save_dataframe_to_s3_as_csv(self, repository, mock_s3_client, no_such_key):
             # Given
             dataframe = (
                 DataFrameBuilder.a_dataframe()
@@ -101,17 +151,226 @@ class TestAppS3Repository:
             )
             expected_csv = "date;numer_sta;rr1;rr3;rr6;rr12;rr24\n2021-01-30;7510;0.1;0.2;0.3;0.4;0.5\n"
             laps = Laps(start_time=dt.datetime(2021, 1, 1, 1), duration_hours=3)
+            mock_s3_client.get_object.side_effect = no_such_key
 
             # When
             repository.save_raw_dataset(dataframe, laps)
 
             # Then
-            mock_s3_client.put_object.assert_called_once_with(
+            mock_s3_client.put_object.assert_any_call(
                 Bucket="mybucket",
                 Key="esquilaplu/raw/meteofrance/2021-01-01-01.csv",
                 Body=expected_csv,
             )
 
+        def test_should_also_save_station_partitions(self, repository, mock_s3_client, no_such_key):
+            # Given
+            dataframe = (
+                DataFrameBuilder.a_dataframe()
+                .with_columns(["date", "numer_sta", "rr3"])
+                .with_dtypes(date="datetime64[ns]", rr3="float64")
+                .with_row(date=dt.datetime(2021, 1, 30, 13, 0, 0), numer_sta=7510, rr3=0.2)
+                .with_row(date=dt.datetime(2021, 1, 30, 13, 0, 0), numer_sta=7520, rr3=1.5)
+                .build()
+            )
+            laps = Laps(start_time=dt.datetime(2021, 1, 30, 10), duration_hours=3)
+            mock_s3_client.get_object.side_effect = no_such_key
+
+            # When
+            repository.save_raw_dataset(dataframe, laps)
+
+            # Then
+            saved_keys = [kwargs["Key"] for _, kwargs in mock_s3_client.put_object.call_args_list]
+            assert sorted(saved_keys) == [
+                "esquilaplu/raw/meteofrance/2021-01-30-10.csv",
+                "esquilaplu/stations/7510/2021/01.parquet",
+                "esquilaplu/stations/7520/2021/01.parquet",
+            ]
+
+    class TestLoadRawDataset:
+        def test_should_load_raw_csv_with_laps_end_time_as_date(self, repository, mock_s3_client):
+            # Given
+            mock_s3_client.get_object.return_value = {
+                "Body": io.StringIO("date;numer_sta;rr3\n2021-01-30;7510;0.2\n2021-01-30;7520;0\n")
+            }
+            laps = Laps(start_time=dt.datetime(2021, 1, 30, 10), duration_hours=3)
+            expected = (
+                DataFrameBuilder.a_dataframe()
+                .with_columns(["date", "numer_sta", "rr3"])
+                .with_dtypes(date="datetime64[ns]", rr3="float64")
+                .with_row(date=dt.datetime(2021, 1, 30, 13), numer_sta=7510, rr3=0.2)
+                .with_row(date=dt.datetime(2021, 1, 30, 13), numer_sta=7520, rr3=0.0)
+                .build()
+            )
+
+            # When
+            result = repository.load_raw_dataset(laps)
+
+            # Then
+            mock_s3_client.get_object.assert_called_once_with(
+                Bucket="mybucket", Key="esquilaplu/raw/meteofrance/2021-01-30-10.csv"
+            )
+            assert_frame_equals(result, expected)
+
+    class TestLoadRawDatasets:
+        @pytest.fixture
+        def raw_objects(self, mock_s3_client):
+            objects = {
+                "esquilaplu/raw/meteofrance/2021-01-30-09.csv": b"date;numer_sta;rr3\n2021-01-30;7510;0.2\n",
+                "esquilaplu/raw/meteofrance/2021-01-30-12.csv": b"date;numer_sta;rr3\n2021-01-30;7510;mq\n",
+            }
+            mock_s3_client.get_object.side_effect = lambda Bucket, Key: {"Body": io.BytesIO(objects[Key])}
+            return objects
+
+        @pytest.fixture
+        def laps(self):
+            return [
+                Laps(start_time=dt.datetime(2021, 1, 30, 9), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 30, 12), duration_hours=3),
+            ]
+
+        def test_should_load_raw_datasets_in_laps_order(self, repository, raw_objects, laps):
+            # When
+            result = repository.load_raw_datasets(laps)
+
+            # Then
+            assert [dataset["date"].tolist() for dataset in result] == [
+                [pd.Timestamp(2021, 1, 30, 12)],
+                [pd.Timestamp(2021, 1, 30, 15)],
+            ]
+
+        def test_should_parse_raw_datasets_in_worker_processes(self, raw_objects, laps):
+            # Given
+            repository = AppS3Repository(
+                bucket="mybucket", root_key="esquilaplu", secret_key="azerty", access_key="coucou", parse_workers=2
+            )
+
+            # When
+            result = repository.load_raw_datasets(laps)
+
+            # Then
+            assert_frame_equals(
+                pd.concat(result, ignore_index=True),
+                pd.DataFrame(
+                    {
+                        "date": [dt.datetime(2021, 1, 30, 12), dt.datetime(2021, 1, 30, 15)],
+                        "numer_sta": [7510, 7510],
+                        "rr3": [0.2, float("nan")],
+                    }
+                ),
+            )
+
+    class TestSaveStationDatasets:
+        @staticmethod
+        def _saved_frames(mock_s3_client) -> dict[str, pd.DataFrame]:
+            return {
+                kwargs["Key"]: pd.read_parquet(io.BytesIO(kwargs["Body"]))
+                for _, kwargs in mock_s3_client.put_object.call_args_list
+            }
+
+        def test_should_split_datasets_by_station_and_month(self, repository, mock_s3_client, no_such_key):
+            # Given
+            datasets = [
+                DataFrameBuilder.a_dataframe()
+                .with_columns(["date", "numer_sta", "rr3", "Unnamed: 3"])
+                .with_dtypes(date="datetime64[ns]")
+                .with_row(date=dt.datetime(2021, 1, 31, 21), numer_sta=7510, rr3="0.2", **{"Unnamed: 3": None})
+                .with_row(date=dt.datetime(2021, 1, 31, 21), numer_sta=7520, rr3="mq", **{"Unnamed: 3": None})
+                .build(),
+                DataFrameBuilder.a_dataframe()
+                .with_columns(["date", "numer_sta", "rr3"])
+                .with_dtypes(date="datetime64[ns]")
+                .with_row(date=dt.datetime(2021, 2, 1, 0), numer_sta=7510, rr3=1)
+                .build(),
+            ]
+            mock_s3_client.get_object.side_effect = no_such_key
+
+            # When
+            repository.save_station_datasets(datasets)
+
+            # Then
+            saved = self._saved_frames(mock_s3_client)
+            assert sorted(saved.keys()) == [
+                "esquilaplu/stations/7510/2021/01.parquet",
+                "esquilaplu/stations/7510/2021/02.parquet",
+                "esquilaplu/stations/7520/2021/01.parquet",
+            ]
+            assert_frame_equals(
+                saved["esquilaplu/stations/7520/2021/01.parquet"],
+                pd.DataFrame({"date": [dt.datetime(2021, 1, 31, 21)], "numer_sta": [7520], "rr3": [float("nan")]}),
+            )
+            assert_frame_equals(
+                saved["esquilaplu/stations/7510/2021/02.parquet"],
+                pd.DataFrame({"date": [dt.datetime(2021, 2, 1, 0)], "numer_sta": [7510], "rr3": [1.0]}),
+            )
+
+        def test_should_merge_with_existing_partition(self, repository, mock_s3_client):
+            # Given
+            existing = pd.DataFrame(
+                {
+                    "date": [dt.datetime(2021, 1, 1, 3), dt.datetime(2021, 1, 1, 6)],
+                    "numer_sta": [7510, 7510],
+                    "rr3": [0.5, 0.0],
+                }
+            )
+            buffer = io.BytesIO()
+            existing.to_parquet(buffer, index=False)
+            mock_s3_client.get_object.return_value = {"Body": MagicMock(read=MagicMock(return_value=buffer.getvalue()))}
+            dataset = pd.DataFrame(
+                {
+                    "date": [dt.datetime(2021, 1, 1, 6), dt.datetime(2021, 1, 1, 0)],
+                    "numer_sta": [7510, 7510],
+                    "rr3": [2.0, 1.0],
+                }
+            )
+
+            # When
+            repository.save_station_datasets([dataset])
+
+            # Then
+            mock_s3_client.get_object.assert_called_once_with(
+                Bucket="mybucket", Key="esquilaplu/stations/7510/2021/01.parquet"
+            )
+            assert_frame_equals(
+                self._saved_frames(mock_s3_client)["esquilaplu/stations/7510/2021/01.parquet"],
+                pd.DataFrame(
+                    {
+                        "date": [dt.datetime(2021, 1, 1, 0), dt.datetime(2021, 1, 1, 3), dt.datetime(2021, 1, 1, 6)],
+                        "numer_sta": [7510, 7510, 7510],
+                        "rr3": [1.0, 0.5, 2.0],
+                    }
+                ),
+            )
+
+        def test_should_do_nothing_when_no_dataset(self, repository, mock_s3_client):
+            # When
+            repository.save_station_datasets([])
+
+            # Then
+            mock_s3_client.put_object.assert_not_called()
+
+    class TestGetRecordedLapsSince:
+        def test_should_list_record_keys_of_station_from_since(self, repository, mock_s3_client):
+            # Given
+            mock_s3_client.get_paginator.return_value.paginate.return_value = [
+                {"Contents": [{"Key": "esquilaplu/processed/records/7510/2021/01/29/21.json"}]},
+                {"Contents": [{"Key": "esquilaplu/processed/records/7510/2021/01/30/00.json"}]},
+            ]
+
+            # When
+            result = repository.get_recorded_laps_since(station_id=7510, since=dt.datetime(2021, 1, 29, 20))
+
+            # Then
+            mock_s3_client.get_paginator.return_value.paginate.assert_called_once_with(
+                Bucket="mybucket",
+                Prefix="esquilaplu/processed/records/7510/",
+                StartAfter="esquilaplu/processed/records/7510/2021/01/29/20",
+            )
+            assert result == [
+                Laps(start_time=dt.datetime(2021, 1, 29, 21), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 30, 0), duration_hours=3),
+            ]
+
     class TestSaveManyRecords:
         def test_should_save_records_to_s3_as_one_json_file_per_record(self, repository, mock_s3_client):
             # Given
@@ -122,7 +381,7 @@ class TestAppS3Repository:
             ]
 
             # When
-            repository.save_many_records(records)
+            repository.save_many_records(records, station_id=7510)
 
             # Then
             assert mock_s3_client.put_object.call_count == 3
@@ -130,21 +389,523 @@ class TestAppS3Repository:
                 [
                     call(
                         Bucket="mybucket",
-                        Key="esquilaplu/processed/records/2021/01/29/21.json",
+                        Key="esquilaplu/processed/records/7510/2021/01/29/21.json",
                         Body='{"data": '
                         '{"laps": {"start_time": "2021-01-29 21:00:00", "duration_hours": 3}, "rainfall_mm": 0.1}}',
                     ),
                     call(
                         Bucket="mybucket",
-                        Key="esquilaplu/processed/records/2021/01/30/00.json",
+                        Key="esquilaplu/processed/records/7510/2021/01/30/00.json",
                         Body='{"data": '
                         '{"laps": {"start_time": "2021-01-30 00:00:00", "duration_hours": 3}, "rainfall_mm": 0.2}}',
                     ),
                     call(
                         Bucket="mybucket",
-                        Key="esquilaplu/processed/records/2021/01/30/03.json",
+                        Key="esquilaplu/processed/records/7510/2021/01/30/03.json",
                         Body='{"data": '
                         '{"laps": {"start_time": "2021-01-30 03:00:00", "duration_hours": 3}, "rainfall_mm": 0.3}}',
                     ),
                 ]
             )
+
+    class TestUpdateRollups:
+        @pytest.fixture
+        def mock_stations_listing(self, mock_s3_client):
+            mock_s3_client.get_paginator.return_value.paginate.return_value = [
+                {"CommonPrefixes": [{"Prefix": "esquilaplu/stations/7510/"}, {"Prefix": "esquilaplu/stations/7520/"}]}
+            ]
+
+        @staticmethod
+        def _saved_frames(mock_s3_client) -> dict[str, pd.DataFrame]:
+            return {
+                kwargs["Key"]: pd.read_parquet(io.BytesIO(kwargs["Body"]))
+                if kwargs["Key"].endswith(".parquet")
+                else pa.ipc.open_file(pa.py_buffer(kwargs["Body"])).read_pandas()
+                for _, kwargs in mock_s3_client.put_object.call_args_list
+            }
+
+        def test_should_build_rollups_from_station_partitions(
+            self, repository, mock_s3_client, mock_stations_listing, s3_parquet_objects
+        ):
+            # Given
+            s3_parquet_objects["esquilaplu/stations/7510/2021/01.parquet"] = pd.DataFrame(
+                {
+                    "date": [dt.datetime(2021, 1, 31, 3), dt.datetime(2021, 1, 31, 21), dt.datetime(2021, 1, 31, 0)],
+                    "numer_sta": [7510, 7510, 7510],
+                    "rr3": [1.0, -0.1, 4.0],
+                }
+            )
+            s3_parquet_objects["esquilaplu/stations/7510/2021/02.parquet"] = pd.DataFrame(
+                {"date": [dt.datetime(2021, 2, 1, 0)], "numer_sta": [7510], "rr3": [2.5]}
+            )
+            s3_parquet_objects["esquilaplu/stations/7520/2021/01.parquet"] = pd.DataFrame(
+                {"date": [dt.datetime(2021, 1, 31, 6)], "numer_sta": [7520], "rr3": [float("nan")]}
+            )
+            laps = [Laps(start_time=dt.datetime(2021, 1, 31, 21), duration_hours=3)]
+
+            # When
+            repository.update_rollups(laps)
+
+            # Then
+            saved = self._saved_frames(mock_s3_client)
+            assert_frame_equals(
+                saved["esquilaplu/rollups/daily.parquet"],
+                pd.DataFrame(
+                    {
+                        "numer_sta": [7510, 7520],
+                        "period": [dt.datetime(2021, 1, 31), dt.datetime(2021, 1, 31)],
+                        "rainfall_mm": [3.5, 0.0],
+                        "nb_laps": [3, 0],
+                    }
+                ),
+            )
+            assert_frame_equals(
+                saved["esquilaplu/rollups/monthly.parquet"],
+                pd.DataFrame(
+                    {
+                        "numer_sta": [7510, 7520],
+                        "period": [dt.datetime(2021, 1, 1), dt.datetime(2021, 1, 1)],
+                        "rainfall_mm": [3.5, 0.0],
+                        "nb_laps": [3, 0],
+                    }
+                ),
+            )
+            assert_frame_equals(
+                saved["esquilaplu/rollups/yearly.parquet"],
+                pd.DataFrame(
+                    {
+                        "numer_sta": [7510, 7520],
+                        "period": [dt.datetime(2021, 1, 1), dt.datetime(2021, 1, 1)],
+                        "rainfall_mm": [3.5, 0.0],
+                        "nb_laps": [3, 0],
+                    }
+                ),
+            )
+
+        def test_should_write_rollups_in_row_groups(
+            self, repository, mock_s3_client, mock_stations_listing, s3_parquet_objects
+        ):
+            # Given
+            repository.ROLLUP_ROW_GROUP_SIZE = 1
+            s3_parquet_objects["esquilaplu/stations/7510/2021/01.parquet"] = pd.DataFrame(
+                {"date": [dt.datetime(2021, 1, 31, 3)], "numer_sta": [7510], "rr3": [1.0]}
+            )
+            s3_parquet_objects["esquilaplu/stations/7520/2021/01.parquet"] = pd.DataFrame(
+                {"date": [dt.datetime(2021, 1, 31, 3)], "numer_sta": [7520], "rr3": [2.0]}
+            )
+            laps = [Laps(start_time=dt.datetime(2021, 1, 31, 0), duration_hours=3)]
+
+            # When
+            repository.update_rollups(laps)
+
+            # Then
+            bodies = {kwargs["Key"]: kwargs["Body"] for _, kwargs in mock_s3_client.put_object.call_args_list}
+            assert pq.ParquetFile(io.BytesIO(bodies["esquilaplu/rollups/daily.parquet"])).num_row_groups == 2
+
+        def test_should_only_replace_touched_periods(
+            self, repository, mock_s3_client, mock_stations_listing, s3_parquet_objects
+        ):
+            # Given
+            s3_parquet_objects["esquilaplu/stations/7510/2021/01.parquet"] = pd.DataFrame(
+                {"date": [dt.datetime(2021, 1, 2, 3)], "numer_sta": [7510], "rr3": [1.0]}
+            )
+            s3_parquet_objects["esquilaplu/rollups/daily.parquet"] = pd.DataFrame(
+                {
+                    "numer_sta": [7510, 7510],
+                    "period": [dt.datetime(2021, 1, 1), dt.datetime(2021, 1, 2)],
+                    "rainfall_mm": [2.0, 0.0],
+                    "nb_laps": [8, 1],
+                }
+            )
+            laps = [Laps(start_time=dt.datetime(2021, 1, 2, 0), duration_hours=3)]
+
+            # When
+            repository.update_rollups(laps)
+
+            # Then
+            saved = self._saved_frames(mock_s3_client)
+            assert_frame_equals(
+                saved["esquilaplu/rollups/daily.parquet"],
+                pd.DataFrame(
+                    {
+                        "numer_sta": [7510, 7510],
+                        "period": [dt.datetime(2021, 1, 1), dt.datetime(2021, 1, 2)],
+                        "rainfall_mm": [2.0, 1.0],
+                        "nb_laps": [8, 1],
+                    }
+                ),
+            )
+            assert_frame_equals(
+                saved["esquilaplu/rollups/monthly.parquet"],
+                pd.DataFrame(
+                    {"numer_sta": [7510], "period": [dt.datetime(2021, 1, 1)], "rainfall_mm": [3.0], "nb_laps": [9]}
+                ),
+            )
+
+        def test_should_compute_climatology_of_touched_stations_over_their_history(
+            self, repository, mock_s3_client, mock_stations_listing, s3_parquet_objects
+        ):
+            # Given
+            s3_parquet_objects["esquilaplu/stations/7510/2021/01.parquet"] = pd.DataFrame(
+                {"date": [dt.datetime(2021, 1, 2, 3 * hour) for hour in range(1, 8)], "numer_sta": 7510, "rr3": 0.5}
+            )
+            s3_parquet_objects["esquilaplu/rollups/daily.parquet"] = pd.DataFrame(
+                {
+                    "numer_sta": [7510, 7520],
+                    "period": [dt.datetime(2020, 1, 2), dt.datetime(2020, 1, 2)],
+                    "rainfall_mm": [1.5, 3.0],
+                    "nb_laps": [8, 8],
+                }
+            )
+            laps = [Laps(start_time=dt.datetime(2021, 1, 2, 0), duration_hours=3)]
+
+            # When
+            repository.update_rollups(laps)
+
+            # Then
+            saved = self._saved_frames(mock_s3_client)
+            assert "esquilaplu/climatology/7520.parquet" not in saved
+            climatology = saved["esquilaplu/climatology/7510.parquet"].set_index(["scope", "key"])
+            assert climatology.loc[("day", 2), "nb_samples"] == 2
+            assert climatology.loc[("day", 2), "mean_mm"] == 2.5
+
+        def test_should_merge_touched_observations_into_station_rainfall_index(
+            self, repository, mock_s3_client, mock_stations_listing, s3_parquet_objects
+        ):
+            # Given
+            s3_parquet_objects["esquilaplu/stations/7510/2021/01.parquet"] = pd.DataFrame(
+                {
+                    "date": [dt.datetime(2021, 1, 2, 3), dt.datetime(2021, 1, 2, 9)],
+                    "numer_sta": [7510, 7510],
+                    "rr3": [1.0, 2.0],
+                }
+            )
+            s3_parquet_objects["esquilaplu/index/rainfall/7510.parquet"] = pd.DataFrame(
+                {
+                    "slot": [dt.datetime(2021, 1, 1, 21)],
+                    "rainfall_mm": pd.Series([4.0], dtype="float32"),
+                    "valid": [True],
+                    "cumulative_mm": [4.0],
+                    "valid_count": pd.Series([1], dtype="int32"),
+                }
+            )
+            laps = [Laps(start_time=dt.datetime(2021, 1, 2, 0), duration_hours=3)]
+
+            # When
+            repository.update_rollups(laps)
+
+            # Then
+            assert_frame_equals(
+                self._saved_frames(mock_s3_client)["esquilaplu/index/rainfall/7510.parquet"],
+                pd.DataFrame(
+                    {
+                        "slot": [dt.datetime(2021, 1, 1, 21) + dt.timedelta(hours=3 * i) for i in range(4)],
+                        "rainfall_mm": pd.Series([4.0, 1.0, 0.0, 2.0], dtype="float32"),
+                        "valid": [True, True, False, True],
+                        "cumulative_mm": [4.0, 5.0, 5.0, 7.0],
+                        "valid_count": pd.Series([1, 2, 2, 3], dtype="int32"),
+                    }
+                ),
+            )
+
+        def test_should_publish_station_rainfall_series_as_arrow_file(
+            self, repository, mock_s3_client, mock_stations_listing, s3_parquet_objects
+        ):
+            # Given
+            s3_parquet_objects["esquilaplu/stations/7510/2021/01.parquet"] = pd.DataFrame(
+                {
+                    "date": [dt.datetime(2021, 1, 2, 3), dt.datetime(2021, 1, 2, 9)],
+                    "numer_sta": [7510, 7510],
+                    "rr3": [1.0, None],
+                }
+            )
+            laps = [Laps(start_time=dt.datetime(2021, 1, 2, 0), duration_hours=3)]
+
+            # When
+            repository.update_rollups(laps)
+
+            # Then
+            assert_frame_equals(
+                self._saved_frames(mock_s3_client)["esquilaplu/index/rainfall/7510.arrow"],
+                pd.DataFrame(
+                    {
+                        "slot": [dt.datetime(2021, 1, 2, 0), dt.datetime(2021, 1, 2, 3), dt.datetime(2021, 1, 2, 6)],
+                        "rainfall_mm": pd.Series([1.0, 0.0, 0.0], dtype="float32"),
+                        "valid": pd.Series([1, 0, 0], dtype="uint8"),
+                        "cumulative_mm": [1.0, 1.0, 1.0],
+                        "valid_count": pd.Series([1, 1, 1], dtype="int32"),
+                    }
+                ),
+            )
+
+        def test_should_do_nothing_when_no_laps(self, repository, mock_s3_client):
+            # When
+            repository.update_rollups([])
+
+            # Then
+            mock_s3_client.put_object.assert_not_called()
+
+    class TestGetStationRecords:
+        def test_should_read_only_the_station_partitions_of_the_range(
+            self, repository, mock_s3_client, s3_parquet_objects
+        ):
+            # Given
+            s3_parquet_objects["esquilaplu/stations/7510/2021/01.parquet"] = pd.DataFrame(
+                {
+                    "date": [dt.datetime(2021, 1, 31, 18), dt.datetime(2021, 1, 31, 21), dt.datetime(2021, 2, 1, 0)],
+                    "numer_sta": [7510, 7510, 7510],
+                    "rr3": [9.0, 0.2, 1.0],
+                }
+            )
+            s3_parquet_objects["esquilaplu/stations/7510/2021/02.parquet"] = pd.DataFrame(
+                {
+                    "date": [dt.datetime(2021, 2, 1, 3), dt.datetime(2021, 2, 1, 6)],
+                    "numer_sta": [7510, 7510],
+                    "rr3": [2.0, 9.0],
+                }
+            )
+
+            # When
+            result = repository.get_station_records(
+                station_id=7510, start_time=dt.datetime(2021, 1, 31, 18), end_time=dt.datetime(2021, 2, 1, 0)
+            )
+
+            # Then
+            assert sorted(kwargs["Key"] for _, kwargs in mock_s3_client.get_object.call_args_list) == [
+                "esquilaplu/stations/7510/2021/01.parquet",
+                "esquilaplu/stations/7510/2021/02.parquet",
+            ]
+            assert [(record.laps.start_time, record.rainfall_mm) for record in result] == [
+                (dt.datetime(2021, 1, 31, 18), 0.2),
+                (dt.datetime(2021, 1, 31, 21), 1.0),
+                (dt.datetime(2021, 2, 1, 0), 2.0),
+            ]
+
+        def test_should_return_empty_list_when_no_partition(self, repository, s3_parquet_objects):
+            # When
+            result = repository.get_station_records(
+                station_id=7510, start_time=dt.datetime(2021, 1, 1), end_time=dt.datetime(2021, 1, 2)
+            )
+
+            # Then
+            assert result == []
+
+    class TestGetDailyRainfall:
+        def test_should_return_station_daily_rollup_of_the_range(self, repository, s3_parquet_objects):
+            # Given
+            s3_parquet_objects["esquilaplu/rollups/daily.parquet"] = pd.DataFrame(
+                {
+                    "numer_sta": [7510, 7510, 7510, 7520],
+                    "period": [
+                        dt.datetime(2021, 1, 1),
+                        dt.datetime(2021, 1, 2),
+                        dt.datetime(2021, 1, 3),
+                        dt.datetime(2021, 1, 2),
+                    ],
+                    "rainfall_mm": [1.0, 2.0, 3.0, 4.0],
+                    "nb_laps": [8, 8, 8, 8],
+                }
+            )
+
+            # When
+            result = repository.get_daily_rainfall(
+                station_id=7510, start_date=dt.date(2021, 1, 2), end_date=dt.date(2021, 1, 3)
+            )
+
+            # Then
+            assert result == {dt.date(2021, 1, 2): 2.0, dt.date(2021, 1, 3): 3.0}
+
+        def test_should_return_empty_dict_when_no_rollup(self, repository, s3_parquet_objects):
+            # When
+            result = repository.get_daily_rainfall(
+                station_id=7510, start_date=dt.date(2021, 1, 2), end_date=dt.date(2021, 1, 3)
+            )
+
+            # Then
+            assert result == {}
+
+    class TestGetWindowRainfall:
+        def test_should_compute_window_rainfall_from_station_index(
+            self, repository, mock_s3_client, s3_parquet_objects
+        ):
+            # Given
+            s3_parquet_objects["esquilaplu/index/rainfall/7510.parquet"] = pd.DataFrame(
+                {
+                    "slot": [dt.datetime(2021, 1, 1, 0), dt.datetime(2021, 1, 1, 3), dt.datetime(2021, 1, 1, 6)],
+                    "rainfall_mm": pd.Series([1.0, 0.0, 2.0], dtype="float32"),
+                    "valid": [True, False, True],
+                    "cumulative_mm": [1.0, 1.0, 3.0],
+                    "valid_count": pd.Series([1, 1, 2], dtype="int32"),
+                }
+            )
+
+            # When
+            result = repository.get_window_rainfall(
+                station_id=7510, start_time=dt.datetime(2021, 1, 1, 3), end_time=dt.datetime(2021, 1, 1, 9)
+            )
+
+            # Then
+            mock_s3_client.get_object.assert_called_once_with(
+                Bucket="mybucket", Key="esquilaplu/index/rainfall/7510.parquet"
+            )
+            assert result == WindowRainfall(rainfall_mm=2.0, nb_laps=3, nb_valid_laps=1)
+
+        def test_should_return_empty_window_when_no_index(self, repository, s3_parquet_objects):
+            # When
+            result = repository.get_window_rainfall(
+                station_id=7510, start_time=dt.datetime(2021, 1, 1, 0), end_time=dt.datetime(2021, 1, 1, 21)
+            )
+
+            # Then
+            assert result == WindowRainfall(rainfall_mm=0.0, nb_laps=8, nb_valid_laps=0)
+
+    class TestGetConsolidatedLaps:
+        def test_should_read_laps_from_history_manifest(self, repository, mock_s3_client):
+            # Given
+            mock_s3_client.get_object.return_value = {
+                "Body": io.BytesIO(b'{"laps": ["2021-01-01T00:00:00", "2021-01-01T03:00:00"]}')
+            }
+
+            # When
+            result = repository.get_consolidated_laps()
+
+            # Then
+            mock_s3_client.get_object.assert_called_once_with(Bucket="mybucket", Key="esquilaplu/history/manifest.json")
+            assert result == [
+                Laps(start_time=dt.datetime(2021, 1, 1, 0), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 1, 3), duration_hours=3),
+            ]
+
+        def test_should_return_empty_list_when_no_manifest(self, repository, mock_s3_client, no_such_key):
+            # Given
+            mock_s3_client.get_object.side_effect = no_such_key
+
+            # When
+            result = repository.get_consolidated_laps()
+
+            # Then
+            assert result == []
+
+    class TestStations:
+        def test_should_save_stations_as_csv_metadata(self, repository, mock_s3_client):
+            # When
+            repository.save_stations(
+                [Station(id=7510, name="BORDEAUX-MERIGNAC", latitude=44.830667, longitude=-0.691333)]
+            )
+
+            # Then
+            mock_s3_client.put_object.assert_called_once_with(
+                Bucket="mybucket",
+                Key="esquilaplu/metadata/stations.csv",
+                Body="ID;Nom;Latitude;Longitude\n7510;BORDEAUX-MERIGNAC;44.830667;-0.691333\n",
+            )
+
+        def test_should_load_saved_stations(self, repository, mock_s3_client):
+            # Given
+            mock_s3_client.get_object.return_value = {
+                "Body": io.BytesIO(b"ID;Nom;Latitude;Longitude\n7510;BORDEAUX-MERIGNAC;44.830667;-0.691333\n")
+            }
+
+            # When
+            result = repository.load_stations()
+
+            # Then
+            mock_s3_client.get_object.assert_called_once_with(Bucket="mybucket", Key="esquilaplu/metadata/stations.csv")
+            assert result == [Station(id=7510, name="BORDEAUX-MERIGNAC", latitude=44.830667, longitude=-0.691333)]
+
+        def test_should_return_no_station_when_never_saved(self, repository, mock_s3_client, no_such_key):
+            # Given
+            mock_s3_client.get_object.side_effect = no_such_key
+
+            # When
+            result = repository.load_stations()
+
+            # Then
+            assert result == []
+
+    class TestCollectState:
+        def test_should_save_collect_state_as_json(self, repository, mock_s3_client):
+            # Given
+            state = CollectState(
+                since=dt.datetime(2021, 1, 1, 0),
+                watermark=dt.datetime(2021, 1, 1, 12),
+                holes=[dt.datetime(2021, 1, 1, 6)],
+            )
+
+            # When
+            repository.save_collect_state(state, station_id=7510)
+
+            # Then
+            mock_s3_client.put_object.assert_called_once_with(
+                Bucket="mybucket",
+                Key="esquilaplu/state/collect/7510.json",
+                Body=(
+                    '{"since": "2021-01-01 00:00:00", "watermark": "2021-01-01 12:00:00", '
+                    '"holes": ["2021-01-01 06:00:00"], "laps_duration_hr": 3, "failures": []}'
+                ),
+            )
+
+        def test_should_load_saved_collect_state(self, repository, mock_s3_client):
+            # Given
+            mock_s3_client.get_object.return_value = {
+                "Body": io.BytesIO(
+                    b'{"since": "2021-01-01 00:00:00", "watermark": null, "holes": [], "laps_duration_hr": 3}'
+                )
+            }
+
+            # When
+            result = repository.load_collect_state(station_id=7510)
+
+            # Then
+            mock_s3_client.get_object.assert_called_once_with(
+                Bucket="mybucket", Key="esquilaplu/state/collect/7510.json"
+            )
+            assert result == CollectState(since=dt.datetime(2021, 1, 1, 0))
+
+        def test_should_return_none_when_no_collect_state(self, repository, mock_s3_client, no_such_key):
+            # Given
+            mock_s3_client.get_object.side_effect = no_such_key
+
+            # When
+            result = repository.load_collect_state(station_id=7510)
+
+            # Then
+            assert result is None
+
+    class TestSaveConsolidatedDatasets:
+        def test_should_merge_datasets_into_monthly_history_partitions_and_manifest(
+            self, repository, mock_s3_client, s3_parquet_objects
+        ):
+            # Given
+            s3_parquet_objects["esquilaplu/history/2021/01.parquet"] = pd.DataFrame(
+                {"date": [dt.datetime(2021, 1, 31, 21)], "numer_sta": [7510], "rr3": [9.0]}
+            )
+            dataset = pd.DataFrame(
+                {
+                    "date": [dt.datetime(2021, 1, 31, 21), dt.datetime(2021, 1, 31, 21), dt.datetime(2021, 2, 1, 0)],
+                    "numer_sta": [7520, 7510, 7510],
+                    "rr3": [1.0, 0.5, 2.0],
+                }
+            )
+            laps = [Laps(start_time=dt.datetime(2021, 1, 31, 18), duration_hours=3)]
+
+            # When
+            repository.save_consolidated_datasets([dataset], laps)
+
+            # Then
+            saved = {kwargs["Key"]: kwargs["Body"] for _, kwargs in mock_s3_client.put_object.call_args_list}
+            assert_frame_equals(
+                pd.read_parquet(io.BytesIO(saved["esquilaplu/history/2021/01.parquet"])),
+                pd.DataFrame(
+                    {
+                        "date": [dt.datetime(2021, 1, 31, 21), dt.datetime(2021, 1, 31, 21)],
+                        "numer_sta": [7510, 7520],
+                        "rr3": [0.5, 1.0],
+                    }
+                ),
+            )
+            assert_frame_equals(
+                pd.read_parquet(io.BytesIO(saved["esquilaplu/history/2021/02.parquet"])),
+                pd.DataFrame({"date": [dt.datetime(2021, 2, 1, 0)], "numer_sta": [7510], "rr3": [2.0]}),
+            )
+            assert saved["esquilaplu/history/manifest.json"] == '{"laps": ["2021-01-31T18:00:00"]}'
@@ -0,0 +1,326 @@
+import datetime as dt
+
+import pandas as pd
+import pytest
+from easy_testing import DataFrameBuilder, assert_frame_equals
+
+from src.domain.entities import CollectState, Record
+from src.domain.value_objects import Laps, Station, WindowRainfall
+from src.infrastructure.repositories.app_sqlite import AppSQLiteRepository
+
+
+def select_rollup(repository: AppSQLiteRepository, name: str) -> list[tuple]:
+    return repository._connection.execute(
+        "SELECT numer_sta, period, rainfall_mm, nb_laps FROM rollups WHERE name = ? ORDER BY numer_sta, period",
+        (name,),
+    ).fetchall()
+
+
+class TestAppSQLiteRepository:
+    @pytest.fixture
+    def repository(self):
+        return AppSQLiteRepository(path=":memory:")
+
+    @pytest.fixture
+    def dataset(self):
+        return (
+            DataFrameBuilder.a_dataframe()
+            .with_columns(["date", "numer_sta", "pmer", "rr1", "rr3", "rr6", "rr12", "rr24"])
+            .with_dtypes(date="datetime64[ns]", rr1="float64", rr3="float64", rr6="float64", rr12="float64")
+            .with_row(
+                date=dt.datetime(2021, 1, 30, 3), numer_sta=7510, pmer=101870, rr1=0.1, rr3=0.2, rr6=0, rr12=0, rr24=1.5
+            )
+            .with_row(date=dt.datetime(2021, 1, 30, 3), numer_sta=7520, pmer="mq", rr1=0, rr3=0, rr6=0, rr12=0, rr24=0)
+            .build()
+        )
+
+    class TestGetAvailableLapsSince:
+        def test_should_return_laps_of_saved_raw_datasets(self, repository, dataset):
+            # Given
+            repository.save_raw_dataset(dataset, Laps(start_time=dt.datetime(2021, 1, 29, 21), duration_hours=3))
+            repository.save_raw_dataset(dataset, Laps(start_time=dt.datetime(2021, 1, 30, 0), duration_hours=3))
+            repository.save_raw_dataset(dataset, Laps(start_time=dt.datetime(2021, 1, 29, 18), duration_hours=3))
+
+            # When
+            result = repository.get_available_laps_since(dt.datetime(2021, 1, 29, 20))
+
+            # Then
+            assert result == [
+                Laps(start_time=dt.datetime(2021, 1, 29, 21), duration_hours=3),
+                Laps(start_time=dt.datetime(2021, 1, 30, 0), duration_hours=3),
+            ]
+
+        def test_should_return_empty_list_when_nothing_saved(self, repository):
+            # When
+            result = repository.get_available_laps_since(dt.datetime(2021, 1, 1))
+
+            # Then
+            assert result == []
+
+    class TestLoadRawDataset:
+        def test_should_load_saved_station_rows(self, repository, dataset):
+            # Given
+            laps = Laps(start_time=dt.datetime(2021, 1, 30, 0), duration_hours=3)
+            repository.save_raw_dataset(dataset, laps)
+            expected = pd.DataFrame(
+                {
+                    "date": [dt.datetime(2021, 1, 30, 3), dt.datetime(2021, 1, 30, 3)],
+                    "numer_sta": [7510, 7520],
+                    "pmer": [101870.0, None],
+                    "rr1": [0.1, 0.0],
+                    "rr3": [0.2, 0.0],
+                    "rr6": [0.0, 0.0],
+                    "rr12": [0.0, 0.0],
+                    "rr24": [1.5, 0.0],
+                }
+            )
+
+            # When
+            result = repository.load_raw_dataset(laps)
+
+            # Then
+            assert_frame_equals(result, expected)
+
+    class TestSaveManyRecords:
+        def test_should_upsert_records(self, repository):
+            # Given
+            repository.save_many_records(
+                [Record(laps=Laps(start_time=dt.datetime(2021, 1, 30, 0), duration_hours=3), rainfall_mm=0.1)],
+                station_id=7510,
+            )
+            repository.save_many_records(
+                [Record(laps=Laps(start_time=dt.datetime(2021, 1, 30, 0), duration_hours=3), rainfall_mm=0.4)],
+                station_id=7520,
+            )
+
+            # When
+            repository.save_many_records(
+                [
+                    Record(laps=Laps(start_time=dt.datetime(2021, 1, 30, 0), duration_hours=3), rainfall_mm=0.2),
+                    Record(laps=Laps(start_time=dt.datetime(2021, 1, 30, 3), duration_hours=3), rainfall_mm=0.3),
+                ],
+                station_id=7510,
+            )
+
+            # Then
+            assert repository._connection.execute(
+                "SELECT * FROM records ORDER BY numer_sta, start_time"
+            ).fetchall() == [
+                (7510, "2021-01-30 00:00:00", 3, 0.2),
+                (7510, "2021-01-30 03:00:00", 3, 0.3),
+                (7520, "2021-01-30 00:00:00", 3, 0.4),
+            ]
+
+    class TestGetRecordedLapsSince:
+        def test_should_return_recorded_laps_of_station_only(self, repository):
+            # Given
+            repository.save_many_records(
+                [
+                    Record(laps=Laps(start_time=dt.datetime(2021, 1, 29, 21), duration_hours=3), rainfall_mm=0.1),
+                    Record(laps=Laps(start_time=dt.datetime(2021, 1, 30, 3), duration_hours=3), rainfall_mm=0.2),
+                ],
+                station_id=7510,
+            )
+            repository.save_many_records(
+                [Record(laps=Laps(start_time=dt.datetime(2021, 1, 30, 0), duration_hours=3), rainfall_mm=0.4)],
+                station_id=7520,
+            )
+
+            # When
+            result = repository.get_recorded_laps_since(station_id=7510, since=dt.datetime(2021, 1, 30))
+
+            # Then
+            assert result == [Laps(start_time=dt.datetime(2021, 1, 30, 3), duration_hours=3)]
+
+    class TestUpdateRollups:
+        @staticmethod
+        def _observations(*rows: tuple[dt.datetime, int, float]) -> pd.DataFrame:
+            return pd.DataFrame(
+                {
+                    "date": [row[0] for row in rows],
+                    "numer_sta": [row[1] for row in rows],
+                    "rr3": [row[2] for row in rows],
+                }
+            )
+
+        def test_should_build_rollups_from_observations(self, repository):
+            # Given
+            repository.save_station_datasets(
+                [
+                    self._observations(
+                        (dt.datetime(2021, 1, 31, 0), 7510, 4.0),
+                        (dt.datetime(2021, 1, 31, 3), 7510, 1.0),
+                        (dt.datetime(2021, 2, 1, 0), 7510, 2.5),
+                        (dt.datetime(2021, 1, 31, 21), 7510, -0.1),
+                        (dt.datetime(2021, 1, 31, 6), 7520, None),
+                    )
+                ]
+            )
+
+            # When
+            repository.update_rollups([Laps(start_time=dt.datetime(2021, 1, 31, 21), duration_hours=3)])
+
+            # Then
+            assert select_rollup(repository, "daily") == [
+                (7510, "2021-01-31", 3.5, 3),
+                (7520, "2021-01-31", 0.0, 0),
+            ]
+            assert select_rollup(repository, "monthly") == [
+                (7510, "2021-01-01", 3.5, 3),
+                (7520, "2021-01-01", 0.0, 0),
+            ]
+            assert select_rollup(repository, "yearly") == [
+                (7510, "2021-01-01", 3.5, 3),
+                (7520, "2021-01-01", 0.0, 0),
+            ]
+
+        def test_should_only_replace_touched_periods(self, repository):
+            # Given
+            repository.save_station_datasets([self._observations((dt.datetime(2021, 1, 1, 3), 7510, 2.0))])
+            repository.update_rollups([Laps(start_time=dt.datetime(2021, 1, 1, 0), duration_hours=3)])
+            repository.save_station_datasets([self._observations((dt.datetime(2021, 1, 2, 3), 7510, 1.0))])
+
+            # When
+            repository.update_rollups([Laps(start_time=dt.datetime(2021, 1, 2, 0), duration_hours=3)])
+
+            # Then
+            assert select_rollup(repository, "daily") == [
+                (7510, "2021-01-01", 2.0, 1),
+                (7510, "2021-01-02", 1.0, 1),
+            ]
+            assert select_rollup(repository, "monthly") == [(7510, "2021-01-01", 3.0, 2)]
+
+    class TestGetStationRecords:
+        def test_should_return_station_records_of_the_range(self, repository):
+            # Given
+            repository.save_station_datasets(
+                [
+                    pd.DataFrame(
+                        {
+                            "date": [
+                                dt.datetime(2021, 1, 1, 3),
+                                dt.datetime(2021, 1, 1, 6),
+                                dt.datetime(2021, 1, 1, 9),
+                                dt.datetime(2021, 1, 1, 6),
+                            ],
+                            "numer_sta": [7510, 7510, 7510, 7520],
+                            "rr3": [0.1, 0.2, 0.3, 5.0],
+                        }
+                    )
+                ]
+            )
+
+            # When
+            result = repository.get_station_records(
+                station_id=7510, start_time=dt.datetime(2021, 1, 1, 3), end_time=dt.datetime(2021, 1, 1, 6)
+            )
+
+            # Then
+            assert [(record.laps.start_time, record.rainfall_mm) for record in result] == [
+                (dt.datetime(2021, 1, 1, 3), 0.2),
+                (dt.datetime(2021, 1, 1, 6), 0.3),
+            ]
+
+    class TestGetDailyRainfall:
+        def test_should_return_station_daily_rollup_of_the_range(self, repository):
+            # Given
+            repository.save_station_datasets(
+                [
+                    pd.DataFrame(
+                        {
+                            "date": [
+                                dt.datetime(2021, 1, 1, 3),
+                                dt.datetime(2021, 1, 2, 3),
+                                dt.datetime(2021, 1, 2, 3),
+                            ],
+                            "numer_sta": [7510, 7510, 7520],
+                            "rr3": [1.0, 2.0, 5.0],
+                        }
+                    )
+                ]
+            )
+            repository.update_rollups(
+                [
+                    Laps(start_time=dt.datetime(2021, 1, 1, 0), duration_hours=3),
+                    Laps(start_time=dt.datetime(2021, 1, 2, 0), duration_hours=3),
+                ]
+            )
+
+            # When
+            result = repository.get_daily_rainfall(
+                station_id=7510, start_date=dt.date(2021, 1, 2), end_date=dt.date(2021, 1, 3)
+            )
+
+            # Then
+            assert result == {dt.date(2021, 1, 2): 2.0}
+
+    class TestGetWindowRainfall:
+        def test_should_sum_station_observations_of_the_window(self, repository):
+            # Given
+            repository.save_station_datasets(
+                [
+                    pd.DataFrame(
+                        {
+                            "date": [
+                                dt.datetime(2021, 1, 1, 3),
+                                dt.datetime(2021, 1, 1, 6),
+                                dt.datetime(2021, 1, 1, 9),
+                                dt.datetime(2021, 1, 1, 12),
+                                dt.datetime(2021, 1, 1, 6),
+                            ],
+                            "numer_sta": [7510, 7510, 7510, 7510, 7520],
+                            "rr3": [0.5, -0.1, None, 2.0, 5.0],
+                        }
+                    )
+                ]
+            )
+
+            # When
+            result = repository.get_window_rainfall(
+                station_id=7510, start_time=dt.datetime(2021, 1, 1, 1), end_time=dt.datetime(2021, 1, 1, 9)
+            )
+
+            # Then
+            assert result == WindowRainfall(rainfall_mm=2.0, nb_laps=3, nb_valid_laps=2)
+
+    class TestStations:
+        def test_should_replace_saved_stations(self, repository):
+            # Given
+            repository.save_stations(
+                [Station(id=7020, name="PTE DE LA HAGUE", latitude=49.725167, longitude=-1.939833)]
+            )
+            stations = [
+                Station(id=7110, name="BREST-GUIPAVAS", latitude=48.444167, longitude=-4.412),
+                Station(id=7510, name="BORDEAUX-MERIGNAC", latitude=44.830667, longitude=-0.691333),
+            ]
+
+            # When
+            repository.save_stations(stations)
+
+            # Then
+            assert repository.load_stations() == stations
+
+    class TestCollectState:
+        def test_should_load_saved_collect_state(self, repository):
+            # Given
+            state = CollectState(
+                since=dt.datetime(2021, 1, 1, 0),
+                watermark=dt.datetime(2021, 1, 1, 12),
+                holes=[dt.datetime(2021, 1, 1, 6)],
+            )
+            repository.save_collect_state(CollectState(since=dt.datetime(2020, 1, 1, 0)), station_id=7510)
+            repository.save_collect_state(state, station_id=7510)
+            repository.save_collect_state(CollectState(since=dt.datetime(2020, 1, 1, 0)), station_id=7520)
+
+            # When
+            result = repository.load_collect_state(station_id=7510)
+
+            # Then
+            assert result == state
+
+        def test_should_return_none_when_never_saved(self, repository):
+            # When
+            result = repository.load_collect_state(station_id=7510)
+
+            # Then
+            assert result is None
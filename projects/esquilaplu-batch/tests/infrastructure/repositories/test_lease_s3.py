@@ -0,0 +1,122 @@
+import datetime as dt
+import io
+
+import pytest
+from botocore.exceptions import ClientError
+
+from src.domain.entities import Lease
+from src.domain.services.lease import LeaseServiceImpl
+from src.infrastructure.repositories.lease_s3 import S3LeaseRepository
+
+
+class LocalS3Client:
+    """Local S3 stand-in keeping the objects in memory, shared by every client of a test."""
+
+    def __init__(self) -> None:
+        self.objects: dict[tuple[str, str], bytes] = {}
+
+    def get_object(self, Bucket: str, Key: str) -> dict:
+        if (Bucket, Key) not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def put_object(self, Bucket: str, Key: str, Body: str | bytes) -> dict:
+        self.objects[(Bucket, Key)] = Body.encode() if isinstance(Body, str) else Body
+        return {}
+
+
+class TestS3LeaseRepository:
+    @pytest.fixture
+    def s3_client(self):
+        return LocalS3Client()
+
+    @pytest.fixture(autouse=True)
+    def mock_boto3(self, mocker, s3_client):
+        mock = mocker.patch(f"{S3LeaseRepository.__module__}.boto3")
+        mock.client.return_value = s3_client
+        return mock
+
+    @pytest.fixture
+    def repository(self):
+        return S3LeaseRepository(
+            bucket="mybucket",
+            root_key="esquilaplu",
+            secret_key="azerty",
+            access_key="coucou",
+            endpoint_url="http://localhost:9000",
+        )
+
+    def test_should_init_s3_client_with_endpoint(self, repository, mock_boto3):
+        # Then
+        mock_boto3.client.assert_called_once_with(
+            "s3", aws_access_key_id="coucou", aws_secret_access_key="azerty", endpoint_url="http://localhost:9000"
+        )
+
+    def test_should_write_lease_as_json_under_root_key(self, repository, s3_client):
+        # When
+        repository.put_lease(
+            Lease(name="backfill-stations/2021/2021-01", owner="worker-1", expires_at=dt.datetime(2021, 1, 1, 12))
+        )
+
+        # Then
+        assert s3_client.objects == {
+            ("mybucket", "esquilaplu/leases/backfill-stations/2021/2021-01.json"): (
+                b'{"name": "backfill-stations/2021/2021-01", "owner": "worker-1", '
+                b'"expires_at": "2021-01-01 12:00:00", "done": false}'
+            )
+        }
+
+    def test_should_read_written_lease(self, repository):
+        # Given
+        lease = Lease(name="2021-01", owner="worker-1", expires_at=dt.datetime(2021, 1, 1, 12), done=True)
+        repository.put_lease(lease)
+
+        # When
+        result = repository.get_lease("2021-01")
+
+        # Then
+        assert result == lease
+
+    def test_should_return_none_when_no_lease(self, repository):
+        # When
+        result = repository.get_lease("2021-01")
+
+        # Then
+        assert result is None
+
+    def test_should_let_workers_split_months_without_overlap(self, repository):
+        # Given
+        now = dt.datetime(2021, 1, 1, 12)
+        workers = {
+            owner: LeaseServiceImpl(
+                lease_repository=repository,
+                owner=owner,
+                namespace="backfill-stations/2021",
+                clock=lambda: now,
+                sleep=lambda seconds: None,
+            )
+            for owner in ["worker-1", "worker-2"]
+        }
+        months = ["2021-01", "2021-02", "2021-03"]
+
+        # When
+        handled_months = {"worker-1": [], "worker-2": []}
+        leases = {}
+        for index, month in enumerate(months):
+            # the workers take turns at being the first one to reach a month
+            for owner in ["worker-1", "worker-2"] if index % 2 == 0 else ["worker-2", "worker-1"]:
+                lease = workers[owner].acquire(name=month)
+                if lease is not None:
+                    handled_months[owner].append(month)
+                    leases[month] = lease
+        workers["worker-1"].complete(leases["2021-01"])
+
+        # the leases still in progress expire, the completed one is never handed out again
+        now += dt.timedelta(hours=1)
+        completed_again = workers["worker-2"].acquire(name="2021-01")
+        taken_over = workers["worker-2"].acquire(name="2021-03")
+
+        # Then
+        assert handled_months == {"worker-1": ["2021-01", "2021-03"], "worker-2": ["2021-02"]}
+        assert completed_again is None
+        assert taken_over.owner == "worker-2"
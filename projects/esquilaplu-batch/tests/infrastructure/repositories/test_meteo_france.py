@@ -6,8 +6,8 @@ import requests
 from easy_testing import DataFrameBuilder, assert_called_once_with_frame
 
 from src.domain.entities import Record
-from src.domain.exceptions import WeatherCollectionError
-from src.domain.value_objects import Laps
+from src.domain.exceptions import WeatherCollectionError, WeatherDataNotFoundError
+from src.domain.value_objects import Laps, Station
 from src.infrastructure.repositories.app_s3 import AppS3Repository
 from src.infrastructure.repositories.meteo_france import MeteoFranceRepository
 
@@ -95,6 +95,17 @@ class TestMeteoFranceRepository:
             with pytest.raises(WeatherCollectionError):
                 repository.collect_record(laps)
 
+        def test_should_raise_not_found_error_when_file_does_not_exist(self, repository, mock_requests):
+            # Given
+            mock_requests.get.return_value = MagicMock(
+                status_code=404, raise_for_status=MagicMock(side_effect=requests.exceptions.HTTPError)
+            )
+            laps = Laps(start_time=dt.datetime(2021, 1, 30, 10, 0, 0), duration_hours=3)
+
+            # When & Then
+            with pytest.raises(WeatherDataNotFoundError):
+                repository.collect_record(laps)
+
         def test_should_return_record_from_factory(self, repository, mock_requests, mock_factory):
             # Given
             mock_requests.get.return_value = MagicMock(
@@ -128,7 +139,7 @@ class TestMeteoFranceRepository:
             result = repository.collect_record(laps)
 
             # Then
-            assert_called_once_with_frame(mock_factory.from_dataframe, dataframe, laps_duration_hr=3)
+            assert_called_once_with_frame(mock_factory.from_dataframe, dataframe, laps_duration_hr=3, station_id=7510)
             assert result == expected
 
         def test_should_save_raw_dataset_to_app_repository(
@@ -201,4 +212,51 @@ class TestMeteoFranceRepository:
             repository.collect_record(laps)
 
             # Then
-            assert_called_once_with_frame(mock_factory.from_dataframe, dataframe, laps_duration_hr=3)
+            assert_called_once_with_frame(mock_factory.from_dataframe, dataframe, laps_duration_hr=3, station_id=7510)
+
+    class TestExtractRecord:
+        def test_should_extract_record_of_repository_station_from_dataset(self, mock_app_repository, mock_factory):
+            # Given
+            repository = MeteoFranceRepository(app_repository=mock_app_repository, station_id=7520)
+            dataset = MagicMock()
+            laps = Laps(start_time=dt.datetime(2021, 1, 30, 0), duration_hours=3)
+
+            # When
+            result = repository.extract_record(dataset=dataset, laps=laps)
+
+            # Then
+            mock_factory.from_dataframe.assert_called_once_with(dataset, laps_duration_hr=3, station_id=7520)
+            assert result == mock_factory.from_dataframe.return_value
+
+    class TestCollectStations:
+        def test_should_return_stations_of_synop_stations_list(self, repository, mock_requests):
+            # Given
+            mock_requests.get.return_value = MagicMock(
+                text=(
+                    "ID;Nom;Latitude;Longitude;Altitude\n"
+                    "7510;BORDEAUX-MERIGNAC;44.830667;-0.691333;47\n"
+                    "7110;BREST-GUIPAVAS;48.444167;-4.412000;94\n"
+                )
+            )
+
+            # When
+            result = repository.collect_stations()
+
+            # Then
+            assert mock_requests.get.call_args.args == (
+                "https://donneespubliques.meteofrance.fr/donnees_libres/Txt/Synop/postesSynop.csv",
+            )
+            assert result == [
+                Station(id=7510, name="BORDEAUX-MERIGNAC", latitude=44.830667, longitude=-0.691333),
+                Station(id=7110, name="BREST-GUIPAVAS", latitude=48.444167, longitude=-4.412),
+            ]
+
+        def test_should_raise_collection_error_when_response_status_error(self, repository, mock_requests):
+            # Given
+            mock_requests.get.return_value = MagicMock(
+                raise_for_status=MagicMock(side_effect=requests.exceptions.HTTPError)
+            )
+
+            # When & Then
+            with pytest.raises(WeatherCollectionError):
+                repository.collect_stations()
@@ -0,0 +1,144 @@
+import io
+
+import pytest
+from botocore.exceptions import ClientError
+
+from src.domain.entities import MaintenanceCheckpoint
+from src.infrastructure.repositories.object_store_s3 import S3ObjectStoreRepository
+
+
+class LocalS3Client:
+    """Local S3 stand-in keeping the objects in memory, with pages of two keys."""
+
+    PAGE_SIZE = 2
+
+    def __init__(self) -> None:
+        self.objects: dict[tuple[str, str], bytes] = {}
+        self.delete_calls: list[list[str]] = []
+
+    def get_object(self, Bucket: str, Key: str) -> dict:
+        if (Bucket, Key) not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def head_object(self, Bucket: str, Key: str) -> dict:
+        if (Bucket, Key) not in self.objects:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        return {"ContentLength": len(self.objects[(Bucket, Key)])}
+
+    def put_object(self, Bucket: str, Key: str, Body: str | bytes) -> dict:
+        self.objects[(Bucket, Key)] = Body.encode() if isinstance(Body, str) else Body
+        return {}
+
+    def copy_object(self, Bucket: str, CopySource: dict, Key: str) -> dict:
+        if (CopySource["Bucket"], CopySource["Key"]) not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "CopyObject")
+        self.objects[(Bucket, Key)] = self.objects[(CopySource["Bucket"], CopySource["Key"])]
+        return {}
+
+    def delete_objects(self, Bucket: str, Delete: dict) -> dict:
+        keys = [item["Key"] for item in Delete["Objects"]]
+        self.delete_calls.append(keys)
+        for key in keys:
+            self.objects.pop((Bucket, key), None)
+        return {"Errors": [{"Key": key, "Code": "AccessDenied"} for key in keys if key.endswith(".lock")]}
+
+    def get_paginator(self, operation_name: str) -> "LocalS3Client":
+        return self
+
+    def paginate(self, Bucket: str, Prefix: str, StartAfter: str = "") -> list[dict]:
+        keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix))
+        keys = [key for key in keys if key > StartAfter]
+        return [
+            {"Contents": [{"Key": key} for key in keys[start:][: self.PAGE_SIZE]]}
+            for start in range(0, len(keys), self.PAGE_SIZE)
+        ]
+
+
+class TestS3ObjectStoreRepository:
+    @pytest.fixture
+    def s3_client(self):
+        client = LocalS3Client()
+        for key in ["2021-01-01-0.csv", "2021-01-01-3.csv", "2021-01-01-6.csv"]:
+            client.put_object(Bucket="mybucket", Key=f"esquilaplu/raw/meteofrance/{key}", Body="numer_sta;rr3")
+        return client
+
+    @pytest.fixture(autouse=True)
+    def mock_boto3(self, mocker, s3_client):
+        mock = mocker.patch(f"{S3ObjectStoreRepository.__module__}.boto3")
+        mock.client.return_value = s3_client
+        return mock
+
+    @pytest.fixture
+    def repository(self):
+        return S3ObjectStoreRepository(
+            bucket="mybucket", root_key="esquilaplu", secret_key="azerty", access_key="coucou", copy_workers=4
+        )
+
+    def test_should_list_keys_relative_to_root_key_page_by_page(self, repository):
+        # When
+        result = list(repository.list_keys(prefix="raw/meteofrance/", start_after="raw/meteofrance/2021-01-01-0.csv"))
+
+        # Then
+        assert result == [["raw/meteofrance/2021-01-01-3.csv", "raw/meteofrance/2021-01-01-6.csv"]]
+
+    def test_should_copy_objects_and_return_failed_sources(self, repository, s3_client):
+        # When
+        result = repository.copy_objects(
+            moves=[
+                ("raw/meteofrance/2021-01-01-3.csv", "raw/meteofrance/2021-01-01-03.csv"),
+                ("raw/meteofrance/2021-01-01-9.csv", "raw/meteofrance/2021-01-01-09.csv"),
+            ]
+        )
+
+        # Then
+        assert result == ["raw/meteofrance/2021-01-01-9.csv"]
+        assert s3_client.objects[("mybucket", "esquilaplu/raw/meteofrance/2021-01-01-03.csv")] == b"numer_sta;rr3"
+
+    def test_should_find_existing_keys(self, repository):
+        # When
+        result = repository.find_existing_keys(
+            keys=[
+                "raw/meteofrance/2021-01-01-6.csv",
+                "raw/meteofrance/2021-01-01-06.csv",
+                "raw/meteofrance/2021-01-01-0.csv",
+            ]
+        )
+
+        # Then
+        assert result == ["raw/meteofrance/2021-01-01-6.csv", "raw/meteofrance/2021-01-01-0.csv"]
+
+    def test_should_delete_objects_in_batches(self, repository, s3_client):
+        # Given
+        repository.DELETE_BATCH_SIZE = 2
+
+        # When
+        result = repository.delete_objects(
+            keys=["raw/meteofrance/2021-01-01-0.csv", "raw/meteofrance/2021-01-01-3.csv", "raw/meteofrance/.lock"]
+        )
+
+        # Then
+        assert s3_client.delete_calls == [
+            ["esquilaplu/raw/meteofrance/2021-01-01-0.csv", "esquilaplu/raw/meteofrance/2021-01-01-3.csv"],
+            ["esquilaplu/raw/meteofrance/.lock"],
+        ]
+        assert result == ["raw/meteofrance/.lock"]
+        assert list(s3_client.objects) == [("mybucket", "esquilaplu/raw/meteofrance/2021-01-01-6.csv")]
+
+    def test_should_read_written_checkpoint(self, repository, s3_client):
+        # When
+        checkpoint = MaintenanceCheckpoint(
+            last_key="raw/meteofrance/2021-01-01-3.csv", pending_keys=["raw/meteofrance/2021-01-01-0.csv"]
+        )
+        repository.put_checkpoint(name="pad-hours", checkpoint=checkpoint)
+
+        # Then
+        assert repository.get_checkpoint(name="pad-hours") == checkpoint
+        assert ("mybucket", "esquilaplu/state/maintenance/pad-hours.json") in s3_client.objects
+
+    def test_should_return_none_when_no_checkpoint(self, repository):
+        # When
+        result = repository.get_checkpoint(name="pad-hours")
+
+        # Then
+        assert result is None
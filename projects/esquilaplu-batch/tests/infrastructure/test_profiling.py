@@ -0,0 +1,87 @@
+import datetime as dt
+import pstats
+
+import pytest
+
+from src.domain.value_objects import Laps
+from src.infrastructure.profiling import RunProfiler
+
+
+def busy_work() -> int:
+    return sum(i * i for i in range(200_000))
+
+
+class TestRunProfiler:
+    def test_should_write_run_and_laps_profiles(self, tmp_path):
+        # Given
+        profiler = RunProfiler(output_dir=tmp_path, sample_interval_sec=0.001, trace_memory=True)
+        laps = Laps(start_time=dt.datetime(2021, 1, 16, 9, 0, 0), duration_hours=3)
+
+        # When
+        with profiler.run():
+            busy_work()
+            with profiler.laps(laps):
+                busy_work()
+
+        # Then
+        assert sorted(path.name for path in (tmp_path / "laps").iterdir()) == [
+            "2021-01-16-09.collapsed",
+            "2021-01-16-09.memory.txt",
+            "2021-01-16-09.pstats",
+        ]
+        run_calls = {
+            function[2]: stat[0] for function, stat in pstats.Stats(str(tmp_path / "run.pstats")).stats.items()
+        }
+        laps_calls = {
+            function[2]: stat[0]
+            for function, stat in pstats.Stats(str(tmp_path / "laps" / "2021-01-16-09.pstats")).stats.items()
+        }
+        assert run_calls["busy_work"] == 2
+        assert laps_calls["busy_work"] == 1
+        assert (tmp_path / "run.memory.txt").read_text().startswith("peak: ")
+
+    def test_should_write_collapsed_stacks_tagged_by_laps(self, tmp_path):
+        # Given
+        profiler = RunProfiler(output_dir=tmp_path, sample_interval_sec=0.001)
+        laps = Laps(start_time=dt.datetime(2021, 1, 16, 9, 0, 0), duration_hours=3)
+
+        # When
+        with profiler.run():
+            with profiler.laps(laps):
+                for _ in range(20):
+                    busy_work()
+
+        # Then
+        lines = (tmp_path / "laps" / "2021-01-16-09.collapsed").read_text().splitlines()
+        assert any(line.startswith("MainThread;") and "busy_work (test_profiling.py:10)" in line for line in lines)
+        assert all(int(line.rsplit(" ", 1)[1]) > 0 for line in lines)
+
+    def test_should_write_run_and_laps_profiles_when_interrupted(self, tmp_path):
+        # Given
+        profiler = RunProfiler(output_dir=tmp_path, sample_interval_sec=0.001)
+        laps = Laps(start_time=dt.datetime(2021, 1, 16, 9, 0, 0), duration_hours=3)
+
+        # When
+        with pytest.raises(KeyboardInterrupt), profiler.run():
+            with profiler.laps(laps):
+                busy_work()
+                raise KeyboardInterrupt
+
+        # Then
+        assert (tmp_path / "run.pstats").exists()
+        assert (tmp_path / "run.collapsed").exists()
+        assert sorted(path.name for path in (tmp_path / "laps").iterdir()) == [
+            "2021-01-16-09.collapsed",
+            "2021-01-16-09.pstats",
+        ]
+
+    def test_should_not_profile_laps_outside_of_a_run(self, tmp_path):
+        # Given
+        profiler = RunProfiler(output_dir=tmp_path)
+
+        # When
+        with profiler.laps(Laps(start_time=dt.datetime(2021, 1, 16, 9, 0, 0), duration_hours=3)):
+            busy_work()
+
+        # Then
+        assert list(tmp_path.iterdir()) == []